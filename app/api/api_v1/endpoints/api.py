@@ -1,23 +1,53 @@
 # app/api_v1/endpoints/api.py
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from app.schemas.ai import (
     ExplanationRequest, ExplanationResponse,
     AdaptiveQuestionRequest, AdaptiveQuestionResponse,
+    AdaptiveQuestionBatchRequest, AdaptiveQuestionBatchResponse,
     ChatRequest, ChatResponse,
-    AnalysisResponse, StudyPlanRequest, StudyPlanResponse
+    AnalysisResponse, StudyPlanRequest, StudyPlanResponse, JobResponse
 )
-from app.services.gemini_service import gemini_service
+from app.services.gemini_service import GeminiService, get_gemini_service
+from app.core.registry import registry
+from app.core.config import settings
+from app.core.traffic_capture import trace_writer
+from app.core.profiling import request_profiler
+from app.services.question_pool import question_pool
+from app.services.gemini_governor import GeminiUnavailableError
+from app.services.job_queue import job_queue
+from app.services.ai_memo import ai_memo
+from app.core.security import get_token_claims, profile_from_claims, token_verifier
 from app.db.db import get_database # <-- CORREGIDO
-from datetime import datetime
+from app.db.user_cache import user_cache
+from app.db.mastery import recent_performance, weak_topics
+from app.db.analytics import local_midnight_utc, session_summary, today_performance
+import json
+import math
+import time
+from typing import Optional
 
 router = APIRouter(prefix="/api/ai", tags=["AI"])
 
+def ai_unavailable(error: GeminiUnavailableError) -> HTTPException:
+    """503 con Retry-After cuando la IA está saturada o sin cuota"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
 @router.post("/explain", response_model=ExplanationResponse)
-async def generate_explanation(request: ExplanationRequest, db=Depends(get_database)):
+async def generate_explanation(
+    request: ExplanationRequest,
+    db=Depends(get_database),
+    claims=Depends(get_token_claims),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """Genera explicación personalizada con Gemini"""
     try:
-        users_collection = db["users"]
-        user = await users_collection.find_one({"_id": request.userId})
+        # Con un token válido el nivel viene en sus claims: no hace falta leer el perfil
+        user = profile_from_claims(claims, request.userId) or await user_cache.get(db, request.userId)
         
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -27,149 +57,275 @@ async def generate_explanation(request: ExplanationRequest, db=Depends(get_datab
             user_answer=request.userAnswer,
             correct_answer=request.correctAnswer,
             subject=request.subject,
-            user_level=user.get("level", "principiante")
+            user_level=user.get("level", "principiante"),
+            use_cache=request.useCache
         )
         
         return ExplanationResponse(success=True, explanation=explanation)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def build_practice_profile(db, user_id: str, claims: Optional[dict] = None) -> dict:
+    """Nivel, rendimiento reciente y temas débiles del estudiante para generar preguntas"""
+    user = profile_from_claims(claims, user_id) or await user_cache.get(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    
+    # Rendimiento y temas de las últimas sesiones (contadores precalculados)
+    recent = await recent_performance(db, user_id)
+    weak = weak_topics(recent["topics"])
+    
+    return {
+        "userLevel": user.get("level", "principiante"),
+        "weakTopics": weak if weak else ["general"],
+        "recentPerformance": {"correct": recent["correct"], "total": recent["total"] or 1}
+    }
+
 @router.post("/adaptive-question", response_model=AdaptiveQuestionResponse)
-async def get_adaptive_question(request: AdaptiveQuestionRequest, db=Depends(get_database)):
+async def get_adaptive_question(
+    request: AdaptiveQuestionRequest,
+    db=Depends(get_database),
+    claims=Depends(get_token_claims)
+):
     """Obtiene pregunta adaptativa generada por Gemini"""
     try:
-        users_collection = db["users"]
-        sessions_collection = db["sessions"]
-        
-        user = await users_collection.find_one({"_id": request.userId})
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        profile = await build_practice_profile(db, request.userId, claims)
         
-        # Obtener sesiones recientes
-        recent_sessions = await sessions_collection.find(
-            {"userId": request.userId}
-        ).sort("startTime", -1).limit(10).to_list(10)
-        
-        # Calcular rendimiento
-        total_questions = sum(len(s.get("questions", [])) for s in recent_sessions)
-        correct_answers = sum(
-            sum(1 for q in s.get("questions", []) if q.get("correct", False))
-            for s in recent_sessions
+        question = await question_pool.get_question(
+            subject=request.subject,
+            user_level=profile["userLevel"],
+            weak_topics=profile["weakTopics"],
+            recent_performance=profile["recentPerformance"]
         )
         
-        # Identificar temas débiles
-        topic_performance = {}
-        for session in recent_sessions:
-            for q in session.get("questions", []):
-                topic = q.get("topic")
-                if topic:
-                    if topic not in topic_performance:
-                        topic_performance[topic] = {"correct": 0, "total": 0}
-                    topic_performance[topic]["total"] += 1
-                    if q.get("correct"):
-                        topic_performance[topic]["correct"] += 1
-        
-        weak_topics = [
-            topic for topic, stats in topic_performance.items()
-            if stats["total"] >= 3 and stats["correct"] / stats["total"] < 0.6
-        ]
+        return AdaptiveQuestionResponse(success=True, question=question)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/adaptive-question/batch", response_model=AdaptiveQuestionBatchResponse)
+async def get_adaptive_question_batch(
+    request: AdaptiveQuestionBatchRequest,
+    db=Depends(get_database),
+    claims=Depends(get_token_claims),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
+    """Genera un set de preguntas adaptativas (sesión completa) en una sola llamada a Gemini"""
+    try:
+        profile = await build_practice_profile(db, request.userId, claims)
         
-        question = await gemini_service.generate_adaptive_question(
+        questions = await gemini_service.generate_adaptive_questions(
             subject=request.subject,
-            user_level=user.get("level", "principiante"),
-            weak_topics=weak_topics if weak_topics else ["general"],
-            recent_performance={"correct": correct_answers, "total": total_questions or 1}
+            user_level=profile["userLevel"],
+            weak_topics=profile["weakTopics"],
+            recent_performance=profile["recentPerformance"],
+            count=request.count
         )
         
-        return AdaptiveQuestionResponse(success=True, question=question)
+        return AdaptiveQuestionBatchResponse(
+            success=True,
+            questions=questions,
+            requested=request.count,
+            dropped=max(0, request.count - len(questions))
+        )
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def build_tutor_context(db, user_id: str) -> dict:
+    """Contexto del estudiante para el tutor (nombre, nivel, precisión y materias débiles)"""
+    # Perfil guardado y no claims: las materias débiles salen de "scores", que cambian con
+    # cada sesión guardada y no pueden viajar en un token de 30 días
+    user = await user_cache.get(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    
+    # Calcular contexto
+    recent = await recent_performance(db, user_id)
+    accuracy = (recent["correct"] / recent["total"] * 100) if recent["total"] > 0 else 0
+    
+    # Identificar materias débiles
+    scores = user.get("scores", {})
+    weak_subjects = [subject for subject, score in scores.items() if score < 60]
+    
+    return {
+        "userName": user.get("name", "Estudiante"),
+        "userLevel": user.get("level", "principiante"),
+        "accuracy": accuracy,
+        "weakSubjects": weak_subjects
+    }
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_tutor(request: ChatRequest, db=Depends(get_database)):
+async def chat_with_tutor(
+    request: ChatRequest,
+    db=Depends(get_database),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """Chat conversacional con el tutor IA"""
     try:
-        users_collection = db["users"]
-        sessions_collection = db["sessions"]
-        
-        user = await users_collection.find_one({"_id": request.userId})
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        # Calcular contexto
-        recent_sessions = await sessions_collection.find(
-            {"userId": request.userId}
-        ).sort("startTime", -1).limit(10).to_list(10)
-        
-        total_questions = sum(len(s.get("questions", [])) for s in recent_sessions)
-        correct_answers = sum(
-            sum(1 for q in s.get("questions", []) if q.get("correct", False))
-            for s in recent_sessions
-        )
-        accuracy = (correct_answers / total_questions * 100) if total_questions > 0 else 0
-        
-        # Identificar materias débiles
-        scores = user.get("scores", {})
-        weak_subjects = [subject for subject, score in scores.items() if score < 60]
-        
-        context = {
-            "userName": user.get("name", "Estudiante"),
-            "userLevel": user.get("level", "principiante"),
-            "accuracy": accuracy,
-            "weakSubjects": weak_subjects
-        }
+        context = await build_tutor_context(db, request.userId)
         
         response = await gemini_service.chat_with_tutor(
             user_id=request.userId,
             message=request.message,
-            context=context
+            context=context,
+            subject=request.subject
         )
         
         return ChatResponse(success=True, message=response)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_with_tutor_stream(
+    request: ChatRequest,
+    http_request: Request,
+    db=Depends(get_database),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
+    """Chat con el tutor IA en streaming (Server-Sent Events)"""
+    started = time.perf_counter()
+    try:
+        context = await build_tutor_context(db, request.userId)
+        
+        stream = gemini_service.stream_chat_with_tutor(
+            user_id=request.userId,
+            message=request.message,
+            context=context,
+            subject=request.subject
+        )
+        # Esperamos el primer fragmento antes de responder para poder devolver 503/500
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = ""
+        stream = None
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    async def event_stream():
+        try:
+            yield sse_event("message", {"text": first_chunk})
+            if stream is not None:
+                async for chunk in stream:
+                    if await http_request.is_disconnected():
+                        return
+                    yield sse_event("message", {"text": chunk})
+            yield sse_event("done", {"success": True, "ttftMs": ttft_ms})
+        except Exception as e:
+            print(f"Error en chat (stream): {e}")
+            yield sse_event("error", {"success": False, "detail": str(e)})
+        finally:
+            # Si el cliente se desconecta, cerrar el generador descarta el turno incompleto
+            if stream is not None:
+                await stream.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_study_analysis(db, user_id: str) -> str:
+    """Arma los datos de estudio del usuario y pide el análisis (endpoint y cola de trabajos)"""
+    # Perfil guardado y no claims: dataVersion es la clave de la memoización
+    user = await user_cache.get(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    
+    # Sin sesiones nuevas (misma dataVersion) reutilizamos el análisis anterior
+    version = user.get("dataVersion", 0)
+    memoized = await ai_memo.get("analysis", user_id, version, {})
+    if memoized is not None:
+        return memoized
+    
+    # Resumen calculado en MongoDB (no se traen las sesiones)
+    summary = await session_summary(db, user_id)
+    
+    if summary["sessionsCount"] == 0:
+        return "🎓 Aún no tienes suficientes datos para un análisis completo. ¡Empieza a practicar!"
+    
+    subject_scores = {subject: stats["accuracy"] for subject, stats in summary["subjects"].items()}
+    session_data = {
+        "sessionsCount": summary["sessionsCount"],
+        "totalMinutes": summary["totalMinutes"],
+        "subjectScores": subject_scores or user.get("scores", {}),
+        "preferredTimes": summary["preferredTimes"] or ["no determinado"],
+        "streak": summary["streak"]
+    }
+    
+    analysis = await get_gemini_service().analyze_study_pattern(user_id, session_data)
+    await ai_memo.set("analysis", user_id, version, {}, analysis)
+    return analysis
+
+async def run_study_plan(db, user_id: str, target_date: str, target_score: int) -> dict:
+    """Genera el plan de estudio y lo guarda en el usuario (endpoint y cola de trabajos)"""
+    # Perfil guardado y no claims: usa dataVersion, estadísticas y scores
+    user = await user_cache.get(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    
+    version = user.get("dataVersion", 0)
+    inputs = {"targetDate": target_date, "targetScore": target_score}
+    plan = await ai_memo.get("study_plan", user_id, version, inputs)
+    if plan is not None:
+        return plan
+    
+    user_profile = {
+        "level": user.get("level", "principiante"),
+        "currentScore": user.get("statistics", {}).get("averageScore", 0),
+        "subjectScores": user.get("scores", {})
+    }
+    
+    plan = await get_gemini_service().generate_study_plan(
+        user_profile=user_profile,
+        target_date=target_date,
+        target_score=target_score
+    )
+    await ai_memo.set("study_plan", user_id, version, inputs, plan)
+    
+    # Guardar plan en usuario
+    await db["users"].update_one(
+        {"_id": user_id},
+        {"$set": {"studyPlan": plan}}
+    )
+    user_cache.invalidate(user_id)
+    return plan
+
 @router.get("/analyze/{user_id}", response_model=AnalysisResponse)
 async def analyze_study_pattern(user_id: str, db=Depends(get_database)):
     """Analiza el patrón de estudio del estudiante"""
     try:
-        users_collection = db["users"]
-        sessions_collection = db["sessions"]
-        
-        user = await users_collection.find_one({"_id": user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        sessions = await sessions_collection.find({"userId": user_id}).to_list(1000)
-        
-        if len(sessions) == 0:
-            return AnalysisResponse(
-                success=True,
-                analysis="🎓 Aún no tienes suficientes datos para un análisis completo. ¡Empieza a practicar!"
-            )
-        
-        # Calcular datos de sesión
-        total_minutes = 0
-        for s in sessions:
-            if "endTime" in s and "startTime" in s:
-                try:
-                    end = datetime.fromisoformat(s["endTime"].replace('Z', '+00:00'))
-                    start = datetime.fromisoformat(s["startTime"].replace('Z', '+00:00'))
-                    total_minutes += (end - start).seconds // 60
-                except:
-                    pass
-        
-        session_data = {
-            "sessionsCount": len(sessions),
-            "totalMinutes": total_minutes,
-            "subjectScores": user.get("scores", {}),
-            "preferredTimes": ["mañana", "tarde"],
-            "streak": user.get("statistics", {}).get("currentStreak", 0)
-        }
-        
-        analysis = await gemini_service.analyze_study_pattern(user_id, session_data)
+        analysis = await run_study_analysis(db, user_id)
         
         return AnalysisResponse(success=True, analysis=analysis)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -177,74 +333,121 @@ async def analyze_study_pattern(user_id: str, db=Depends(get_database)):
 async def generate_study_plan(request: StudyPlanRequest, db=Depends(get_database)):
     """Genera plan de estudio personalizado"""
     try:
-        users_collection = db["users"]
-        
-        user = await users_collection.find_one({"_id": request.userId})
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-        
-        user_profile = {
-            "level": user.get("level", "principiante"),
-            "currentScore": user.get("statistics", {}).get("averageScore", 0),
-            "subjectScores": user.get("scores", {})
-        }
-        
-        plan = await gemini_service.generate_study_plan(
-            user_profile=user_profile,
-            target_date=request.targetDate,
-            target_score=request.targetScore
-        )
-        
-        # Guardar plan en usuario
-        await users_collection.update_one(
-            {"_id": request.userId},
-            {"$set": {"studyPlan": plan}}
-        )
+        plan = await run_study_plan(db, request.userId, request.targetDate, request.targetScore)
         
         return StudyPlanResponse(success=True, plan=plan)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Trabajos en segundo plano: planes y análisis sin mantener la conexión abierta ---
+
+async def analysis_job(user_id: str) -> dict:
+    return {"analysis": await run_study_analysis(await get_database(), user_id)}
+
+async def study_plan_job(user_id: str, target_date: str, target_score: int) -> dict:
+    return {"plan": await run_study_plan(await get_database(), user_id, target_date, target_score)}
+
+job_queue.register("analysis", analysis_job)
+job_queue.register("study_plan", study_plan_job)
+
+def job_response(job: dict, attached: bool = False) -> JobResponse:
+    finished_at = job.get("finishedAt")
+    return JobResponse(
+        success=True,
+        jobId=job["_id"],
+        kind=job["kind"],
+        status=job["status"],
+        attached=attached,
+        result=job.get("result"),
+        error=job.get("error"),
+        retryAfter=job.get("retryAfter"),
+        createdAt=job["createdAt"].isoformat(),
+        finishedAt=finished_at.isoformat() if finished_at else None
+    )
+
+async def ensure_user_exists(db, user_id: str):
+    if not await user_cache.get(db, user_id):
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+@router.post("/jobs/study-plan", response_model=JobResponse, status_code=202)
+async def submit_study_plan_job(request: StudyPlanRequest, db=Depends(get_database)):
+    """Encola la generación del plan de estudio y devuelve el id del trabajo"""
+    try:
+        await ensure_user_exists(db, request.userId)
+        job, attached = await job_queue.submit(
+            "study_plan",
+            request.userId,
+            {"target_date": request.targetDate, "target_score": request.targetScore}
+        )
+        return job_response(job, attached)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/jobs/analyze/{user_id}", response_model=JobResponse, status_code=202)
+async def submit_analysis_job(user_id: str, db=Depends(get_database)):
+    """Encola el análisis del patrón de estudio y devuelve el id del trabajo"""
+    try:
+        await ensure_user_exists(db, user_id)
+        job, attached = await job_queue.submit("analysis", user_id, {})
+        return job_response(job, attached)
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = 0):
+    """Estado y resultado de un trabajo; con ?wait=N espera hasta N segundos a que termine"""
+    try:
+        job = await job_queue.get(job_id, wait=wait)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+        return job_response(job)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/feedback/{user_id}")
-async def get_motivational_feedback(user_id: str, db=Depends(get_database)):
+async def get_motivational_feedback(
+    user_id: str,
+    use_cache: bool = True,
+    db=Depends(get_database),
+    gemini_service: GeminiService = Depends(get_gemini_service)
+):
     """Genera feedback motivacional"""
     try:
-        users_collection = db["users"]
-        sessions_collection = db["sessions"]
-        
-        user = await users_collection.find_one({"_id": user_id})
+        # Perfil guardado y no claims: dataVersion es la clave de la memoización
+        user = await user_cache.get(db, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
-        # Sesiones de hoy
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        today_sessions = await sessions_collection.find({
-            "userId": user_id,
-            "startTime": {"$gte": today_start.isoformat()}
-        }).to_list(100)
+        # El feedback depende de los datos del usuario y del día (hora local)
+        version = user.get("dataVersion", 0)
+        inputs = {"date": local_midnight_utc().isoformat()}
+        if use_cache:
+            memoized = await ai_memo.get("feedback", user_id, version, inputs)
+            if memoized is not None:
+                return {"success": True, "feedback": memoized}
         
-        total_questions = sum(len(s.get("questions", [])) for s in today_sessions)
-        correct_answers = sum(
-            sum(1 for q in s.get("questions", []) if q.get("correct", False))
-            for s in today_sessions
-        )
-        
-        time_spent = 0
-        for s in today_sessions:
-            if "endTime" in s and "startTime" in s:
-                try:
-                    end = datetime.fromisoformat(s["endTime"].replace('Z', '+00:00'))
-                    start = datetime.fromisoformat(s["startTime"].replace('Z', '+00:00'))
-                    time_spent += (end - start).seconds // 60
-                except:
-                    pass
+        # Sesiones de hoy, agregadas en MongoDB
+        today = await today_performance(db, user_id)
         
         performance = {
-            "questionsAnswered": total_questions,
-            "correctAnswers": correct_answers,
-            "timeSpent": time_spent,
-            "streak": user.get("statistics", {}).get("currentStreak", 0),
+            "questionsAnswered": today["questionsAnswered"],
+            "correctAnswers": today["correctAnswers"],
+            "timeSpent": today["timeSpent"],
+            "streak": today["streak"],
             "trending": "estable"
         }
         
@@ -253,8 +456,38 @@ async def get_motivational_feedback(user_id: str, db=Depends(get_database)):
             "goal": user.get("goals", {}).get("targetUniversity", "ingresar a la universidad")
         }
         
-        feedback = await gemini_service.generate_motivational_feedback(performance, context)
+        feedback = await gemini_service.generate_motivational_feedback(
+            performance, context, use_cache=use_cache
+        )
+        await ai_memo.set("feedback", user_id, version, inputs, feedback)
         
         return {"success": True, "feedback": feedback}
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise ai_unavailable(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats")
+async def get_ai_stats(gemini_service: GeminiService = Depends(get_gemini_service)):
+    """Estadísticas internas de los servicios de IA"""
+    return {
+        "success": True,
+        "cache": gemini_service.cache.stats(),
+        "questionPool": question_pool.stats(),
+        "singleFlight": gemini_service.single_flight.stats(),
+        "governor": gemini_service.governor.stats(),
+        "hedging": gemini_service.hedging.stats(),
+        "chatStreamTtft": gemini_service.chat_ttft.stats(),
+        "conversations": gemini_service.conversations.stats(),
+        "semanticCache": gemini_service.semantic_cache.stats(),
+        "jobs": job_queue.stats(),
+        "memo": ai_memo.stats(),
+        "userCache": user_cache.stats(),
+        "tokens": token_verifier.stats(),
+        "circuitBreaker": gemini_service.fallback_stats(),
+        "services": registry.stats(),
+        "trafficCapture": trace_writer.stats() if settings.TRAFFIC_CAPTURE_ENABLED else None,
+        "profiling": request_profiler.stats()
+    }
\ No newline at end of file
@@ -1,8 +1,17 @@
 # app/api_v1/endpoints/preguntas.py
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
 from app.db.db import get_database # <-- CORREGIDO
-from pydantic import BaseModel
-from typing import List, Optional
+from app.db.mastery import record_sessions
+from app.db import session_store
+from app.db.user_cache import user_cache
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 router = APIRouter(prefix="/api/sesiones", tags=["Sesiones"])
@@ -22,64 +31,230 @@ class SessionCreate(BaseModel):
     startTime: datetime
     endTime: datetime
     score: float
+    # Id generado por el cliente (sesiones offline): reenviarla no la duplica
+    clientSessionId: Optional[str] = None
+
+class SessionBulkCreate(BaseModel):
+    # Cada sesión se valida por separado para reportar errores por elemento
+    sessions: List[Dict[str, Any]]
+
+def statistics_update(answered: int, correct: int) -> list:
+    """Update con pipeline que suma preguntas/aciertos y recalcula el promedio del usuario"""
+    return [
+        {"$set": {
+            "statistics.questionsAnswered": {"$add": [{"$ifNull": ["$statistics.questionsAnswered", 0]}, answered]},
+            "statistics.correctAnswers": {"$add": [{"$ifNull": ["$statistics.correctAnswers", 0]}, correct]},
+            # dataVersion invalida los resultados de IA memoizados del usuario
+            "dataVersion": {"$add": [{"$ifNull": ["$dataVersion", 0]}, 1]}
+        }},
+        {"$set": {
+            "statistics.averageScore": {"$cond": [
+                {"$gt": ["$statistics.questionsAnswered", 0]},
+                {"$multiply": [{"$divide": ["$statistics.correctAnswers", "$statistics.questionsAnswered"]}, 100]},
+                {"$ifNull": ["$statistics.averageScore", 0]}
+            ]}
+        }}
+    ]
+
+def session_document(session: SessionCreate) -> Dict:
+    # startTime/endTime se guardan como fechas BSON (las agregaciones las necesitan así)
+    session_dict = session.dict()
+    if session_dict["clientSessionId"] is None:
+        del session_dict["clientSessionId"]
+    return session_dict
+
+async def apply_user_sessions(db, user_id: str, sessions: List[Dict]):
+    """Estadísticas y contadores de dominio del usuario para sus sesiones nuevas (2 escrituras)"""
+    answered = sum(len(s["questions"]) for s in sessions)
+    correct = sum(1 for s in sessions for q in s["questions"] if q.get("correct"))
+    result_user = await db["users"].update_one({"_id": user_id}, statistics_update(answered, correct))
+    user_cache.invalidate(user_id)
+    if result_user.matched_count:
+        # Contadores por materia y tema para los endpoints de IA
+        await record_sessions(db, user_id, [(s["subject"], s["questions"], s["startTime"]) for s in sessions])
 
 @router.post("/")
 async def create_session(session: SessionCreate, db=Depends(get_database)):
     """Crear una nueva sesión de estudio"""
     try:
-        sessions_collection = db["sessions"]
-        users_collection = db["users"]
-        
-        session_dict = session.dict()
-        
-        # Convertir datetimes a strings ISO 8601
-        session_dict["startTime"] = session_dict["startTime"].isoformat()
-        session_dict["endTime"] = session_dict["endTime"].isoformat()
+        session_dict = session_document(session)
         
-        result = await sessions_collection.insert_one(session_dict)
+        # Cabecera con contadores (+ preguntas embebidas o en cubetas, según el formato)
+        try:
+            session_id = await session_store.insert_session(db, session_dict)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="La sesión ya fue guardada (clientSessionId repetido)")
         
-        # Actualizar estadísticas del usuario
-        user = await users_collection.find_one({"_id": session.userId})
-        if user:
-            stats = user.get("statistics", {})
-            stats["questionsAnswered"] = stats.get("questionsAnswered", 0) + len(session.questions)
-            stats["correctAnswers"] = stats.get("correctAnswers", 0) + sum(1 for q in session.questions if q.correct)
-            
-            # Calcular precisión
-            if stats["questionsAnswered"] > 0:
-                stats["averageScore"] = (stats["correctAnswers"] / stats["questionsAnswered"]) * 100
-            
-            await users_collection.update_one(
-                {"_id": session.userId},
-                {"$set": {"statistics": stats}}
-            )
+        # Actualizar estadísticas del usuario en una sola escritura atómica (update con
+        # pipeline): dos sesiones guardadas a la vez ya no se pisan los contadores
+        await apply_user_sessions(db, session.userId, [session_dict])
         
         return {
             "success": True,
-            "sessionId": str(result.inserted_id),
+            "sessionId": session_id,
             "message": "Sesión guardada exitosamente"
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk")
+async def create_sessions_bulk(batch: SessionBulkCreate, db=Depends(get_database)):
+    """Guardar un lote de sesiones (sincronización offline) con resultado por elemento"""
+    if len(batch.sessions) > settings.SESSION_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {settings.SESSION_BULK_MAX_ITEMS} sesiones por lote"
+        )
+    try:
+        results: List[Dict[str, Any]] = []
+        valid: List[Dict] = []
+        positions: List[int] = []
+        for index, raw in enumerate(batch.sessions):
+            try:
+                session_dict = session_document(SessionCreate(**raw))
+            except ValidationError as e:
+                errors = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+                results.append({"index": index, "status": "invalid", "error": errors})
+                continue
+            results.append({"index": index, "status": "pending"})
+            valid.append(session_dict)
+            positions.append(index)
+        
+        # Un solo insert_many; los duplicados (clientSessionId) no frenan al resto
+        ids, errors = await session_store.insert_sessions(db, valid)
+        
+        created_by_user: Dict[str, List[Dict]] = {}
+        indexes_by_user: Dict[str, List[int]] = {}
+        for i, (index, session_dict) in enumerate(zip(positions, valid)):
+            if i in errors:
+                if errors[i] == "duplicate":
+                    results[index] = {"index": index, "status": "duplicate", "error": "clientSessionId ya guardado"}
+                else:
+                    results[index] = {"index": index, "status": "error", "error": errors[i]}
+                continue
+            results[index] = {"index": index, "status": "created", "sessionId": ids[i]}
+            created_by_user.setdefault(session_dict["userId"], []).append(session_dict)
+            indexes_by_user.setdefault(session_dict["userId"], []).append(index)
+        
+        # Una actualización combinada por usuario afectado; si la de un usuario falla, sus
+        # sesiones ya están guardadas pero sin estadísticas: se reportan como error (reenviarlas
+        # daría "duplicate") y el resto del lote no se ve afectado
+        user_ids = list(created_by_user)
+        outcomes = await asyncio.gather(*[
+            apply_user_sessions(db, user_id, created_by_user[user_id]) for user_id in user_ids
+        ], return_exceptions=True)
+        for user_id, outcome in zip(user_ids, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"⚠️ Error actualizando estadísticas de {user_id}: {outcome}")
+                for index in indexes_by_user[user_id]:
+                    results[index] = {
+                        "index": index,
+                        "status": "error",
+                        "sessionId": results[index]["sessionId"],
+                        "error": f"Sesión guardada, pero no se actualizaron las estadísticas: {outcome}"
+                    }
+        
+        counts = {status: 0 for status in ("created", "duplicate", "invalid", "error")}
+        for item in results:
+            counts[item["status"]] += 1
+        return {
+            "success": counts["created"] + counts["duplicate"] == len(results),
+            "summary": counts,
+            "results": results
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def session_json(session: Dict) -> Dict:
+    session["_id"] = str(session["_id"])
+    return jsonable_encoder(session)
+
 @router.get("/user/{user_id}")
-async def get_user_sessions(user_id: str, limit: int = 10, db=Depends(get_database)):
-    """Obtener sesiones de un usuario"""
+async def get_user_sessions(
+    user_id: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_questions: bool = True,
+    format: str = "json",
+    db=Depends(get_database)
+):
+    """Historial de sesiones de un usuario, paginado por cursor (más recientes primero).
+
+    fields: campos separados por coma; include_questions=false: solo cabeceras con contadores;
+    format=ndjson: transmite todo el historial desde el cursor, una sesión por línea.
+    """
+    requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    unknown = [f for f in requested or [] if f not in session_store.SESSION_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format debe ser 'json' o 'ndjson'")
+    
+    query = {"userId": user_id}
+    if cursor:
+        try:
+            query.update(session_store.decode_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    projection = session_store.history_projection(requested, include_questions)
+    with_questions = projection is None or projection.get("questions") == 1
+    
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_sessions(db, user_id, query, projection, with_questions),
+            media_type="application/x-ndjson"
+        )
+    
     try:
-        sessions_collection = db["sessions"]
+        # Tope duro por página: el historial completo se recorre con nextCursor
+        page_size = max(1, min(limit, settings.SESSIONS_PAGE_MAX))
+        sessions = await db["sessions"].find(query, projection).sort(
+            session_store.HISTORY_SORT
+        ).limit(page_size + 1).to_list(page_size + 1)
         
-        sessions = await sessions_collection.find(
-            {"userId": user_id}
-        ).sort("startTime", -1).limit(limit).to_list(limit)
+        next_cursor = None
+        if len(sessions) > page_size:
+            sessions = sessions[:page_size]
+            next_cursor = session_store.encode_cursor(sessions[-1])
         
-        # Convertir ObjectId a string
-        for session in sessions:
-            if "_id" in session:
-                session["_id"] = str(session["_id"])
+        if with_questions:
+            # Formato bucketed: las preguntas se leen de las cubetas del usuario
+            await session_store.attach_questions(db, user_id, sessions)
         
         return {
             "success": True,
-            "sessions": sessions
+            "sessions": [session_json(session) for session in sessions],
+            "nextCursor": next_cursor
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def stream_sessions(db, user_id: str, query: Dict, projection: Optional[Dict], with_questions: bool):
+    """Escribe las sesiones a medida que llegan del cursor de Motor (memoria acotada al lote)"""
+    batch_size = settings.SESSIONS_STREAM_BATCH_SIZE
+    mongo_cursor = db["sessions"].find(query, projection).sort(
+        session_store.HISTORY_SORT
+    ).batch_size(batch_size)
+    batch: List[Dict] = []
+    try:
+        async for session in mongo_cursor:
+            batch.append(session)
+            if len(batch) < batch_size:
+                continue
+            if with_questions:
+                await session_store.attach_questions(db, user_id, batch)
+            yield "".join(json.dumps(session_json(s), ensure_ascii=False) + "\n" for s in batch)
+            batch = []
+        if batch:
+            if with_questions:
+                await session_store.attach_questions(db, user_id, batch)
+            yield "".join(json.dumps(session_json(s), ensure_ascii=False) + "\n" for s in batch)
+    except Exception as e:
+        print(f"Error en historial (stream): {e}")
+        yield json.dumps({"success": False, "detail": str(e)}) + "\n"
+    finally:
+        await mongo_cursor.close()
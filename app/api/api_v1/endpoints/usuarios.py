@@ -1,51 +1,38 @@
 # app/api_v1/endpoints/usuarios.py
-from fastapi import APIRouter, HTTPException, Depends
-from app.schemas.user import User, UserCreate, UserStats, UserLogin, Token
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Response
+from app.schemas.user import User, UserCreate, UserUpdate, UserStats, UserLogin, Token
 from app.db.db import get_database
+from app.db import session_store
+from app.db.user_cache import user_cache
 from datetime import datetime
-import bcrypt # <-- ¡NUEVO! Importamos bcrypt directamente
+from pymongo import ReturnDocument
 from app.core.config import settings
+from app.core.security import (
+    HashingBusyError, create_access_token, get_token_claims, needs_rehash, password_hasher, token_verifier
+)
 
-# --- Configuración de Seguridad ---
-# Ya no usamos 'passlib.context.CryptContext'
 router = APIRouter(prefix="/api/usuarios", tags=["Usuarios"])
 
-# --- Funciones de Seguridad (Nuevas, usando bcrypt) ---
+def hashing_busy(error: HashingBusyError) -> HTTPException:
+    """503 con Retry-After cuando el pool de bcrypt está saturado"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(int(error.retry_after))}
+    )
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica la contraseña plana contra la hasheada."""
-    
-    # bcrypt requiere que las contraseñas estén en bytes
-    password_bytes = plain_password.encode('utf-8')
-    hashed_password_bytes = hashed_password.encode('utf-8')
-    
-    # ¡ARREGLO IMPORTANTE!
-    # Truncamos la contraseña en BYTES a 72
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-        
+async def upgrade_password_hash(db, user_id: str, plain_password: str, old_hash: str):
+    """Rehashea con el costo actual (BCRYPT_ROUNDS) un hash generado con un costo menor"""
     try:
-        return bcrypt.checkpw(password_bytes, hashed_password_bytes)
+        new_hash = await password_hasher.hash(plain_password)
+        # Solo si nadie cambió la contraseña mientras tanto
+        await db["users"].update_one(
+            {"_id": user_id, "hashed_password": old_hash},
+            {"$set": {"hashed_password": new_hash}}
+        )
+        user_cache.invalidate(user_id)
     except Exception as e:
-        print(f"Error al verificar contraseña: {e}")
-        return False
-
-def get_password_hash(password: str) -> str:
-    """Hashea una contraseña."""
-    
-    password_bytes = password.encode('utf-8')
-
-    # ¡ARREGLO IMPORTANTE!
-    # Truncamos la contraseña en BYTES a 72
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    
-    # Generamos el 'salt' y hasheamos
-    salt = bcrypt.gensalt()
-    hashed_bytes = bcrypt.hashpw(password_bytes, salt)
-    
-    # Devolvemos el hash como un string para guardarlo en MongoDB
-    return hashed_bytes.decode('utf-8')
+        print(f"⚠️ No se pudo actualizar el hash de la contraseña: {e}")
 
 # --- Endpoints ---
 
@@ -68,7 +55,8 @@ async def create_user(user: UserCreate, db=Depends(get_database)):
         
         # --- ¡CAMBIO IMPORTANTE! ---
         # Hashear la contraseña antes de guardarla
-        user_dict["hashed_password"] = get_password_hash(user.password)
+        # (en el pool de bcrypt, sin bloquear el event loop)
+        user_dict["hashed_password"] = await password_hasher.hash(user.password)
         del user_dict["password"] # Borramos la contraseña en texto plano
         
         # Generar un _id único
@@ -80,8 +68,10 @@ async def create_user(user: UserCreate, db=Depends(get_database)):
             "razonamientoMatematico": 0.0
         }
         user_dict["createdAt"] = datetime.utcnow()
+        user_dict["dataVersion"] = 0
         
         await users_collection.insert_one(user_dict)
+        user_cache.put(user_dict)
         
         # Devolvemos el usuario sin la contraseña hasheada
         del user_dict["hashed_password"] 
@@ -89,6 +79,8 @@ async def create_user(user: UserCreate, db=Depends(get_database)):
         
     except HTTPException as e:
         raise e # Re-lanzar excepciones HTTP
+    except HashingBusyError as e:
+        raise hashing_busy(e)
     except Exception as e:
         print(f"Error al crear usuario: {e}")
         # Devolvemos el error real al frontend
@@ -98,42 +90,104 @@ async def create_user(user: UserCreate, db=Depends(get_database)):
 @router.post("/login", response_model=Token)
 async def login_for_access_token(
     form_data: UserLogin, 
+    background_tasks: BackgroundTasks,
     db=Depends(get_database)
 ):
     """
-    Inicia sesión de un usuario y devuelve un token.
-    (En este ejemplo simple, devolvemos los datos del usuario)
+    Inicia sesión de un usuario y devuelve un token de acceso (JWT firmado).
+    Enviarlo como "Authorization: Bearer <token>" evita leer el perfil en los endpoints de IA.
     """
     users_collection = db["users"]
     user = await users_collection.find_one({"email": form_data.email})
     
     # Verificar si el usuario existe y la contraseña es correcta
-    if not user or not verify_password(form_data.password, user.get("hashed_password", "")):
+    try:
+        valid = bool(user) and await password_hasher.verify(form_data.password, user.get("hashed_password", ""))
+    except HashingBusyError as e:
+        raise hashing_busy(e)
+    if not valid:
         raise HTTPException(
             status_code=401, # Error de "No autorizado"
             detail="Email o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Si la contraseña es correcta, devolvemos un "token" simple
+    # Hashes con un costo menor al configurado se actualizan después de responder
+    if needs_rehash(user["hashed_password"]):
+        background_tasks.add_task(
+            upgrade_password_hash, db, user["_id"], form_data.password, user["hashed_password"]
+        )
+    
+    # Token firmado con id, nombre y nivel (los endpoints de IA lo usan en vez de leer el perfil)
+    token_verifier.note_profile_version(user["_id"], user.get("profileVersion", 0))
+    access_token, expires_in = create_access_token(user)
     return Token(
-        access_token="token_falso_jwt_aqui", # Placeholder
+        access_token=access_token,
         token_type="bearer",
         user_id=str(user["_id"]),
-        user_name=user["name"]
+        user_name=user["name"],
+        expires_in=expires_in
     )
 
 @router.get("/{user_id}", response_model=User)
 async def get_user(user_id: str, db=Depends(get_database)):
     """Obtener usuario por ID"""
+    try:
+        user = await user_cache.get(db, user_id)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        
+        return User(**user)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/{user_id}", response_model=User)
+async def update_user(
+    user_id: str,
+    update: UserUpdate,
+    response: Response,
+    db=Depends(get_database),
+    claims=Depends(get_token_claims)
+):
+    """Actualizar el perfil del usuario (requiere su token; devuelve uno nuevo en X-Access-Token)"""
+    if claims is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Se requiere un token para modificar el perfil",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    if claims.get("sub") != user_id:
+        raise HTTPException(status_code=403, detail="El token no corresponde a este usuario")
     try:
         users_collection = db["users"]
-        user = await users_collection.find_one({"_id": user_id})
         
+        changes = update.dict(exclude_unset=True)
+        if not changes:
+            raise HTTPException(status_code=400, detail="No hay cambios que guardar")
+        
+        # Cambia el perfil: los resultados de IA memoizados dejan de ser válidos
+        increments = {"dataVersion": 1}
+        # Nombre y nivel van en el token: los tokens emitidos antes quedan desactualizados
+        if "name" in changes or "level" in changes:
+            increments["profileVersion"] = 1
+        user = await users_collection.find_one_and_update(
+            {"_id": user_id},
+            {"$set": changes, "$inc": increments},
+            return_document=ReturnDocument.AFTER
+        )
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        user_cache.put(user)
+        token_verifier.note_profile_version(user_id, user.get("profileVersion", 0))
+        
+        # Token con el nombre y nivel nuevos (el anterior deja de servir para el perfil)
+        access_token, _ = create_access_token(user)
+        response.headers["X-Access-Token"] = access_token
         
         return User(**user)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -141,15 +195,15 @@ async def get_user(user_id: str, db=Depends(get_database)):
 async def get_user_stats(user_id: str, db=Depends(get_database)):
     """Obtener estadísticas del usuario"""
     try:
-        users_collection = db["users"]
         sessions_collection = db["sessions"]
         
-        user = await users_collection.find_one({"_id": user_id})
+        user = await user_cache.get(db, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
+        # Solo cabeceras: el resumen no necesita la lista de preguntas
         sessions = await sessions_collection.find(
-            {"userId": user_id}
+            {"userId": user_id}, session_store.HEADER_PROJECTION
         ).sort("startTime", -1).limit(10).to_list(10)
         
         # Limpiar ObjectId para que sea JSON serializable
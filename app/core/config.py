@@ -13,6 +13,35 @@ class Settings(BaseSettings):
     # --- ¡MODELO CORREGIDO! ---
     # Este es el modelo que SÍ está en tu lista de la API
     GEMINI_MODEL: str = "gemini-flash-latest" 
+    # Importar el SDK de Gemini en segundo plano al arrancar (si no, en la primera llamada)
+    GEMINI_PRELOAD: bool = True
+    
+    # Límites de uso de Gemini (regulador central de llamadas)
+    GEMINI_REQUESTS_PER_MINUTE: int = 15
+    GEMINI_TOKENS_PER_MINUTE: int = 250000
+    GEMINI_MAX_CONCURRENCY: int = 8
+    GEMINI_MAX_RETRIES: int = 3
+    GEMINI_BACKOFF_BASE_SECONDS: float = 1.0
+    GEMINI_BACKOFF_MAX_SECONDS: float = 30.0
+    # Hedging: segundo intento si la llamada supera el percentil de latencia
+    GEMINI_HEDGE_ENABLED: bool = False
+    GEMINI_HEDGE_PERCENTILE: float = 0.95
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    GEMINI_HEDGE_MAX_RATE: float = 0.1  # fracción máxima de llamadas duplicadas
+    GEMINI_FALLBACK_MODEL: str = ""  # vacío = mismo modelo que GEMINI_MODEL
+    # Tiempo máximo en cola por prioridad antes de responder 503
+    GEMINI_QUEUE_TIMEOUT_INTERACTIVE: float = 15.0
+    GEMINI_QUEUE_TIMEOUT_ADAPTIVE: float = 10.0
+    GEMINI_QUEUE_TIMEOUT_BACKGROUND: float = 30.0
+    # Circuit breaker: se abre tras fallos (o llamadas lentas) consecutivos
+    GEMINI_CALL_TIMEOUT_SECONDS: float = 30.0
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5
+    GEMINI_BREAKER_LATENCY_SECONDS: float = 20.0
+    GEMINI_BREAKER_OPEN_SECONDS: float = 30.0
+    GEMINI_BREAKER_HALF_OPEN_PROBES: int = 1
+    
+    # Zona horaria de los estudiantes (días y horarios de estudio)
+    TIMEZONE: str = "America/Lima"
     
     # Server
     HOST: str = "0.0.0.0"
@@ -21,13 +50,103 @@ class Settings(BaseSettings):
     
     # Security
     SECRET_KEY: str = "mi-clave-secreta-super-dificil-de-adivinar-12345"
-    ALGORITHM: str = "HS265"
+    ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000  # tokens ya verificados que se recuerdan
+    
+    # Hash de contraseñas (app/core/security.py)
+    BCRYPT_ROUNDS: int = 12  # los hashes con menor costo se actualizan al iniciar sesión
+    BCRYPT_WORKERS: int = 2  # hilos dedicados a bcrypt por worker
+    BCRYPT_MAX_PENDING: int = 32  # hashes en cola antes de responder 503
     
     # --- ¡CAMBIO IMPORTANTE AQUÍ! ---
     # Permitimos todos los orígenes ("*") para el desarrollo
     ALLOWED_ORIGINS: List[str] = ["*"]
     
+    # Caché de respuestas de IA (memoria + MongoDB)
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 2000
+    AI_CACHE_MEMORY_TTL_SECONDS: int = 3600
+    AI_CACHE_TTL_SECONDS: int = 604800  # 7 días en MongoDB
+    AI_CACHE_COLLECTION: str = "ai_cache"
+    
+    # Historial del chat con el tutor
+    CHAT_MEMORY_MAX_SESSIONS: int = 1000
+    CHAT_SESSION_IDLE_SECONDS: int = 86400
+    CHAT_HISTORY_MAX_MESSAGES: int = 20
+    CHAT_HISTORY_MAX_CHARS: int = 8000
+    CHAT_HISTORY_KEEP_RECENT: int = 6  # mensajes que se conservan al compactar
+    CHAT_CONVERSATION_COLLECTION: str = "conversations"
+    
+    # Caché semántica del chat (preguntas casi iguales en el primer turno)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.8  # similitud coseno mínima
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    SEMANTIC_CACHE_DIMENSIONS: int = 2048
+    SEMANTIC_CACHE_TTL_SECONDS: int = 86400
+    
+    # Pool de preguntas adaptativas pre-generadas
+    QUESTION_POOL_ENABLED: bool = True
+    QUESTION_POOL_SIZE: int = 5
+    QUESTION_POOL_LOW_WATER: int = 2
+    QUESTION_POOL_WORKERS: int = 2
+    QUESTION_POOL_MAX_KEYS: int = 200
+    QUESTION_POOL_WARM_LIMIT: int = 200
+    QUESTION_POOL_TTL_SECONDS: int = 604800
+    QUESTION_POOL_COLLECTION: str = "question_pool"
+    
+    # Cola de trabajos de IA largos (planes de estudio y análisis)
+    AI_JOB_WORKERS: int = 2
+    AI_JOB_MAX_PENDING: int = 100
+    AI_JOB_RESULT_TTL_SECONDS: int = 86400
+    AI_JOB_STALE_SECONDS: int = 600  # un trabajo activo sin cambios se da por abandonado
+    AI_JOB_MAX_WAIT_SECONDS: float = 25.0  # tope del long-polling
+    AI_JOB_COLLECTION: str = "ai_jobs"
+    
+    # Memoización de resultados por usuario (se invalidan al cambiar su dataVersion)
+    AI_MEMO_ENABLED: bool = True
+    AI_MEMO_ANALYSIS_TTL_SECONDS: int = 604800  # 7 días
+    AI_MEMO_STUDY_PLAN_TTL_SECONDS: int = 604800
+    AI_MEMO_FEEDBACK_TTL_SECONDS: int = 21600  # 6 horas
+    AI_MEMO_COLLECTION: str = "ai_memo"
+    
+    # Banco de preguntas ya generadas (respaldo con el circuito abierto)
+    QUESTION_BANK_COLLECTION: str = "question_bank"
+    QUESTION_BANK_TTL_SECONDS: int = 2592000  # 30 días
+    
+    # Formato de las sesiones: "embedded" (preguntas dentro de la sesión) o "bucketed"
+    # (cabecera liviana + cubetas de resultados; ver scripts/migrate_to_buckets.py)
+    SESSION_STORAGE_LAYOUT: str = "embedded"
+    QUESTION_BUCKET_SIZE: int = 200  # resultados por cubeta
+    SESSION_BULK_MAX_ITEMS: int = 200  # sesiones por lote en POST /api/sesiones/bulk
+    SESSIONS_PAGE_MAX: int = 100  # tope de sesiones por página del historial
+    SESSIONS_STREAM_BATCH_SIZE: int = 100  # documentos por lote en el historial NDJSON
+    
+    # Captura de tráfico real para reproducirlo (app/core/traffic_capture.py, benchmarks/replay.py)
+    TRAFFIC_CAPTURE_ENABLED: bool = False
+    TRAFFIC_CAPTURE_DIR: str = "traces"
+    TRAFFIC_CAPTURE_SAMPLE_RATE: float = 1.0  # fracción de peticiones que se registran
+    TRAFFIC_CAPTURE_MAX_FILE_MB: int = 50  # además se rota cada hora
+    TRAFFIC_CAPTURE_MAX_FILES: int = 168  # una semana de archivos por hora
+    TRAFFIC_CAPTURE_MAX_BODY_BYTES: int = 262144  # cuerpos más grandes solo registran su tamaño
+    
+    # Perfil de peticiones individuales (app/core/profiling.py); sin token ni muestreo no se instala
+    PROFILING_TOKEN: str = ""  # valor esperado en el header X-Profile
+    PROFILING_SAMPLE_RATE: float = 0.0  # fracción de peticiones perfiladas al azar
+    PROFILING_MIN_GAP_SECONDS: float = 60.0  # separación mínima entre perfiles al azar
+    PROFILING_INTERVAL_MS: float = 5.0  # intervalo entre muestras
+    PROFILING_OVERHEAD_BUDGET: float = 0.05  # fracción máxima del tiempo usada en muestrear
+    PROFILING_MAX_SECONDS: float = 30.0  # después deja de muestrear (perfil truncado)
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
+    PROFILING_MAX_TOTAL_MB: int = 50
+    
+    # Caché de perfiles de usuario por proceso (app/db/user_cache.py)
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 5000
+    USER_CACHE_VERIFY_VERSION: bool = False  # compara dataVersion en cada hit (varios workers)
+    
     class Config:
         # Le decimos que lea el archivo .env
         env_file = ".env" 
@@ -0,0 +1,178 @@
+# app/core/metrics.py
+import os
+import time
+from typing import Any, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+# Con gunicorn se define PROMETHEUS_MULTIPROC_DIR (ver gunicorn.conf.py) y cada worker
+# escribe sus métricas en ese directorio; /metrics las suma entre todos los workers.
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "prepia_http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta",
+    ["method", "route", "status"]
+)
+
+GEMINI_CALL_SECONDS = Histogram(
+    "prepia_gemini_call_duration_seconds",
+    "Latencia de las llamadas a Gemini por operación",
+    ["operation", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+)
+
+GEMINI_ERRORS = Counter(
+    "prepia_gemini_errors_total",
+    "Errores de Gemini por operación y tipo",
+    ["operation", "error"]
+)
+
+GEMINI_RETRIES = Counter(
+    "prepia_gemini_retries_total",
+    "Reintentos de llamadas a Gemini por operación",
+    ["operation"]
+)
+
+GEMINI_TOKENS = Counter(
+    "prepia_gemini_tokens_total",
+    "Tokens consumidos según usage_metadata (prompt / response)",
+    ["operation", "kind"]
+)
+
+GEMINI_HEDGES = Counter(
+    "prepia_gemini_hedges_total",
+    "Intentos de hedging lanzados y si ganaron al intento original",
+    ["operation", "outcome"]
+)
+
+AI_FALLBACKS = Counter(
+    "prepia_ai_fallbacks_total",
+    "Respuestas locales servidas con el circuito de Gemini abierto",
+    ["operation", "source"]
+)
+
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "prepia_semantic_cache_lookups_total",
+    "Búsquedas en la caché semántica del chat (hit / miss)",
+    ["outcome"]
+)
+
+USER_CACHE_LOOKUPS = Counter(
+    "prepia_user_cache_lookups_total",
+    "Búsquedas en la caché de perfiles de usuario (hit / miss / shared / stale)",
+    ["outcome"]
+)
+
+CHAT_STREAM_TTFT_SECONDS = Histogram(
+    "prepia_chat_stream_ttft_seconds",
+    "Tiempo hasta el primer fragmento del chat en streaming",
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13)
+)
+
+MONGO_COMMAND_SECONDS = Histogram(
+    "prepia_mongo_command_duration_seconds",
+    "Duración de los comandos de MongoDB por colección",
+    ["collection", "command", "outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+
+def observe_gemini_call(operation: str, started: float, error: Optional[Exception] = None):
+    """Registra la latencia (y el error, si lo hubo) de un intento de llamada a Gemini"""
+    outcome = "error" if error is not None else "ok"
+    GEMINI_CALL_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
+    if error is not None:
+        GEMINI_ERRORS.labels(operation, type(error).__name__).inc()
+
+
+def observe_gemini_usage(operation: str, response: Any):
+    """Suma los tokens de prompt y respuesta reportados en usage_metadata"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    if prompt_tokens:
+        GEMINI_TOKENS.labels(operation, "prompt").inc(prompt_tokens)
+    if response_tokens:
+        GEMINI_TOKENS.labels(operation, "response").inc(response_tokens)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Listener de pymongo que mide cada comando (Motor lo usa por debajo)"""
+
+    MAX_PENDING = 10000
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"  # comandos sin colección (ping, hello, ...)
+        if len(self._pending) > self.MAX_PENDING:
+            self._pending.clear()
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _observe(self, event, outcome: str):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMAND_SECONDS.labels(collection, event.command_name, outcome).observe(
+            event.duration_micros / 1_000_000
+        )
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI que mide la latencia por plantilla de ruta (no por URL)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_path, str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+
+def render_metrics() -> bytes:
+    """Exporta las métricas (sumando todos los workers si hay modo multiproceso)"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
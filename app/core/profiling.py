@@ -0,0 +1,334 @@
+# app/core/profiling.py
+# Perfil de una sola petición bajo demanda: con el header "X-Profile: <PROFILING_TOKEN>" o
+# por muestreo (PROFILING_SAMPLE_RATE), un hilo aparte toma muestras periódicas de la tarea
+# que atiende la petición. Sigue la cadena de awaits de la corrutina (cr_await), así que el
+# perfil incluye el tiempo esperando a MongoDB o a Gemini, no solo el tiempo de CPU.
+#
+# El resultado usa el formato "collapsed" (una línea por pila: "a;b;c cantidad") que leen
+# flamegraph.pl, speedscope e inferno. Se guarda en PROFILING_DIR (con cuota de archivos y
+# de MB) o se devuelve en lugar de la respuesta con "X-Profile-Output: inline".
+#
+# Pensado para dejarlo en producción: sin token ni muestreo no se instala; hay un solo
+# perfil a la vez por worker, una duración máxima y el hilo espacia sus muestras para no
+# pasar de PROFILING_OVERHEAD_BUDGET (fracción del tiempo que puede quitarle al event loop).
+import asyncio
+import glob
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+PROFILE_HEADER = b"x-profile"
+OUTPUT_HEADER = b"x-profile-output"
+MAX_STACK_DEPTH = 128
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    # Los dos últimos componentes de la ruta bastan para ubicar el archivo
+    path = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{name} ({path}:{frame.f_lineno})"
+
+
+class TaskSampler(threading.Thread):
+    """Toma muestras de la pila lógica (cadena de awaits) de una tarea asyncio"""
+
+    def __init__(self, task: asyncio.Task, loop_thread_id: int, interval: float, budget: float, max_seconds: float):
+        super().__init__(name="profiler", daemon=True)
+        self.task = task
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.budget = budget
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.cost = 0.0
+        self.wall = 0.0
+        self.truncated = False
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        started = time.perf_counter()
+        # La primera muestra tras un intervalo (antes solo se vería el arranque de este hilo)
+        self._stop_event.wait(self.interval)
+        while not self._stop_event.is_set() and not self.task.done():
+            sample_started = time.perf_counter()
+            try:
+                for stack in self._sample():
+                    self.stacks[";".join(stack)] += 1
+                self.samples += 1
+            except Exception:
+                # Una lectura a medio cambiar de la cadena de awaits: se descarta la muestra
+                pass
+            cost = time.perf_counter() - sample_started
+            self.cost += cost
+            if sample_started - started > self.max_seconds:
+                self.truncated = True
+                break
+            # Espaciado para que el costo de muestrear no pase del presupuesto
+            pause = max(self.interval, cost * (1 - self.budget) / self.budget)
+            self._stop_event.wait(pause)
+        self.wall = time.perf_counter() - started
+
+    def _sample(self) -> List[List[str]]:
+        stacks: List[List[str]] = []
+        self._walk_task(self.task, [], stacks)
+        return stacks
+
+    def _walk_task(self, task: asyncio.Task, prefix: List[str], stacks: List[List[str]]):
+        if task.done():
+            stacks.append(prefix + ["<tarea terminada>"])
+            return
+        frames: List[str] = []
+        current = task.get_coro()
+        while current is not None and len(prefix) + len(frames) < MAX_STACK_DEPTH:
+            frame = getattr(current, "cr_frame", None) or getattr(current, "gi_frame", None)
+            if frame is None:
+                # Iterador de un Future (u otro awaitable sin frame): se resuelve abajo
+                break
+            frames.append(frame_label(frame))
+            if getattr(current, "cr_running", False) or getattr(current, "gi_running", False):
+                # Corriendo ahora: el resto de la pila son llamadas síncronas en el hilo del loop
+                stacks.append(prefix + frames + self._sync_frames(frame))
+                return
+            current = getattr(current, "cr_await", None) or getattr(current, "gi_yieldfrom", None)
+
+        # Suspendida: lo que espera la tarea es su _fut_waiter
+        waiter = getattr(task, "_fut_waiter", None)
+        if waiter is None:
+            # Lista para continuar pero el event loop está ocupado con otra cosa
+            stacks.append(prefix + frames + ["<esperando al event loop>"])
+        elif isinstance(waiter, asyncio.Task):
+            self._walk_task(waiter, prefix + frames, stacks)
+        elif getattr(waiter, "_children", None) is not None:
+            # asyncio.gather: una pila por cada hija pendiente
+            pending = [child for child in waiter._children if not child.done()]
+            if not pending:
+                stacks.append(prefix + frames + ["<gather>", "<esperando al event loop>"])
+            for child in pending:
+                if isinstance(child, asyncio.Task):
+                    self._walk_task(child, prefix + frames + ["<gather>"], stacks)
+                else:
+                    stacks.append(prefix + frames + ["<gather>", "<await Future>"])
+        else:
+            stacks.append(prefix + frames + ["<await Future>"])
+
+    def _sync_frames(self, coroutine_frame) -> List[str]:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        labels = []
+        while frame is not None and frame is not coroutine_frame and len(labels) < MAX_STACK_DEPTH:
+            labels.append(frame_label(frame))
+            frame = frame.f_back
+        if frame is None:
+            # La corrutina ya no está en la pila del hilo (terminó entre una lectura y otra)
+            return []
+        labels.reverse()
+        return labels
+
+    def collapsed(self, root: str) -> str:
+        root = root.replace(";", ":")
+        return "".join(f"{root};{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Archivos de perfiles con cuota: se borran los más viejos al pasar el límite"""
+
+    def __init__(self, directory: str, max_files: int, max_bytes: int):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.saved = 0
+        self.pruned = 0
+
+    def save(self, name: str, text: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.saved += 1
+        self._prune()
+        return path
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, "profile-*.collapsed")), key=os.path.getmtime)
+        sizes = {path: os.path.getsize(path) for path in files}
+        total = sum(sizes.values())
+        while files and (len(files) > self.max_files or total > self.max_bytes):
+            oldest = files.pop(0)
+            total -= sizes[oldest]
+            try:
+                os.remove(oldest)
+                self.pruned += 1
+            except OSError:
+                pass
+
+
+class RequestProfiler:
+    """Decide qué peticiones se perfilan y lleva las estadísticas"""
+
+    def __init__(self):
+        self.token = settings.PROFILING_TOKEN
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.store = ProfileStore(
+            settings.PROFILING_DIR,
+            max_files=settings.PROFILING_MAX_FILES,
+            max_bytes=settings.PROFILING_MAX_TOTAL_MB * 1024 * 1024
+        )
+        self._active = 0
+        self._last_sampled = 0.0
+
+        self.profiled = 0
+        self.sampled = 0
+        self.busy = 0
+        self.rejected = 0
+        self.total_cost = 0.0
+        self.total_wall = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def should_profile(self, header_token: Optional[bytes]) -> Optional[str]:
+        """"header", "sample" o None"""
+        if header_token is not None:
+            if self.token and hmac.compare_digest(header_token, self.token.encode("utf-8")):
+                return "header"
+            self.rejected += 1
+            return None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            # Las muestras al azar también se espacian en el tiempo
+            if time.monotonic() - self._last_sampled >= settings.PROFILING_MIN_GAP_SECONDS:
+                return "sample"
+        return None
+
+    def acquire(self, trigger: str) -> bool:
+        # Un solo perfil a la vez por worker
+        if self._active >= 1:
+            self.busy += 1
+            return False
+        self._active += 1
+        if trigger == "sample":
+            self._last_sampled = time.monotonic()
+            self.sampled += 1
+        return True
+
+    def release(self, sampler: TaskSampler):
+        self._active -= 1
+        self.profiled += 1
+        self.total_cost += sampler.cost
+        self.total_wall += sampler.wall
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sampleRate": self.sample_rate,
+            "active": self._active,
+            "profiled": self.profiled,
+            "sampled": self.sampled,
+            "busy": self.busy,
+            "rejected": self.rejected,
+            "saved": self.store.saved,
+            "pruned": self.store.pruned,
+            "overheadPct": round(self.total_cost / self.total_wall * 100, 2) if self.total_wall else 0.0
+        }
+
+
+# Instancia global
+request_profiler = RequestProfiler()
+
+
+def _profile_name(method: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    return f"profile-{stamp}-{method}-{slug}.collapsed"
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila la petición cuando lo pide un header autorizado o el muestreo"""
+
+    def __init__(self, app, profiler: RequestProfiler = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trigger = self.profiler.should_profile(headers.get(PROFILE_HEADER))
+        if trigger is None or not self.profiler.acquire(trigger):
+            await self.app(scope, receive, send)
+            return
+
+        inline = trigger == "header" and headers.get(OUTPUT_HEADER) == b"inline"
+        name = _profile_name(scope["method"], scope["path"])
+        sampler = TaskSampler(
+            asyncio.current_task(),
+            threading.get_ident(),
+            interval=settings.PROFILING_INTERVAL_MS / 1000,
+            budget=settings.PROFILING_OVERHEAD_BUDGET,
+            max_seconds=settings.PROFILING_MAX_SECONDS
+        )
+        response = {"status": 500}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                if inline:
+                    return
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", name.encode("ascii"))]
+            elif inline:
+                # En modo inline la respuesta original se descarta y se envía el perfil
+                return
+            await send(message)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            try:
+                await asyncio.to_thread(sampler.join, 1.0)
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                text = sampler.collapsed(f"{scope['method']} {route}")
+                if inline:
+                    await self._send_inline(send, text, sampler, response["status"], elapsed_ms)
+                else:
+                    await asyncio.to_thread(self.profiler.store.save, name, text)
+            except Exception as e:
+                # El perfil nunca debe romper la petición
+                print(f"⚠️ Error guardando el perfil {name}: {e}")
+            finally:
+                self.profiler.release(sampler)
+
+    async def _send_inline(self, send, text: str, sampler: TaskSampler, status: int, elapsed_ms: float):
+        body = text.encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"x-profiled-status", str(status).encode("ascii")),
+                (b"x-profile-samples", str(sampler.samples).encode("ascii")),
+                (b"x-profile-elapsed-ms", str(elapsed_ms).encode("ascii")),
+                (b"x-profile-truncated", b"1" if sampler.truncated else b"0"),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
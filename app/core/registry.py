@@ -0,0 +1,68 @@
+# app/core/registry.py
+# Registro de servicios pesados: cada uno se crea en su primer uso (no al importar el
+# módulo) y el lifespan de la app cierra los que llegaron a crearse. Así un worker nuevo
+# empieza a atender peticiones sin esperar a inicializar clientes que quizá ni use.
+import inspect
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ServiceRegistry:
+    """Servicios creados bajo demanda, con el tiempo que tomó crear cada uno"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._closers: Dict[str, Callable[[Any], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        # Orden de creación: se cierran al revés
+        self._created: List[str] = []
+        self.init_ms: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None):
+        self._factories[name] = factory
+        if close is not None:
+            self._closers[name] = close
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            started = time.perf_counter()
+            instance = self._factories[name]()
+            self.init_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+            self._instances[name] = instance
+            self._created.append(name)
+        return instance
+
+    def peek(self, name: str) -> Optional[Any]:
+        """La instancia si ya se creó (sin crearla)"""
+        return self._instances.get(name)
+
+    def override(self, name: str, instance: Any):
+        """Reemplaza la instancia (pruebas y benchmarks)"""
+        if name not in self._instances:
+            self._created.append(name)
+        self._instances[name] = instance
+
+    async def aclose(self):
+        for name in reversed(self._created):
+            close = self._closers.get(name)
+            if close is None:
+                continue
+            try:
+                result = close(self._instances[name])
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"⚠️ Error cerrando el servicio '{name}': {e}")
+        self._instances.clear()
+        self._created.clear()
+
+    def stats(self) -> Dict:
+        return {
+            name: {"created": name in self._instances, "initMs": self.init_ms.get(name)}
+            for name in self._factories
+        }
+
+
+# Instancia global
+registry = ServiceRegistry()
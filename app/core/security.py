@@ -0,0 +1,256 @@
+# app/core/security.py
+# Hash de contraseñas con bcrypt fuera del event loop. bcrypt tarda decenas o cientos de
+# milisegundos por llamada (según BCRYPT_ROUNDS) y libera el GIL, así que corre en un pool
+# de hilos propio y acotado: si hay demasiados hashes en cola respondemos 503 en vez de
+# acumular logins y frenar al resto de las peticiones del worker.
+#
+# Tokens de acceso: JWT firmados con SECRET_KEY que llevan id, nombre y nivel del usuario,
+# para que los endpoints de IA no tengan que leer el perfil en MongoDB en cada request.
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import bcrypt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+# bcrypt solo usa los primeros 72 bytes de la contraseña
+BCRYPT_MAX_BYTES = 72
+
+
+class HashingBusyError(Exception):
+    """Demasiados hashes de contraseña en cola"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def hash_password_sync(password: str, rounds: int = None) -> str:
+    """Hashea una contraseña (bloqueante: usar PasswordHasher desde código async)"""
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    return bcrypt.hashpw(_password_bytes(password), salt).decode("utf-8")
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    """Verifica la contraseña plana contra la hasheada (bloqueante)"""
+    try:
+        return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("utf-8"))
+    except Exception as e:
+        print(f"Error al verificar contraseña: {e}")
+        return False
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """Costo con que se generó un hash bcrypt ("$2b$12$..." -> 12); 0 si no se reconoce"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Solo sube el costo: bajar BCRYPT_ROUNDS nunca debilita los hashes ya guardados"""
+    return hash_rounds(hashed_password) < settings.BCRYPT_ROUNDS
+
+
+class PasswordHasher:
+    """Pool de hilos acotado para bcrypt, con límite de trabajos pendientes"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            # Estimación: lo que tarda el pool en vaciar la cola actual
+            avg_run = self.total_run / self.completed if self.completed else 0.25
+            retry_after = max(1, math.ceil(self._pending * avg_run / self.workers))
+            raise HashingBusyError("Demasiados inicios de sesión simultáneos, intenta de nuevo", retry_after)
+
+        self._pending += 1
+        queued_at = time.perf_counter()
+        timings = {}
+
+        def task():
+            timings["start"] = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings["end"] = time.perf_counter()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, task)
+        finally:
+            self._pending -= 1
+            if "end" in timings:
+                self.completed += 1
+                self.total_wait += timings["start"] - queued_at
+                self.total_run += timings["end"] - timings["start"]
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password_sync, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password_sync, plain_password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "rounds": settings.BCRYPT_ROUNDS,
+            "pending": self._pending,
+            "maxPending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self.total_wait / self.completed * 1000, 1) if self.completed else 0.0,
+            "avgRunMs": round(self.total_run / self.completed * 1000, 1) if self.completed else 0.0
+        }
+
+
+# Instancia global
+password_hasher = PasswordHasher(
+    workers=settings.BCRYPT_WORKERS,
+    max_pending=settings.BCRYPT_MAX_PENDING
+)
+
+
+def create_access_token(user: Dict) -> Tuple[str, int]:
+    """JWT firmado con los datos del perfil que usan los endpoints; devuelve (token, segundos de vigencia)"""
+    now = datetime.utcnow()
+    expires_in = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    claims = {
+        "sub": str(user["_id"]),
+        "name": user.get("name", ""),
+        "level": user.get("level", "principiante"),
+        # Versión del perfil: sube al cambiar nombre o nivel (PUT /api/usuarios/{id})
+        "pv": user.get("profileVersion", 0),
+        "iat": now,
+        "exp": now + timedelta(seconds=expires_in)
+    }
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM), expires_in
+
+
+class TokenVerifier:
+    """Verifica tokens localmente y recuerda los ya verificados hasta que vencen"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # token -> claims (el vencimiento está en claims["exp"])
+        self._verified: "OrderedDict[str, Dict]" = OrderedDict()
+        # user_id -> última profileVersion conocida en este proceso (login y PUT del perfil)
+        self._profile_versions: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.stale_profiles = 0
+
+    def verify(self, token: str) -> Dict:
+        """Claims del token; JWTError si la firma no es válida o ya venció"""
+        claims = self._verified.get(token)
+        if claims is not None:
+            if claims["exp"] > time.time():
+                self._verified.move_to_end(token)
+                self.hits += 1
+                return claims
+            del self._verified[token]
+
+        self.misses += 1
+        try:
+            claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            self.rejected += 1
+            raise
+        self._verified[token] = claims
+        while len(self._verified) > self.max_entries:
+            self._verified.popitem(last=False)
+        return claims
+
+    def note_profile_version(self, user_id: str, version: int):
+        """Registra la versión del perfil recién leída o escrita en MongoDB (solo sube)"""
+        self._profile_versions[user_id] = max(version, self._profile_versions.get(user_id, version))
+        self._profile_versions.move_to_end(user_id)
+        while len(self._profile_versions) > self.max_entries:
+            self._profile_versions.popitem(last=False)
+
+    def profile_is_current(self, claims: Dict) -> bool:
+        """False si el token es anterior al último cambio de nombre o nivel conocido"""
+        if "pv" not in claims:
+            # Token emitido antes de que existiera profileVersion
+            return False
+        known = self._profile_versions.get(claims["sub"])
+        if known is not None and claims["pv"] < known:
+            self.stale_profiles += 1
+            return False
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._verified),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "knownProfileVersions": len(self._profile_versions),
+            "staleProfiles": self.stale_profiles
+        }
+
+
+# Instancia global
+token_verifier = TokenVerifier(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def get_token_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)
+) -> Optional[Dict]:
+    """Claims del token Bearer, o None si la petición no trae token (clientes antiguos)"""
+    if credentials is None:
+        return None
+    try:
+        return token_verifier.verify(credentials.credentials)
+    except JWTError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token inválido o vencido",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+def profile_from_claims(claims: Optional[Dict], user_id: str) -> Optional[Dict]:
+    """Nombre y nivel del token si es del mismo usuario y su perfil no cambió; si no, None.
+
+    Un token de otro usuario es un 403. El token lleva la profileVersion con que se emitió
+    y el PUT del perfil emite uno nuevo; un token anterior a la última versión conocida por
+    este proceso vuelve a leer el perfil. Cada worker aprende la versión en el login, en el
+    PUT y en cada lectura del usuario por user_cache.
+    """
+    if claims is None:
+        return None
+    if claims.get("sub") != user_id:
+        raise HTTPException(status_code=403, detail="El token no corresponde a este usuario")
+    if not token_verifier.profile_is_current(claims):
+        return None
+    return {"_id": user_id, "name": claims.get("name", ""), "level": claims.get("level", "principiante")}
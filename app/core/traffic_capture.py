@@ -0,0 +1,280 @@
+# app/core/traffic_capture.py
+# Captura opcional del tráfico real (TRAFFIC_CAPTURE_ENABLED) para reproducirlo después con
+# benchmarks/replay.py. Cada petición a /api/ se guarda como una línea NDJSON con la ruta,
+# la forma del cuerpo (tipos y largos, nunca el texto), la duración y el estado; los ids de
+# usuario y los emails se guardan como HMAC con SECRET_KEY y las contraseñas no se guardan.
+# Los archivos rotan por tamaño y por hora y se conserva un número máximo de ellos.
+import asyncio
+import glob
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from app.core.config import settings
+
+# Versión del formato de cada línea (benchmarks/replay.py la verifica)
+TRACE_VERSION = 1
+
+# Campos del cuerpo con tratamiento especial
+USER_ID_FIELDS = {"userId"}
+EMAIL_FIELDS = {"email"}
+SECRET_FIELDS = {"password"}
+# Valores de un conjunto cerrado (materia, nivel, tema): se guardan tal cual porque cambian
+# el comportamiento (cachés y pools por materia) y no identifican a nadie
+CATEGORY_FIELDS = {"subject", "level", "topic", "difficulty"}
+MAX_CATEGORY_LENGTH = 64
+
+# Valores de query que se guardan tal cual (números, flags, listas de campos cortas)
+SAFE_QUERY_VALUE = re.compile(r"^[\w.,-]{0,32}$")
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+
+
+def hash_identifier(value: str) -> str:
+    """HMAC corto y estable: el mismo usuario da el mismo valor en todas las trazas"""
+    digest = hmac.new(settings.SECRET_KEY.encode("utf-8"), value.encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:16]
+
+
+def _datetime_offset(value: str, now: datetime) -> Optional[float]:
+    """Segundos entre la fecha del cuerpo y el momento de la petición (None si no es fecha)"""
+    if not ISO_DATETIME.match(value):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return round((parsed - now).total_seconds(), 1)
+
+
+def body_shape(value: Any, now: datetime, key: str = "") -> Any:
+    """Estructura del cuerpo sin su contenido.
+
+    Textos -> {"$str": largo}; fechas -> {"$datetime": segundos respecto de la petición}
+    ({"$date": días} si no tienen hora); materia, nivel y tema se guardan tal cual;
+    userId -> {"$user": hash}; email -> {"$email": hash}; contraseña -> {"$secret": true};
+    listas -> {"$list": largo, "$item": forma del primer elemento}. Números, booleanos y
+    null se guardan como están (puntajes, cantidades, flags).
+    """
+    if isinstance(value, dict):
+        return {k: body_shape(v, now, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return {"$list": len(value), "$item": body_shape(value[0], now, key) if value else None}
+    if isinstance(value, str):
+        if key in SECRET_FIELDS:
+            return {"$secret": True}
+        if key in USER_ID_FIELDS:
+            return {"$user": hash_identifier(value)}
+        if key in EMAIL_FIELDS:
+            return {"$email": hash_identifier(value.lower())}
+        if key in CATEGORY_FIELDS and len(value) <= MAX_CATEGORY_LENGTH:
+            return value
+        if ISO_DATE.match(value):
+            try:
+                return {"$date": (datetime.strptime(value, "%Y-%m-%d").date() - now.date()).days}
+            except ValueError:
+                return {"$str": len(value)}
+        offset = _datetime_offset(value, now)
+        if offset is not None:
+            return {"$datetime": offset}
+        return {"$str": len(value)}
+    return value
+
+
+def sanitize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Parámetros de ruta: user_id se guarda como hash, el resto solo con su largo"""
+    sanitized = {}
+    for name, value in params.items():
+        if name == "user_id":
+            sanitized[name] = {"$user": hash_identifier(str(value))}
+        else:
+            sanitized[name] = {"$str": len(str(value))}
+    return sanitized
+
+
+def sanitize_query(query_string: bytes) -> Dict[str, Any]:
+    sanitized = {}
+    for name, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        sanitized[name] = value if SAFE_QUERY_VALUE.match(value) else {"$str": len(value)}
+    return sanitized
+
+
+class TraceWriter:
+    """Escribe trazas en archivos NDJSON rotativos, en lotes y fuera del event loop"""
+
+    def __init__(self, directory: str, max_file_bytes: int, max_files: int,
+                 flush_lines: int = 200, flush_seconds: float = 5.0):
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.flush_lines = flush_lines
+        self.flush_seconds = flush_seconds
+
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._tasks: set = set()
+        self._path: Optional[str] = None
+        self._hour: Optional[str] = None
+        self._bytes = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.files_rotated = 0
+
+    def write(self, record: Dict):
+        # Si el disco no da abasto no acumulamos sin límite
+        if len(self._buffer) >= self.flush_lines * 20:
+            self.dropped += 1
+            return
+        self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        if len(self._buffer) >= self.flush_lines or time.monotonic() - self._last_flush >= self.flush_seconds:
+            task = asyncio.create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            try:
+                await asyncio.to_thread(self._append, lines)
+                self.written += len(lines)
+            except Exception as e:
+                self.dropped += len(lines)
+                print(f"⚠️ Error guardando trazas de tráfico: {e}")
+
+    def _append(self, lines: List[str]):
+        hour = datetime.utcnow().strftime("%Y%m%d-%H")
+        if self._path is None or hour != self._hour or self._bytes >= self.max_file_bytes:
+            self._rotate(hour)
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with open(self._path, "ab") as f:
+            f.write(data)
+        self._bytes += len(data)
+
+    def _rotate(self, hour: str):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        self._path = os.path.join(self.directory, f"traces-{stamp}-{os.getpid()}.ndjson")
+        self._hour = hour
+        self._bytes = 0
+        self.files_rotated += 1
+        # Los nombres llevan la fecha: ordenados alfabéticamente, los primeros son los más viejos
+        files = sorted(glob.glob(os.path.join(self.directory, "traces-*.ndjson")))
+        for old in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    async def close(self):
+        await self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "currentFile": self._path,
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "filesRotated": self.files_rotated
+        }
+
+
+# Instancia global
+trace_writer = TraceWriter(
+    directory=settings.TRAFFIC_CAPTURE_DIR,
+    max_file_bytes=settings.TRAFFIC_CAPTURE_MAX_FILE_MB * 1024 * 1024,
+    max_files=settings.TRAFFIC_CAPTURE_MAX_FILES
+)
+
+
+class TrafficCaptureMiddleware:
+    """Middleware ASGI que registra la forma y la duración de cada petición a /api/"""
+
+    def __init__(self, app, writer: TraceWriter = None, sample_rate: float = None):
+        self.app = app
+        self.writer = writer or trace_writer
+        self.sample_rate = settings.TRAFFIC_CAPTURE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_body_bytes = settings.TRAFFIC_CAPTURE_MAX_BODY_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/api/")
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        started = time.perf_counter()
+        chunks: List[bytes] = []
+        size = {"request": 0, "response": 0}
+        response = {"status": 500, "firstByteMs": None}
+
+        async def receive_and_copy():
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                size["request"] += len(body)
+                if size["request"] <= self.max_body_bytes:
+                    chunks.append(body)
+            return message
+
+        async def send_and_measure(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                if response["firstByteMs"] is None:
+                    response["firstByteMs"] = round((time.perf_counter() - started) * 1000, 1)
+                size["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_copy, send_and_measure)
+        finally:
+            try:
+                self.writer.write(self._record(scope, started_at, started, chunks, size, response))
+            except Exception as e:
+                # La captura nunca debe romper la petición
+                print(f"⚠️ Error registrando traza: {e}")
+
+    def _record(self, scope, started_at, started, chunks, size, response) -> Dict:
+        route = scope.get("route")
+        headers = dict(scope.get("headers") or [])
+        record = {
+            "v": TRACE_VERSION,
+            "ts": round(started_at, 3),
+            "method": scope["method"],
+            "route": getattr(route, "path", None) or "unmatched",
+            "params": sanitize_params(scope.get("path_params") or {}),
+            "query": sanitize_query(scope.get("query_string", b"")),
+            "auth": b"authorization" in headers,
+            "status": response["status"],
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "firstByteMs": response["firstByteMs"],
+            "requestBytes": size["request"],
+            "responseBytes": size["response"]
+        }
+        if size["request"]:
+            if size["request"] > self.max_body_bytes:
+                record["body"] = {"$truncated": size["request"]}
+            else:
+                try:
+                    record["body"] = body_shape(json.loads(b"".join(chunks)), datetime.utcfromtimestamp(started_at))
+                except ValueError:
+                    record["body"] = {"$raw": size["request"]}
+        return record
@@ -0,0 +1,163 @@
+# app/db/analytics.py
+# Agregaciones de sesiones calculadas en MongoDB: solo viajan los números del resumen,
+# no los documentos completos. Requiere startTime/endTime como fechas BSON; las sesiones
+# que aún las tienen como strings se omiten (ver scripts/migrate_session_dates.py).
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+
+# Franjas del día (hora local) para los horarios preferidos
+TIME_OF_DAY_BRANCHES = [
+    (6, "madrugada"),
+    (12, "mañana"),
+    (19, "tarde"),
+]
+TIME_OF_DAY_DEFAULT = "noche"
+
+# Solo sesiones con fechas BSON: $subtract, $hour y $dateToString fallan con strings
+DATED_SESSIONS = {"startTime": {"$type": "date"}, "endTime": {"$type": "date"}}
+
+
+async def ensure_indexes(db):
+    try:
+        # También sirve a la paginación del historial (startTime, _id)
+        await db["sessions"].create_index([("userId", 1), ("startTime", -1), ("_id", -1)])
+    except Exception as e:
+        print(f"⚠️ No se pudo crear el índice de sesiones: {e}")
+
+
+def local_midnight_utc(now: datetime = None) -> datetime:
+    """Inicio del día de hoy en la zona horaria de los estudiantes, expresado en UTC (naive)"""
+    tz = ZoneInfo(settings.TIMEZONE)
+    local_now = (now or datetime.utcnow()).replace(tzinfo=ZoneInfo("UTC")).astimezone(tz)
+    midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+
+def _session_fields() -> Dict:
+    """Campos calculados por sesión: minutos, preguntas, aciertos, día y hora locales"""
+    return {
+        "$project": {
+            "subject": 1,
+            "startTime": 1,
+            "minutes": {"$max": [0, {"$floor": {"$divide": [{"$subtract": ["$endTime", "$startTime"]}, 60000]}}]},
+            # Contadores de la cabecera; las sesiones antiguas sin ellos cuentan su lista embebida
+            "questions": {"$ifNull": ["$questionCount", {"$size": {"$ifNull": ["$questions", []]}}]},
+            "correct": {"$ifNull": ["$correctCount", {"$size": {"$filter": {"input": {"$ifNull": ["$questions", []]}, "cond": "$$this.correct"}}}]},
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$startTime", "timezone": settings.TIMEZONE}},
+            "hour": {"$hour": {"date": "$startTime", "timezone": settings.TIMEZONE}}
+        }
+    }
+
+
+def _time_of_day() -> Dict:
+    return {
+        "$switch": {
+            "branches": [{"case": {"$lt": ["$hour", limit]}, "then": name} for limit, name in TIME_OF_DAY_BRANCHES],
+            "default": TIME_OF_DAY_DEFAULT
+        }
+    }
+
+
+def _by_day_stage(since: datetime) -> List[Dict]:
+    return [
+        {"$match": {"startTime": {"$gte": since}}},
+        {"$group": {
+            "_id": "$day",
+            "sessions": {"$sum": 1},
+            "minutes": {"$sum": "$minutes"},
+            "questions": {"$sum": "$questions"},
+            "correct": {"$sum": "$correct"}
+        }},
+        {"$sort": {"_id": -1}}
+    ]
+
+
+def current_streak(days: List[str], today: date) -> int:
+    """Días consecutivos con práctica que terminan hoy (o ayer, si hoy aún no practicó)"""
+    active = set(days)
+    cursor = today if today.isoformat() in active else today - timedelta(days=1)
+    streak = 0
+    while cursor.isoformat() in active:
+        streak += 1
+        cursor -= timedelta(days=1)
+    return streak
+
+
+def _local_today() -> date:
+    return datetime.now(ZoneInfo(settings.TIMEZONE)).date()
+
+
+async def session_summary(db, user_id: str, streak_days: int = 60) -> Dict:
+    """Totales, rendimiento por materia, actividad por día y horarios preferidos del usuario"""
+    since = local_midnight_utc() - timedelta(days=streak_days)
+    pipeline = [
+        {"$match": {"userId": user_id, **DATED_SESSIONS}},
+        _session_fields(),
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "sessions": {"$sum": 1},
+                "minutes": {"$sum": "$minutes"},
+                "questions": {"$sum": "$questions"},
+                "correct": {"$sum": "$correct"}
+            }}],
+            "bySubject": [
+                {"$group": {
+                    "_id": "$subject",
+                    "sessions": {"$sum": 1},
+                    "minutes": {"$sum": "$minutes"},
+                    "questions": {"$sum": "$questions"},
+                    "correct": {"$sum": "$correct"}
+                }},
+                {"$sort": {"sessions": -1}}
+            ],
+            "byDay": _by_day_stage(since),
+            "timeOfDay": [
+                {"$group": {"_id": _time_of_day(), "sessions": {"$sum": 1}}},
+                {"$sort": {"sessions": -1}}
+            ]
+        }}
+    ]
+    result = (await db["sessions"].aggregate(pipeline).to_list(1))[0]
+
+    totals = result["totals"][0] if result["totals"] else {"sessions": 0, "minutes": 0, "questions": 0, "correct": 0}
+    return {
+        "sessionsCount": totals["sessions"],
+        "totalMinutes": totals["minutes"],
+        "questionsAnswered": totals["questions"],
+        "correctAnswers": totals["correct"],
+        "subjects": {
+            row["_id"]: {
+                "sessions": row["sessions"],
+                "minutes": row["minutes"],
+                "accuracy": round(row["correct"] / row["questions"] * 100, 1) if row["questions"] else 0.0
+            }
+            for row in result["bySubject"] if row["_id"]
+        },
+        "days": [{"date": row["_id"], "sessions": row["sessions"], "minutes": row["minutes"]} for row in result["byDay"]],
+        "preferredTimes": [row["_id"] for row in result["timeOfDay"][:2]],
+        "streak": current_streak([row["_id"] for row in result["byDay"]], _local_today())
+    }
+
+
+async def today_performance(db, user_id: str, streak_days: int = 60) -> Dict:
+    """Preguntas, aciertos y minutos de hoy (hora local), más la racha actual"""
+    since = local_midnight_utc() - timedelta(days=streak_days)
+    pipeline = [
+        {"$match": {"userId": user_id, **DATED_SESSIONS, "startTime": {"$gte": since}}},
+        _session_fields(),
+        *_by_day_stage(since)
+    ]
+    days = await db["sessions"].aggregate(pipeline).to_list(streak_days + 1)
+
+    today = _local_today()
+    today_row = next((row for row in days if row["_id"] == today.isoformat()), None) or {}
+    return {
+        "questionsAnswered": today_row.get("questions", 0),
+        "correctAnswers": today_row.get("correct", 0),
+        "timeSpent": today_row.get("minutes", 0),
+        "streak": current_streak([row["_id"] for row in days], today)
+    }
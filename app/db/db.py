@@ -1,6 +1,7 @@
 # app/db.py
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from app.core.metrics import mongo_command_metrics
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -15,7 +16,7 @@ async def connect_to_mongo():
     """Conectar a MongoDB"""
     print("🔌 Conectando a MongoDB...")
     try:
-        db.client = AsyncIOMotorClient(settings.MONGODB_URL)
+        db.client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[mongo_command_metrics])
         # Verificar conexión
         await db.client.admin.command('ping')
         print("✅ MongoDB conectado exitosamente")
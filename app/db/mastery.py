@@ -0,0 +1,111 @@
+# app/db/mastery.py
+# Contadores de dominio por usuario (materias y temas), actualizados con $inc al guardar
+# cada sesión: los endpoints de IA leen un solo documento pequeño en vez de recorrer sesiones.
+import re
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+
+from app.db.session_store import attach_questions
+
+MASTERY_COLLECTION = "user_mastery"
+
+# Sesiones que forman la ventana de "rendimiento reciente"
+RECENT_WINDOW = 10
+
+_UNSAFE_KEY = re.compile(r"[.$]")
+
+
+def counter_key(name: str) -> str:
+    """Nombre usable como campo de MongoDB (sin '.' ni '$')"""
+    return _UNSAFE_KEY.sub("_", name.strip())[:100]
+
+
+def summarize_questions(questions: Iterable[Dict]) -> Dict:
+    """Aciertos y total de una sesión, en general y por tema (con el nombre original del tema)"""
+    summary = {"correct": 0, "total": 0, "topics": {}}
+    for q in questions:
+        correct = 1 if q.get("correct") else 0
+        summary["total"] += 1
+        summary["correct"] += correct
+        topic = q.get("topic")
+        if topic and counter_key(topic):
+            stats = summary["topics"].setdefault(counter_key(topic), {"correct": 0, "total": 0, "name": topic.strip()[:100]})
+            stats["total"] += 1
+            stats["correct"] += correct
+    return summary
+
+
+async def record_sessions(db, user_id: str, sessions: Iterable[Tuple[str, Iterable[Dict], datetime]]):
+    """Suma varias sesiones (materia, preguntas, inicio) del usuario en una sola escritura atómica"""
+    increments: Dict[str, int] = {}
+    # Nombre original de cada tema: la clave del contador no lleva "." ni "$"
+    names: Dict[str, str] = {}
+    recent = []
+    for subject, questions, start_time in sessions:
+        summary = summarize_questions(questions)
+        if summary["total"] == 0:
+            continue
+        subject_key = counter_key(subject) or "general"
+        session_increments = {
+            "totals.correct": summary["correct"],
+            "totals.total": summary["total"],
+            f"subjects.{subject_key}.correct": summary["correct"],
+            f"subjects.{subject_key}.total": summary["total"],
+            "sessionsCounted": 1
+        }
+        for topic, stats in summary["topics"].items():
+            session_increments[f"topics.{topic}.correct"] = stats["correct"]
+            session_increments[f"topics.{topic}.total"] = stats["total"]
+            names[f"topics.{topic}.name"] = stats["name"]
+        for key, value in session_increments.items():
+            increments[key] = increments.get(key, 0) + value
+        recent.append({**summary, "subject": subject_key, "startTime": start_time})
+
+    if not recent:
+        return
+    await db[MASTERY_COLLECTION].update_one(
+        {"_id": user_id},
+        {
+            "$inc": increments,
+            # Ventana deslizante: solo el resumen de las últimas sesiones por fecha de inicio
+            # (una sincronización offline tardía no desplaza a sesiones más nuevas)
+            "$push": {"recent": {"$each": recent, "$sort": {"startTime": 1}, "$slice": -RECENT_WINDOW}},
+            "$set": {**names, "updatedAt": datetime.utcnow()}
+        },
+        upsert=True
+    )
+
+
+def _merge_window(summaries: Iterable[Dict]) -> Dict:
+    merged = {"correct": 0, "total": 0, "topics": {}}
+    for summary in summaries:
+        merged["correct"] += summary.get("correct", 0)
+        merged["total"] += summary.get("total", 0)
+        for topic, stats in summary.get("topics", {}).items():
+            target = merged["topics"].setdefault(topic, {"correct": 0, "total": 0, "name": stats.get("name", topic)})
+            target["correct"] += stats.get("correct", 0)
+            target["total"] += stats.get("total", 0)
+    return merged
+
+
+async def recent_performance(db, user_id: str) -> Dict:
+    """Aciertos y temas de las últimas sesiones: {"correct", "total", "topics": {tema: {...}}}"""
+    mastery = await db[MASTERY_COLLECTION].find_one({"_id": user_id}, {"recent": 1})
+    if mastery is not None:
+        return _merge_window(mastery.get("recent", []))
+
+    # Usuarios sin contadores todavía (ver scripts/backfill_mastery.py): recorremos sesiones
+    recent_sessions = await db["sessions"].find(
+        {"userId": user_id}, {"questions.correct": 1, "questions.topic": 1}
+    ).sort("startTime", -1).limit(RECENT_WINDOW).to_list(RECENT_WINDOW)
+    # Cabeceras del formato bucketed: las preguntas salen de las cubetas
+    await attach_questions(db, user_id, recent_sessions)
+    return _merge_window(summarize_questions(s.get("questions", [])) for s in recent_sessions)
+
+
+def weak_topics(topics: Dict[str, Dict], min_total: int = 3, max_accuracy: float = 0.6) -> list:
+    """Nombres originales de los temas débiles (van al prompt de Gemini)"""
+    return [
+        stats.get("name", topic) for topic, stats in topics.items()
+        if stats["total"] >= min_total and stats["correct"] / stats["total"] < max_accuracy
+    ]
@@ -0,0 +1,200 @@
+# app/db/session_store.py
+# Almacenamiento de sesiones. Dos formatos (SESSION_STORAGE_LAYOUT):
+#   - "embedded": cada sesión guarda su lista completa de preguntas (formato original)
+#   - "bucketed": la sesión es una cabecera liviana con contadores y los resultados de
+#     las preguntas van a "cubetas" por usuario (question_buckets), de hasta
+#     QUESTION_BUCKET_SIZE resultados cada una
+# En ambos formatos la cabecera lleva questionCount/correctCount, así que los lectores
+# que solo necesitan contadores nunca traen la lista de preguntas.
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+
+BUCKETS_COLLECTION = "question_buckets"
+
+# Proyección de las cabeceras: todo menos la lista de preguntas
+HEADER_PROJECTION = {"questions": 0}
+
+# Campos que se pueden pedir en el historial (?fields=...)
+SESSION_FIELDS = (
+    "subject", "startTime", "endTime", "score", "questionCount", "correctCount",
+    "clientSessionId", "questions"
+)
+
+# Orden del historial: más recientes primero, _id desempata sesiones con igual startTime
+HISTORY_SORT = [("startTime", -1), ("_id", -1)]
+
+
+def is_bucketed() -> bool:
+    return settings.SESSION_STORAGE_LAYOUT == "bucketed"
+
+
+def compact_result(session_id: str, question: Dict, answered_at: datetime) -> Dict:
+    """Resultado de una pregunta en formato compacto (sin el texto si hay questionId)"""
+    result = {
+        "sessionId": session_id,
+        "questionId": question.get("questionId"),
+        "topic": question.get("topic"),
+        "correct": bool(question.get("correct")),
+        "timeSpent": question.get("timeSpent", 0),
+        "userAnswer": question.get("userAnswer"),
+        "at": answered_at
+    }
+    if not result["questionId"]:
+        # Sin id, el texto es lo único que identifica la pregunta
+        result["question"] = question.get("question")
+    return result
+
+
+async def push_results(db, user_id: str, results: List[Dict]):
+    """Agrega resultados a la cubeta abierta del usuario (o abre una nueva)"""
+    if not results:
+        return
+    # Una sesión no se reparte entre cubetas: la última puede pasar un poco el tope
+    await db[BUCKETS_COLLECTION].update_one(
+        {"userId": user_id, "count": {"$lt": settings.QUESTION_BUCKET_SIZE}},
+        {
+            "$push": {"results": {"$each": results}},
+            "$inc": {"count": len(results)},
+            "$min": {"firstAt": results[0]["at"]},
+            "$max": {"lastAt": results[-1]["at"]}
+        },
+        upsert=True
+    )
+
+
+def _header(session_dict: Dict) -> Dict:
+    questions = session_dict.get("questions", [])
+    header = {
+        **session_dict,
+        "questionCount": len(questions),
+        "correctCount": sum(1 for q in questions if q.get("correct"))
+    }
+    if is_bucketed():
+        header.pop("questions", None)
+    return header
+
+
+async def insert_session(db, session_dict: Dict) -> str:
+    """Guarda la sesión en el formato configurado y devuelve su id"""
+    result = await db["sessions"].insert_one(_header(session_dict))
+    session_id = str(result.inserted_id)
+
+    if is_bucketed():
+        await push_results(db, session_dict["userId"], [
+            compact_result(session_id, q, session_dict["endTime"]) for q in session_dict.get("questions", [])
+        ])
+    return session_id
+
+
+async def insert_sessions(db, session_dicts: List[Dict]) -> Tuple[List[Optional[str]], Dict[int, str]]:
+    """Guarda varias sesiones con un solo insert_many (ordered=False).
+
+    Devuelve los ids (None en las que fallaron) y los errores por posición.
+    """
+    if not session_dicts:
+        return [], {}
+    headers = [_header(d) for d in session_dicts]
+    errors: Dict[int, str] = {}
+    try:
+        await db["sessions"].insert_many(headers, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            errors[error["index"]] = "duplicate" if error.get("code") == 11000 else error.get("errmsg", "error")
+    # insert_many asigna el _id a cada documento antes de enviarlo
+    ids = [None if i in errors else str(h["_id"]) for i, h in enumerate(headers)]
+
+    if is_bucketed():
+        by_user: Dict[str, List[Dict]] = {}
+        for session_id, d in zip(ids, session_dicts):
+            if session_id is not None:
+                by_user.setdefault(d["userId"], []).extend(
+                    compact_result(session_id, q, d["endTime"]) for q in d.get("questions", [])
+                )
+        size = settings.QUESTION_BUCKET_SIZE
+        for user_id, results in by_user.items():
+            for start in range(0, len(results), size):
+                await push_results(db, user_id, results[start:start + size])
+    return ids, errors
+
+
+def encode_cursor(session: Dict) -> str:
+    """Cursor opaco que apunta justo después de esta sesión en el historial"""
+    start_time = session["startTime"]
+    if isinstance(start_time, datetime):
+        data = {"t": start_time.isoformat(), "id": str(session["_id"])}
+    else:
+        # Sesión antigua con la fecha como string (sin migrar o que no se pudo convertir)
+        data = {"s": str(start_time), "id": str(session["_id"])}
+    raw = json.dumps(data)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """Condición de la página siguiente; ValueError si el cursor no es válido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        start_time = datetime.fromisoformat(data["t"]) if "t" in data else str(data["s"])
+        session_id = ObjectId(data["id"])
+    except Exception:
+        raise ValueError("Cursor inválido")
+    conditions = [
+        {"startTime": {"$lt": start_time}},
+        {"startTime": start_time, "_id": {"$lt": session_id}}
+    ]
+    if isinstance(start_time, datetime):
+        # En orden descendente MongoDB pone los strings después de todas las fechas, y $lt
+        # solo compara valores del mismo tipo: sin esto las sesiones sin migrar no aparecerían
+        conditions.append({"startTime": {"$type": "string"}})
+    return {"$or": conditions}
+
+
+def history_projection(fields: Optional[List[str]], include_questions: bool) -> Optional[Dict]:
+    """Proyección del historial; startTime siempre viaja porque forma el cursor"""
+    if fields:
+        return {field: 1 for field in {*fields, "startTime"}}
+    return None if include_questions else HEADER_PROJECTION
+
+
+async def attach_questions(db, user_id: str, sessions: List[Dict]) -> List[Dict]:
+    """Completa 'questions' de las cabeceras (formato bucketed) con sus resultados"""
+    missing = [str(s["_id"]) for s in sessions if "questions" not in s]
+    if not missing:
+        return sessions
+
+    by_session: Dict[str, List[Dict]] = {}
+    buckets = db[BUCKETS_COLLECTION].find(
+        {"userId": user_id, "results.sessionId": {"$in": missing}},
+        {"results": 1}
+    )
+    async for bucket in buckets:
+        for result in bucket.get("results", []):
+            if result.get("sessionId") in missing:
+                by_session.setdefault(result["sessionId"], []).append(
+                    {k: v for k, v in result.items() if k not in ("sessionId", "at")}
+                )
+    for session in sessions:
+        if "questions" not in session:
+            session["questions"] = by_session.get(str(session["_id"]), [])
+    return sessions
+
+
+async def ensure_indexes(db):
+    try:
+        # Reenvíos de clientes sin conexión: cada clientSessionId se guarda una sola vez
+        await db["sessions"].create_index(
+            [("userId", 1), ("clientSessionId", 1)],
+            unique=True,
+            partialFilterExpression={"clientSessionId": {"$type": "string"}}
+        )
+        await db[BUCKETS_COLLECTION].create_index([("userId", 1), ("count", 1)])
+        await db[BUCKETS_COLLECTION].create_index("results.sessionId")
+    except Exception as e:
+        print(f"⚠️ No se pudieron crear los índices de sesiones/cubetas: {e}")
@@ -0,0 +1,143 @@
+# app/db/user_cache.py
+# Caché de perfiles de usuario por proceso: evita el find_one a MongoDB con que empieza
+# casi cada request. Las escrituras que pasan por nuestro código invalidan o actualizan
+# la entrada; los demás workers de gunicorn la ven vencer por TTL, o antes si se activa
+# la verificación de dataVersion (una lectura proyectada, mucho más liviana).
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import USER_CACHE_LOOKUPS
+from app.core.security import token_verifier
+
+
+class UserCache:
+    """LRU con TTL de documentos de usuario, con deduplicación de lecturas en vuelo"""
+
+    def __init__(self, max_entries: int, ttl: float, verify_version: bool = False, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.verify_version = verify_version
+        self.enabled = enabled
+
+        # user_id -> (instante de expiración, documento)
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        # user_id -> lectura en curso (las demás peticiones la esperan)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, db, user_id: str) -> Optional[Dict]:
+        """Documento del usuario (copia) o None si no existe"""
+        if not self.enabled:
+            user = await db["users"].find_one({"_id": user_id})
+            if user is not None:
+                token_verifier.note_profile_version(user_id, user.get("profileVersion", 0))
+            return user
+
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic() and await self._is_current(db, user):
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                USER_CACHE_LOOKUPS.labels(outcome="hit").inc()
+                return copy.deepcopy(user)
+            self._entries.pop(user_id, None)
+
+        task = self._inflight.get(user_id)
+        if task is not None:
+            self.shared += 1
+            USER_CACHE_LOOKUPS.labels(outcome="shared").inc()
+        else:
+            self.misses += 1
+            USER_CACHE_LOOKUPS.labels(outcome="miss").inc()
+            task = asyncio.create_task(self._load(db, user_id))
+            self._inflight[user_id] = task
+        # shield: si una petición se cancela, la lectura sigue para las demás
+        user = await asyncio.shield(task)
+        return copy.deepcopy(user)
+
+    async def _is_current(self, db, user: Dict) -> bool:
+        """Con verificación activa, compara dataVersion contra MongoDB (lectura proyectada)"""
+        if not self.verify_version:
+            return True
+        current = await db["users"].find_one({"_id": user["_id"]}, {"dataVersion": 1})
+        if current is not None and current.get("dataVersion", 0) == user.get("dataVersion", 0):
+            return True
+        self.stale += 1
+        USER_CACHE_LOOKUPS.labels(outcome="stale").inc()
+        return False
+
+    async def _load(self, db, user_id: str) -> Optional[Dict]:
+        task = asyncio.current_task()
+        try:
+            user = await db["users"].find_one({"_id": user_id})
+            # Si hubo una invalidación mientras leíamos, el resultado puede estar viejo
+            if user is not None and self._inflight.get(user_id) is task:
+                self._store(user)
+            return user
+        finally:
+            if self._inflight.get(user_id) is task:
+                del self._inflight[user_id]
+
+    def _store(self, user: Dict):
+        # Cada lectura del documento le enseña a este worker la versión vigente del perfil
+        # (los tokens anteriores a un cambio de nombre o nivel dejan de usarse)
+        token_verifier.note_profile_version(user["_id"], user.get("profileVersion", 0))
+        self._entries[user["_id"]] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user["_id"])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, user: Dict):
+        """Write-through: guarda el documento recién escrito (debe ser el documento completo)"""
+        if not self.enabled:
+            return
+        self._inflight.pop(user["_id"], None)
+        self._store(copy.deepcopy(user))
+
+    def invalidate(self, user_id: str):
+        """Descarta la entrada tras una escritura parcial del usuario"""
+        self._inflight.pop(user_id, None)
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "verifyVersion": self.verify_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hitRate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Instancia global
+user_cache = UserCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+    verify_version=settings.USER_CACHE_VERIFY_VERSION,
+    enabled=settings.USER_CACHE_ENABLED
+)
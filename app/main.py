@@ -1,17 +1,91 @@
 # app/main.py
 from fastapi import FastAPI, Depends # <-- CORREGIDO: 'Depends' AÑADIDO AQUÍ
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from app.core.config import settings
+from app.core.security import password_hasher
+from app.core.metrics import PrometheusMiddleware, render_metrics, METRICS_CONTENT_TYPE
+from app.core.traffic_capture import TrafficCaptureMiddleware, trace_writer
+from app.core.profiling import ProfilingMiddleware, request_profiler
 from app.db.db import connect_to_mongo, close_mongo_connection, get_database
+from app.db import analytics, session_store
 from app.api.api_v1.endpoints import preguntas, usuarios, api
+from app.services.response_cache import response_cache
+from app.services.question_pool import question_pool
+from app.services.job_queue import job_queue
+from app.services.ai_memo import ai_memo
+from app.services.question_bank import question_bank
+from app.services.gemini_service import get_gemini_service, load_genai
+from app.core.registry import registry
+from contextlib import asynccontextmanager
 from datetime import datetime
+import asyncio
+import time
+
+# Duración de cada paso del arranque (ms), ver scripts/startup_report.py
+startup_report: dict = {}
+_preload_tasks: set = set()
+
+async def startup_event():
+    started = time.perf_counter()
+    steps = [
+        ("mongo", connect_to_mongo),
+        ("responseCacheIndexes", response_cache.ensure_indexes),
+        ("conversationIndexes", lambda: get_gemini_service().conversations.ensure_indexes()),
+        ("questionBankIndexes", question_bank.ensure_indexes),
+        ("memoIndexes", ai_memo.ensure_indexes),
+        ("analyticsIndexes", lambda: _with_db(analytics.ensure_indexes)),
+        ("sessionIndexes", lambda: _with_db(session_store.ensure_indexes)),
+        ("questionPool", question_pool.start),
+        ("jobQueue", job_queue.start),
+    ]
+    for name, step in steps:
+        step_started = time.perf_counter()
+        await step()
+        startup_report[name] = round((time.perf_counter() - step_started) * 1000, 1)
+    startup_report["total"] = round((time.perf_counter() - started) * 1000, 1)
+    
+    if settings.GEMINI_PRELOAD:
+        # El SDK de Gemini se importa en un hilo mientras ya atendemos peticiones
+        task = asyncio.create_task(asyncio.to_thread(load_genai))
+        _preload_tasks.add(task)
+        task.add_done_callback(_preload_tasks.discard)
+    
+    print("=" * 60)
+    print("🚀 PrepIA API - Iniciado correctamente")
+    print("=" * 60)
+    print(f"📚 Documentación: http://{settings.HOST}:{settings.PORT}/docs")
+    print(f"🤖 IA: {settings.GEMINI_MODEL}")
+    print(f"💾 Base de datos: {settings.MONGODB_DB_NAME}")
+    print(f"🌐 Puerto: {settings.PORT}")
+    print(f"⏱️ Arranque: {startup_report['total']} ms")
+    print("=" * 60)
+
+async def _with_db(ensure_indexes):
+    await ensure_indexes(await get_database())
+
+async def shutdown_event():
+    await job_queue.stop()
+    await question_pool.stop()
+    # Cierra los servicios que llegaron a crearse (p. ej. las conversaciones del tutor)
+    await registry.aclose()
+    password_hasher.shutdown()
+    await trace_writer.close()
+    await close_mongo_connection()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_event()
+    yield
+    await shutdown_event()
 
 app = FastAPI(
     title="PrepIA API",
     description="Plataforma preuniversitaria con Google Gemini IA",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS
@@ -21,24 +95,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Access-Token"],
 )
 
-# Eventos de inicio y cierre
-@app.on_event("startup")
-async def startup_event():
-    await connect_to_mongo()
-    print("=" * 60)
-    print("🚀 PrepIA API - Iniciado correctamente")
-    print("=" * 60)
-    print(f"📚 Documentación: http://{settings.HOST}:{settings.PORT}/docs")
-    print(f"🤖 IA: {settings.GEMINI_MODEL}")
-    print(f"💾 Base de datos: {settings.MONGODB_DB_NAME}")
-    print(f"🌐 Puerto: {settings.PORT}")
-    print("=" * 60)
+# Métricas de latencia por ruta (Prometheus)
+app.add_middleware(PrometheusMiddleware)
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    await close_mongo_connection()
+# Captura del tráfico real para reproducirlo con benchmarks/replay.py (opcional)
+if settings.TRAFFIC_CAPTURE_ENABLED:
+    app.add_middleware(TrafficCaptureMiddleware)
+
+# Perfil de peticiones individuales con X-Profile o por muestreo (opcional)
+if request_profiler.enabled:
+    app.add_middleware(ProfilingMiddleware)
 
 # Incluir routers
 app.include_router(api.router)
@@ -75,4 +144,9 @@ async def health_check(db=Depends(get_database)): # <-- AHORA 'Depends' SÍ EST
             "gemini": gemini_status,
             "mongodb": db_status
         }
-    }
\ No newline at end of file
+    }
+
+# Métricas para Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
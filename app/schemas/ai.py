@@ -1,5 +1,5 @@
 # app/schemas/ai.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class ExplanationRequest(BaseModel):
@@ -8,6 +8,7 @@ class ExplanationRequest(BaseModel):
     correctAnswer: str
     subject: str
     userId: str
+    useCache: bool = True
 
 class ExplanationResponse(BaseModel):
     success: bool
@@ -29,9 +30,21 @@ class AdaptiveQuestionResponse(BaseModel):
     success: bool
     question: QuestionResponse
 
+class AdaptiveQuestionBatchRequest(BaseModel):
+    userId: str
+    subject: str
+    count: int = Field(default=10, ge=1, le=20)
+
+class AdaptiveQuestionBatchResponse(BaseModel):
+    success: bool
+    questions: List[QuestionResponse]
+    requested: int
+    dropped: int
+
 class ChatRequest(BaseModel):
     userId: str
     message: str
+    subject: Optional[str] = None  # ámbito de la caché semántica del chat
 
 class ChatResponse(BaseModel):
     success: bool
@@ -48,4 +61,16 @@ class StudyPlanRequest(BaseModel):
 
 class StudyPlanResponse(BaseModel):
     success: bool
-    plan: dict
\ No newline at end of file
+    plan: dict
+
+class JobResponse(BaseModel):
+    success: bool
+    jobId: str
+    kind: str
+    status: str  # queued | running | done | failed
+    attached: bool = False  # True si se unió a un trabajo igual ya en curso
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    retryAfter: Optional[float] = None
+    createdAt: str
+    finishedAt: Optional[str] = None
@@ -1,6 +1,6 @@
 # app/schemas/user.py
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Dict
+from typing import Any, Optional, Dict
 from datetime import datetime
 
 # --- NUEVO ---
@@ -25,6 +25,11 @@ class UserCreate(UserBase):
     email: EmailStr # <-- Asegurarnos de que el email esté al crear
     password: str   # <-- ¡NUEVO! Pedimos la contraseña
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    level: Optional[str] = None
+    goals: Optional[Dict[str, Any]] = None
+
 class User(UserBase):
     id: str = Field(alias="_id")
     scores: Dict[str, float] = {
@@ -45,4 +50,5 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user_id: str
-    user_name: str
\ No newline at end of file
+    user_name: str
+    expires_in: Optional[int] = None  # segundos de vigencia del token
\ No newline at end of file
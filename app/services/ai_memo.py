@@ -0,0 +1,101 @@
+# app/services/ai_memo.py
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.db.db import db
+from app.services.fallbacks import is_fallback
+from app.services.response_cache import make_cache_key
+
+
+class AIMemo:
+    """Resultados de IA por usuario, válidos mientras no cambie su versión de datos"""
+
+    def __init__(self, enabled: bool, ttls: Dict[str, int], collection_name: str):
+        self.enabled = enabled
+        # Ventana de vigencia por tipo de resultado (segundos)
+        self.ttls = ttls
+        self.collection_name = collection_name
+        self.hits: Dict[str, int] = {kind: 0 for kind in ttls}
+        self.misses: Dict[str, int] = {kind: 0 for kind in ttls}
+
+    def _collection(self):
+        if db.client is None:
+            return None
+        return db.client[settings.MONGODB_DB_NAME][self.collection_name]
+
+    async def ensure_indexes(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            print(f"⚠️ No se pudo crear el índice TTL de la memoización: {e}")
+
+    @staticmethod
+    def _key(kind: str, user_id: str, inputs: Dict) -> str:
+        return make_cache_key(f"memo:{kind}", user_id=user_id, inputs=inputs)
+
+    async def get(self, kind: str, user_id: str, version: int, inputs: Dict) -> Optional[Any]:
+        """Resultado guardado para esta versión de los datos del usuario (o None)"""
+        collection = self._collection()
+        if not self.enabled or collection is None:
+            return None
+        try:
+            doc = await collection.find_one({
+                "_id": self._key(kind, user_id, inputs),
+                "version": version,
+                # El monitor TTL de MongoDB borra con retraso: filtramos también aquí
+                "expiresAt": {"$gt": datetime.utcnow()}
+            })
+        except Exception as e:
+            print(f"⚠️ Error leyendo la memoización: {e}")
+            doc = None
+        if doc is None:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return None
+        self.hits[kind] = self.hits.get(kind, 0) + 1
+        return doc["result"]
+
+    async def set(self, kind: str, user_id: str, version: int, inputs: Dict, result: Any):
+        collection = self._collection()
+        # Las respuestas locales (circuito abierto) no se guardan
+        if not self.enabled or collection is None or is_fallback(result):
+            return
+        now = datetime.utcnow()
+        try:
+            await collection.replace_one(
+                {"_id": self._key(kind, user_id, inputs)},
+                {
+                    "userId": user_id,
+                    "kind": kind,
+                    "version": version,
+                    "result": result,
+                    "createdAt": now,
+                    "expiresAt": now + timedelta(seconds=self.ttls.get(kind, 3600))
+                },
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️ Error guardando la memoización: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "ttlSeconds": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Instancia global
+ai_memo = AIMemo(
+    enabled=settings.AI_MEMO_ENABLED,
+    ttls={
+        "analysis": settings.AI_MEMO_ANALYSIS_TTL_SECONDS,
+        "study_plan": settings.AI_MEMO_STUDY_PLAN_TTL_SECONDS,
+        "feedback": settings.AI_MEMO_FEEDBACK_TTL_SECONDS,
+    },
+    collection_name=settings.AI_MEMO_COLLECTION
+)
@@ -0,0 +1,132 @@
+# app/services/circuit_breaker.py
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from app.core.config import settings
+from app.services.gemini_governor import GeminiUnavailableError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(GeminiUnavailableError):
+    """El circuito está abierto: no se llama a Gemini hasta el próximo sondeo"""
+
+
+class CircuitBreaker:
+    """Corta las llamadas a Gemini tras fallos (o lentitud) consecutivos y sondea antes de reabrir"""
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        latency_threshold: float,
+        open_seconds: float,
+        half_open_probes: int
+    ):
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+        self.opens = 0
+        self.rejected = 0
+        self.latency_breaches = 0
+
+    @property
+    def is_open(self) -> bool:
+        self._maybe_half_open()
+        return self.state == OPEN
+
+    def _maybe_half_open(self):
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+
+    def _retry_after(self) -> float:
+        return max(1.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def check(self):
+        """Falla rápido (sin hacer cola) si el circuito está abierto"""
+        self._maybe_half_open()
+        if self.state == OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(
+                "La IA no está disponible en este momento. Intenta de nuevo en unos segundos.",
+                retry_after=self._retry_after()
+            )
+
+    @asynccontextmanager
+    async def attempt(self):
+        """Envuelve un intento real: registra éxito, fallo o lentitud"""
+        self.check()
+        probing = self.state == HALF_OPEN
+        if probing:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(
+                    "La IA se está recuperando. Intenta de nuevo en unos segundos.",
+                    retry_after=1.0
+                )
+            self._probes_in_flight += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self._on_failure()
+            raise
+        else:
+            elapsed = time.monotonic() - started
+            if elapsed > self.latency_threshold:
+                self.latency_breaches += 1
+                self._on_failure()
+            else:
+                self._on_success()
+        finally:
+            if probing:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record_failure(self):
+        """Fallo ocurrido fuera de attempt(), p. ej. un stream que se corta o se detiene a mitad"""
+        self._on_failure()
+
+    def _on_success(self):
+        self._failures = 0
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            print("✅ Circuito de Gemini cerrado: el servicio respondió bien")
+
+    def _on_failure(self):
+        self._failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self.opens += 1
+            print(f"⚠️ Circuito de Gemini abierto tras {self._failures} fallos consecutivos")
+
+    def stats(self) -> Dict:
+        self._maybe_half_open()
+        return {
+            "state": self.state,
+            "consecutiveFailures": self._failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "latencyBreaches": self.latency_breaches,
+            "retryAfterSeconds": round(self._retry_after(), 1) if self.state == OPEN else 0
+        }
+
+
+# Instancia global
+gemini_breaker = CircuitBreaker(
+    failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+    latency_threshold=settings.GEMINI_BREAKER_LATENCY_SECONDS,
+    open_seconds=settings.GEMINI_BREAKER_OPEN_SECONDS,
+    half_open_probes=settings.GEMINI_BREAKER_HALF_OPEN_PROBES
+)
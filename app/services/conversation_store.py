@@ -0,0 +1,300 @@
+# app/services/conversation_store.py
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.db.db import db
+
+Summarizer = Callable[[str, List[Dict]], Awaitable[str]]
+
+# Cota superior para $slice al quitar los turnos ya resumidos
+MAX_STORED_TURNS = 100000
+
+
+def local_summary(previous: str, turns: List[Dict], max_chars: int = 1500) -> str:
+    """Resumen local (sin IA) por si Gemini no está disponible: conserva las dudas del estudiante"""
+    lines = [previous] if previous else []
+    for turn in turns:
+        if turn.get("role") == "user" and turn.get("parts"):
+            lines.append(f"- El estudiante preguntó: {str(turn['parts'][0])[:150]}")
+    return "\n".join(lines)[-max_chars:]
+
+
+def turn_chars(turns: List[Dict]) -> int:
+    return sum(len(str(part)) for turn in turns for part in turn.get("parts", []))
+
+
+class Conversation:
+    """Estado de la conversación de un usuario: resumen acumulado + turnos recientes"""
+
+    __slots__ = ("user_id", "summary", "turns", "version", "compactions", "chars", "last_access")
+
+    def __init__(
+        self,
+        user_id: str,
+        summary: str = "",
+        turns: Optional[List[Dict]] = None,
+        version: int = 0,
+        compactions: int = 0,
+        chars: int = 0
+    ):
+        self.user_id = user_id
+        self.summary = summary
+        self.turns = turns or []
+        self.version = version
+        self.compactions = compactions
+        self.chars = chars
+        self.last_access = time.monotonic()
+
+
+class ConversationStore:
+    """Historial de chat: LRU en memoria por worker + MongoDB compartido entre workers"""
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        max_sessions: int,
+        idle_ttl: int,
+        max_messages: int,
+        max_chars: int,
+        keep_recent: int,
+        collection_name: str
+    ):
+        self.summarizer = summarizer
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.keep_recent = keep_recent
+        self.collection_name = collection_name
+
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._compacting: set = set()
+        self._tasks: set = set()
+
+        self.memory_hits = 0
+        self.mongo_reads = 0
+        self.evictions = 0
+        self.compactions = 0
+        self.compaction_failures = 0
+
+    def _collection(self):
+        if db.client is None:
+            return None
+        return db.client[settings.MONGODB_DB_NAME][self.collection_name]
+
+    async def ensure_indexes(self):
+        """Las conversaciones inactivas expiran solas en MongoDB"""
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.create_index("updatedAt", expireAfterSeconds=self.idle_ttl)
+        except Exception as e:
+            print(f"⚠️ No se pudo crear el índice TTL de conversaciones: {e}")
+
+    async def close(self):
+        """Cancela las compactaciones pendientes"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # --- Lectura ---
+
+    async def load(self, user_id: str) -> Conversation:
+        """Devuelve la conversación; solo trae el documento completo si otro worker la cambió"""
+        self._evict_idle()
+        local = self._sessions.get(user_id)
+
+        collection = self._collection()
+        if collection is not None:
+            query = {"_id": user_id}
+            if local is not None:
+                query["version"] = {"$ne": local.version}
+            try:
+                doc = await collection.find_one(query)
+            except Exception as e:
+                print(f"⚠️ Error leyendo la conversación de MongoDB: {e}")
+                doc = None
+            if doc is not None:
+                local = Conversation(
+                    user_id,
+                    summary=doc.get("summary", ""),
+                    turns=doc.get("turns", []),
+                    version=doc.get("version", 0),
+                    compactions=doc.get("compactions", 0),
+                    chars=doc.get("chars", 0)
+                )
+                self.mongo_reads += 1
+            elif local is not None:
+                self.memory_hits += 1
+        elif local is not None:
+            self.memory_hits += 1
+
+        if local is None:
+            local = Conversation(user_id)
+        self._remember(local)
+        return local
+
+    # --- Escritura ---
+
+    async def append(self, user_id: str, message: str, answer: str):
+        """Agrega un turno completo (pregunta + respuesta) y compacta si supera el presupuesto"""
+        turns = [
+            { "role": "user", "parts": [message] },
+            { "role": "model", "parts": [answer] }
+        ]
+        added_chars = turn_chars(turns)
+        local = self._sessions.get(user_id)
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one_and_update(
+                    {"_id": user_id},
+                    {
+                        "$push": {"turns": {"$each": turns}},
+                        "$inc": {"version": 1, "chars": added_chars, "turnCount": len(turns)},
+                        "$set": {"updatedAt": datetime.utcnow()},
+                        "$setOnInsert": {"summary": "", "compactions": 0}
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                    projection={"version": 1, "chars": 1, "turnCount": 1}
+                )
+            except Exception as e:
+                print(f"⚠️ Error guardando la conversación en MongoDB: {e}")
+                doc = None
+            if doc is not None:
+                if local is not None and doc["version"] == local.version + 1:
+                    local.turns.extend(turns)
+                    local.version = doc["version"]
+                    local.chars = doc["chars"]
+                else:
+                    # Otro worker escribió en medio: la próxima lectura trae el documento
+                    self._sessions.pop(user_id, None)
+                if doc["turnCount"] > self.max_messages or doc["chars"] > self.max_chars:
+                    self._schedule_compaction(user_id)
+                return
+
+        if local is None:
+            local = Conversation(user_id)
+        local.turns.extend(turns)
+        local.version += 1
+        local.chars += added_chars
+        self._remember(local)
+        if len(local.turns) > self.max_messages or local.chars > self.max_chars:
+            self._schedule_compaction(user_id)
+
+    async def clear(self, user_id: str):
+        self._sessions.pop(user_id, None)
+        collection = self._collection()
+        if collection is not None:
+            # Vaciamos en lugar de borrar: así el cambio de versión invalida la copia de otros workers
+            await collection.update_one(
+                {"_id": user_id},
+                {
+                    "$set": {"turns": [], "summary": "", "chars": 0, "turnCount": 0, "updatedAt": datetime.utcnow()},
+                    "$inc": {"version": 1}
+                }
+            )
+
+    # --- Compactación ---
+
+    def _schedule_compaction(self, user_id: str):
+        if user_id in self._compacting:
+            return
+        self._compacting.add(user_id)
+        task = asyncio.create_task(self._compact(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact(self, user_id: str):
+        """Resume los turnos antiguos y deja solo los más recientes en el historial"""
+        try:
+            conversation = await self.load(user_id)
+            older = conversation.turns[:-self.keep_recent] if self.keep_recent else list(conversation.turns)
+            if not older:
+                return
+
+            try:
+                summary = await self.summarizer(conversation.summary, older)
+            except Exception as e:
+                print(f"⚠️ No se pudo resumir la conversación con IA, se usa resumen local: {e}")
+                self.compaction_failures += 1
+                summary = local_summary(conversation.summary, older)
+
+            removed = len(older)
+            removed_chars = turn_chars(older)
+
+            collection = self._collection()
+            if collection is not None:
+                # Filtramos por 'compactions' para que dos workers no compacten lo mismo;
+                # los turnos nuevos se agregan al final, así que quitar los primeros es seguro
+                result = await collection.update_one(
+                    {"_id": user_id, "compactions": conversation.compactions},
+                    [
+                        {"$set": {
+                            "turns": {"$slice": ["$turns", removed, MAX_STORED_TURNS]},
+                            "summary": {"$literal": summary},
+                            "chars": {"$subtract": ["$chars", removed_chars]},
+                            "compactions": {"$add": ["$compactions", 1]},
+                            "version": {"$add": ["$version", 1]},
+                            "updatedAt": datetime.utcnow()
+                        }},
+                        {"$set": {"turnCount": {"$size": "$turns"}}}
+                    ]
+                )
+                if result.modified_count:
+                    self.compactions += 1
+                self._sessions.pop(user_id, None)
+            else:
+                conversation.turns = conversation.turns[removed:]
+                conversation.summary = summary
+                conversation.chars -= removed_chars
+                conversation.compactions += 1
+                conversation.version += 1
+                self.compactions += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.compaction_failures += 1
+            print(f"⚠️ Error compactando la conversación: {e}")
+        finally:
+            self._compacting.discard(user_id)
+
+    # --- Memoria local ---
+
+    def _remember(self, conversation: Conversation):
+        conversation.last_access = time.monotonic()
+        self._sessions[conversation.user_id] = conversation
+        self._sessions.move_to_end(conversation.user_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_idle(self):
+        limit = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            user_id, conversation = next(iter(self._sessions.items()))
+            if conversation.last_access >= limit:
+                break
+            del self._sessions[user_id]
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        return {
+            "memorySessions": len(self._sessions),
+            "maxSessions": self.max_sessions,
+            "memoryHits": self.memory_hits,
+            "mongoReads": self.mongo_reads,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+            "compactionFailures": self.compaction_failures,
+            "compactionsPending": len(self._compacting)
+        }
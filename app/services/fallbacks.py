@@ -0,0 +1,67 @@
+# app/services/fallbacks.py
+# Respuestas locales (sin IA) que se sirven mientras el circuito de Gemini está abierto
+from typing import Any, Dict
+
+
+class FallbackText(str):
+    """Texto generado localmente: se sirve, pero no se guarda como si viniera de la IA"""
+
+
+def is_fallback(value: Any) -> bool:
+    return isinstance(value, FallbackText)
+
+
+def template_explanation(question: str, user_answer: str, correct_answer: str, subject: str) -> str:
+    """Explicación básica armada con los datos de la pregunta"""
+    if user_answer.strip().lower() == correct_answer.strip().lower():
+        verdict = "¡Bien hecho! 🎉 Tu respuesta es correcta."
+    else:
+        verdict = f"Tu respuesta fue «{user_answer}», pero la respuesta correcta es «{correct_answer}»."
+    return FallbackText(f"""{verdict}
+
+📌 Pregunta: {question}
+
+💡 Consejo: vuelve a leer el enunciado identificando los datos clave y compara cada opción con ellos antes de responder. Repasa la teoría de {subject} relacionada con esta pregunta y resuelve un ejercicio similar.
+
+⏳ El tutor con IA está con mucha demanda en este momento; en unos minutos podrás pedir una explicación más detallada.""")
+
+
+def template_feedback(performance: Dict, context: Dict) -> str:
+    """Mensaje motivacional armado con el mismo dict 'performance' que recibe Gemini"""
+    answered = performance.get('questionsAnswered', 0)
+    correct = performance.get('correctAnswers', 0)
+    minutes = performance.get('timeSpent', 0)
+    streak = performance.get('streak', 0)
+    goal = context.get('goal', 'ingresar a la universidad')
+
+    if answered == 0:
+        return FallbackText(
+            f"¡Hola! 👋 Hoy todavía no has practicado. Unos minutos bastan para avanzar: "
+            f"resuelve 5 preguntas de tu materia más débil y acércate a tu meta de {goal}. 🚀"
+        )
+
+    accuracy = correct / answered * 100
+    if accuracy >= 80:
+        highlight = f"¡Excelente precisión de {accuracy:.0f}%! ⭐"
+        tip = "Mañana sube la dificultad con preguntas de nivel difícil."
+    elif accuracy >= 50:
+        highlight = f"Llevas {accuracy:.0f}% de aciertos, ¡vas por buen camino! ⭐"
+        tip = "Mañana repasa los temas donde fallaste hoy antes de practicar."
+    else:
+        highlight = "Cada error de hoy es un tema que ya sabes que debes reforzar. 💪"
+        tip = "Mañana dedica 20 minutos a la teoría y luego practica preguntas fáciles."
+
+    streak_text = f" ¡Y ya son {streak} días seguidos! 🔥" if streak > 1 else ""
+    return FallbackText(
+        f"🎉 ¡Gran trabajo hoy! Respondiste {answered} preguntas ({correct} correctas) "
+        f"en {minutes} minutos.{streak_text} {highlight} 💡 {tip} "
+        f"¡Sigue así, cada día estás más cerca de {goal}! 🚀"
+    )
+
+
+def template_chat_reply() -> str:
+    return FallbackText(
+        "¡Hola! 😊 En este momento estoy atendiendo a muchos estudiantes y no puedo responderte con detalle. "
+        "Mientras tanto, te recomiendo repasar tus temas débiles o resolver algunas preguntas de práctica. "
+        "Vuelve a escribirme en unos minutos. 📚✨"
+    )
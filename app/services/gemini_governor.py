@@ -0,0 +1,332 @@
+# app/services/gemini_governor.py
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import GEMINI_RETRIES
+
+
+class Priority(IntEnum):
+    """Clases de prioridad: un número menor se atiende primero"""
+    INTERACTIVE = 0  # chat y explicaciones
+    ADAPTIVE = 1     # preguntas adaptativas
+    BACKGROUND = 2   # análisis, planes de estudio, feedback y relleno del pool
+
+
+class GeminiUnavailableError(Exception):
+    """La IA no está disponible temporalmente (cuota agotada o demasiada carga)"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(prompt: str, expected_output_tokens: int) -> int:
+    """Estimación aproximada: ~4 caracteres por token más la salida esperada"""
+    return len(prompt) // 4 + expected_output_tokens
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    name = type(error).__name__
+    return name in ("ResourceExhausted", "TooManyRequests") or "429" in str(error)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    name = type(error).__name__
+    return is_rate_limit_error(error) or name in (
+        "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout", "TimeoutError"
+    )
+
+
+_RETRY_HINT_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+]
+
+
+def retry_hint(error: Exception) -> Optional[float]:
+    """Extrae el tiempo de espera sugerido por la API (si lo trae el error)"""
+    text = str(error)
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                continue
+    return None
+
+
+class TokenBucket:
+    """Cubeta de tokens que se recarga de forma continua (límite por minuto)"""
+
+    def __init__(self, per_minute: float):
+        self.unlimited = per_minute <= 0
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Corrige la estimación cuando se conoce el consumo real"""
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+    def available(self) -> float:
+        if self.unlimited:
+            return float("inf")
+        self._refill(time.monotonic())
+        return self.tokens
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: Priority, seq: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class GeminiGovernor:
+    """Regulador central de llamadas a Gemini: límites por minuto, concurrencia y prioridades"""
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_concurrency: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        queue_timeouts: Dict[Priority, float]
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeouts = queue_timeouts
+
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._blocked_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.retries = 0
+        self.rate_limited = 0
+        self.shed = {p: 0 for p in Priority}
+        self._wait_total = {p: 0.0 for p in Priority}
+        self._wait_count = {p: 0 for p in Priority}
+        self._wait_max = {p: 0.0 for p in Priority}
+
+    # --- API pública ---
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, estimated_tokens: int):
+        """Reserva un turno (concurrencia + cuota) durante el bloque"""
+        await self._acquire(priority, estimated_tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def run(
+        self,
+        priority: Priority,
+        estimated_tokens: int,
+        factory: Callable[[], Awaitable[Any]],
+        operation: str = "gemini",
+        max_retries: Optional[int] = None
+    ) -> Any:
+        """Ejecuta la llamada respetando los límites y reintenta errores temporales"""
+        if max_retries is None:
+            max_retries = self.max_retries
+        attempt = 0
+        while True:
+            async with self.slot(priority, estimated_tokens):
+                try:
+                    return await factory()
+                except Exception as e:
+                    error = e
+
+            hint = retry_hint(error)
+            if is_rate_limit_error(error):
+                self.rate_limited += 1
+                if hint:
+                    # Todas las llamadas esperan lo que pide la API, no solo esta
+                    self._block_for(hint)
+
+            if not is_retryable_error(error):
+                raise error
+            if attempt >= max_retries or (hint is not None and hint > self.backoff_max):
+                if is_rate_limit_error(error):
+                    raise GeminiUnavailableError(
+                        "Se alcanzó el límite de uso de la IA. Intenta de nuevo en unos segundos.",
+                        retry_after=hint or self.backoff_max
+                    ) from error
+                raise error
+
+            attempt += 1
+            self.retries += 1
+            GEMINI_RETRIES.labels(operation).inc()
+            await asyncio.sleep(self._backoff_delay(attempt, hint))
+
+    def record_usage(self, estimated_tokens: int, response: Any):
+        """Ajusta la cubeta de tokens con el consumo real reportado por la API"""
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None) if usage is not None else None
+        if actual:
+            self._tokens.adjust(estimated_tokens - actual)
+
+    # --- Internos ---
+
+    def _backoff_delay(self, attempt: int, hint: Optional[float]) -> float:
+        # Backoff exponencial con "full jitter"; si la API sugiere un tiempo, lo respetamos
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if hint is not None:
+            delay = max(delay, hint + random.uniform(0, self.backoff_base))
+        return delay
+
+    def _block_for(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def _acquire(self, priority: Priority, estimated_tokens: int):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), estimated_tokens, loop.create_future())
+        heapq.heappush(self._heap, waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.queue_timeouts[priority])
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Se nos concedió el turno justo al cancelar: lo devolvemos
+                self._release()
+            else:
+                waiter.future.cancel()
+                self._dispatch()
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed[priority] += 1
+                raise GeminiUnavailableError(
+                    "La IA está atendiendo muchas solicitudes. Intenta de nuevo en unos segundos.",
+                    retry_after=self.backoff_base * 2
+                ) from None
+            raise
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._heap:
+            waiter = self._heap[0]
+            if waiter.future.done():
+                heapq.heappop(self._heap)
+                continue
+            if self._active >= self.max_concurrency:
+                return  # _release vuelve a despachar
+            wait = max(
+                self._blocked_until - now,
+                self._requests.time_until(1, now),
+                self._tokens.time_until(waiter.tokens, now)
+            )
+            if wait > 0:
+                self._schedule(wait)
+                return
+            heapq.heappop(self._heap)
+            self._requests.consume(1, now)
+            self._tokens.consume(waiter.tokens, now)
+            self._active += 1
+            self._record_wait(waiter.priority, now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _record_wait(self, priority: Priority, waited: float):
+        self._wait_total[priority] += waited
+        self._wait_count[priority] += 1
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+
+    def stats(self) -> Dict:
+        depth = {p: 0 for p in Priority}
+        for waiter in self._heap:
+            if not waiter.future.done():
+                depth[waiter.priority] += 1
+        return {
+            "active": self._active,
+            "maxConcurrency": self.max_concurrency,
+            "queueDepth": {p.name.lower(): depth[p] for p in Priority},
+            "waitSeconds": {
+                p.name.lower(): {
+                    "avg": round(self._wait_total[p] / self._wait_count[p], 4) if self._wait_count[p] else 0.0,
+                    "max": round(self._wait_max[p], 4)
+                }
+                for p in Priority
+            },
+            "shed": {p.name.lower(): self.shed[p] for p in Priority},
+            "retries": self.retries,
+            "rateLimited": self.rate_limited,
+            "blockedForSeconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+            "requestsAvailable": round(self._requests.available(), 2),
+            "tokensAvailable": round(self._tokens.available(), 2)
+        }
+
+
+# Instancia global
+gemini_governor = GeminiGovernor(
+    requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    max_retries=settings.GEMINI_MAX_RETRIES,
+    backoff_base=settings.GEMINI_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.GEMINI_BACKOFF_MAX_SECONDS,
+    queue_timeouts={
+        Priority.INTERACTIVE: settings.GEMINI_QUEUE_TIMEOUT_INTERACTIVE,
+        Priority.ADAPTIVE: settings.GEMINI_QUEUE_TIMEOUT_ADAPTIVE,
+        Priority.BACKGROUND: settings.GEMINI_QUEUE_TIMEOUT_BACKGROUND,
+    }
+)
@@ -1,38 +1,479 @@
 # app/services/gemini_service.py
-import google.generativeai as genai
+# google.generativeai se importa recién al crear los modelos (tarda cerca de un segundo):
+# el servicio se obtiene con get_gemini_service(), que lo crea en su primer uso.
+import importlib
+import threading
 from app.core.config import settings
-from typing import Dict, List
+from app.core.registry import registry
+from app.services.response_cache import response_cache, make_cache_key
+from app.services.gemini_governor import (
+    gemini_governor, GeminiUnavailableError, Priority, estimate_tokens
+)
+from app.services.circuit_breaker import gemini_breaker, CircuitOpenError
+from app.services.conversation_store import ConversationStore
+from app.services.question_bank import question_bank
+from app.services.semantic_cache import SemanticCache, semantic_cache, depersonalize, personalize
+from app.services.fallbacks import template_chat_reply, template_explanation, template_feedback
+from app.schemas.ai import QuestionResponse
+from app.core.metrics import (
+    AI_FALLBACKS, CHAT_STREAM_TTFT_SECONDS, GEMINI_HEDGES, observe_gemini_call, observe_gemini_usage
+)
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
+import hashlib
 import json
 import re
+import time
+
+def difficulty_for_performance(recent_performance: Dict) -> Tuple[float, str]:
+    """Calcula la precisión reciente y la dificultad que le corresponde"""
+    total = recent_performance.get('total', 1)
+    correct = recent_performance.get('correct', 0)
+    accuracy = (correct / total * 100) if total > 0 else 50
+    
+    difficulty = 'medio'
+    if accuracy > 80:
+        difficulty = 'difícil'
+    elif accuracy < 50:
+        difficulty = 'fácil'
+    return accuracy, difficulty
+
+def validate_question(item: Any) -> Optional[Dict]:
+    """Valida una pregunta generada; devuelve None si está incompleta o mal formada"""
+    if not isinstance(item, dict):
+        return None
+    try:
+        question = QuestionResponse(**item)
+    except Exception:
+        return None
+    if len(question.options) < 2 or not 0 <= question.correct < len(question.options):
+        return None
+    return question.model_dump()
+
+def prompt_fingerprint(model_name: str, json_mode: bool, prompt: str) -> str:
+    """Huella del prompt renderizado (identifica llamadas idénticas al modelo)"""
+    payload = f"{model_name}|{'json' if json_mode else 'text'}|{prompt}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LatencyWindow:
+    """Ventana móvil de latencias (segundos) para calcular percentiles"""
+    
+    def __init__(self, size: int = 500):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+    
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+    
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def stats(self) -> Dict:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "count": self.count,
+            "p50Ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95Ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+class HedgePolicy:
+    """Decide cuándo lanzar un segundo intento (hedge) y cuenta cuántas veces gana"""
+    
+    def __init__(
+        self,
+        enabled: bool,
+        percentile: float,
+        min_delay: float,
+        max_rate: float,
+        min_samples: int = 20
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self._latencies: Dict[str, LatencyWindow] = {}
+        
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_skips = 0
+    
+    def record(self, operation: str, seconds: float):
+        self._latencies.setdefault(operation, LatencyWindow()).add(seconds)
+    
+    def delay_for(self, operation: str) -> Optional[float]:
+        """Plazo tras el cual se lanza el hedge (None si aún no hay datos suficientes)"""
+        window = self._latencies.get(operation)
+        if not self.enabled or window is None or window.count < self.min_samples:
+            return None
+        return max(self.min_delay, window.percentile(self.percentile))
+    
+    def allow_hedge(self) -> bool:
+        # Presupuesto: como máximo max_rate de las llamadas pueden duplicarse
+        if self.hedged + 1 > self.max_rate * self.calls:
+            self.budget_skips += 1
+            return False
+        return True
+    
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedgeRate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "hedgeWins": self.hedge_wins,
+            "winRate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            "budgetSkips": self.budget_skips,
+            "delaysMs": {
+                operation: round(delay * 1000, 1)
+                for operation in self._latencies
+                if (delay := self.delay_for(operation)) is not None
+            }
+        }
+
+async def first_successful(*tasks: asyncio.Task) -> Tuple[Any, asyncio.Task]:
+    """Devuelve el primer resultado exitoso y cancela el resto; si todos fallan, el primer error"""
+    pending = set(tasks)
+    first_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    return task.result(), task
+                first_error = first_error or task.exception()
+        raise first_error or asyncio.CancelledError()
+    finally:
+        for task in pending:
+            task.cancel()
+
+class _InFlightCall:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Agrupa llamadas idénticas concurrentes para que compartan un único resultado"""
+    
+    def __init__(self):
+        self._calls: Dict[str, _InFlightCall] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+    
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _InFlightCall(asyncio.ensure_future(factory()))
+            call.task.add_done_callback(lambda _task, k=key, c=call: self._forget(k, c))
+            self._calls[key] = call
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        
+        call.waiters += 1
+        try:
+            # shield: si un llamador se cancela, la llamada compartida sigue para los demás
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nadie espera ya el resultado: cancelamos la llamada y la olvidamos
+                # para que un llamador nuevo no se una a una tarea cancelada
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+    
+    def _forget(self, key: str, call: _InFlightCall):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+    
+    def stats(self) -> Dict:
+        return {
+            "inFlight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned
+        }
+
+_genai_lock = threading.Lock()
+_genai = None
+
+def load_genai():
+    """Importa y configura google.generativeai una sola vez (se puede llamar desde un hilo)"""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            module = importlib.import_module("google.generativeai")
+            module.configure(api_key=settings.GEMINI_API_KEY)
+            _genai = module
+    return _genai
 
 class GeminiService:
     def __init__(self):
         try:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
+            # Modelos de Gemini: se crean en el primer uso (ver _build_models)
+            self._models: Dict[str, Any] = {}
             
-            # --- ¡CONFIGURACIÓN FINAL! ---
-            # Leerá 'gemini-flash-latest' desde tu config.py
-            self.model_text = genai.GenerativeModel(settings.GEMINI_MODEL)
-            self.model_json = genai.GenerativeModel(
-                settings.GEMINI_MODEL,
-                generation_config={"response_mime_type": "application/json"}
+            self.hedging = HedgePolicy(
+                enabled=settings.GEMINI_HEDGE_ENABLED,
+                percentile=settings.GEMINI_HEDGE_PERCENTILE,
+                min_delay=settings.GEMINI_HEDGE_MIN_DELAY_SECONDS,
+                max_rate=settings.GEMINI_HEDGE_MAX_RATE
             )
             
-            self.conversation_history: Dict[str, List] = {}
-            print(f"✅ Servicio de Gemini inicializado con el modelo: {settings.GEMINI_MODEL}")
+            self.conversations = ConversationStore(
+                summarizer=self.summarize_conversation,
+                max_sessions=settings.CHAT_MEMORY_MAX_SESSIONS,
+                idle_ttl=settings.CHAT_SESSION_IDLE_SECONDS,
+                max_messages=settings.CHAT_HISTORY_MAX_MESSAGES,
+                max_chars=settings.CHAT_HISTORY_MAX_CHARS,
+                keep_recent=settings.CHAT_HISTORY_KEEP_RECENT,
+                collection_name=settings.CHAT_CONVERSATION_COLLECTION
+            )
+            self.cache = response_cache
+            self.semantic_cache = semantic_cache
+            self.single_flight = SingleFlight()
+            self.governor = gemini_governor
+            self.breaker = gemini_breaker
+            self.question_bank = question_bank
+            self.fallbacks: Dict[str, int] = {}
+            self.chat_ttft = LatencyWindow()
         except Exception as e:
             print(f"❌ Error al configurar Gemini: {e}")
             raise
     
+    def _build_models(self):
+        genai = load_genai()
+        # Modelo alternativo para los intentos de hedging (por defecto, el mismo)
+        hedge_model = settings.GEMINI_FALLBACK_MODEL or settings.GEMINI_MODEL
+        specs = {
+            "text": (settings.GEMINI_MODEL, False),
+            "json": (settings.GEMINI_MODEL, True),
+            "hedge_text": (hedge_model, False),
+            "hedge_json": (hedge_model, True),
+        }
+        for kind, (model_name, json_mode) in specs.items():
+            if kind in self._models:
+                continue
+            if json_mode:
+                self._models[kind] = genai.GenerativeModel(
+                    model_name,
+                    generation_config={"response_mime_type": "application/json"}
+                )
+            else:
+                self._models[kind] = genai.GenerativeModel(model_name)
+        print(f"✅ Modelos de Gemini inicializados: {settings.GEMINI_MODEL}")
+    
+    def _model(self, kind: str):
+        if kind not in self._models:
+            self._build_models()
+        return self._models[kind]
+    
+    @property
+    def model_text(self):
+        return self._model("text")
+    
+    @model_text.setter
+    def model_text(self, model):
+        self._models["text"] = model
+    
+    @property
+    def model_json(self):
+        return self._model("json")
+    
+    @model_json.setter
+    def model_json(self, model):
+        self._models["json"] = model
+    
+    @property
+    def hedge_model_text(self):
+        return self._model("hedge_text")
+    
+    @hedge_model_text.setter
+    def hedge_model_text(self, model):
+        self._models["hedge_text"] = model
+    
+    @property
+    def hedge_model_json(self):
+        return self._model("hedge_json")
+    
+    @hedge_model_json.setter
+    def hedge_model_json(self, model):
+        self._models["hedge_json"] = model
+    
+    async def _call_model(
+        self,
+        operation: str,
+        priority: Priority,
+        estimated_tokens: int,
+        factory: Callable[[], Awaitable[Any]],
+        streaming: bool = False,
+        max_retries: Optional[int] = None
+    ) -> Any:
+        """Pasa la llamada por el circuit breaker y el regulador, y registra las métricas de cada intento"""
+        # Con el circuito abierto fallamos al instante, sin ocupar un lugar en la cola
+        self.breaker.check()
+        
+        async def attempt():
+            async with self.breaker.attempt():
+                started = time.perf_counter()
+                try:
+                    if streaming:
+                        response = await factory()
+                    else:
+                        response = await asyncio.wait_for(factory(), timeout=settings.GEMINI_CALL_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError as e:
+                    observe_gemini_call(operation, started, error=e)
+                    if priority == Priority.INTERACTIVE:
+                        # Alguien espera en pantalla: otro intento serían GEMINI_CALL_TIMEOUT_SECONDS
+                        # más (el regulador no reintenta GeminiUnavailableError)
+                        raise self._timeout_error() from e
+                    raise
+                except Exception as e:
+                    observe_gemini_call(operation, started, error=e)
+                    raise
+                observe_gemini_call(operation, started)
+                return response
+        
+        try:
+            response = await self.governor.run(
+                priority, estimated_tokens, attempt, operation=operation, max_retries=max_retries
+            )
+        except asyncio.TimeoutError as e:
+            raise self._timeout_error() from e
+        if not streaming:
+            # En streaming el consumo solo se conoce al terminar de leer la respuesta
+            self.governor.record_usage(estimated_tokens, response)
+            observe_gemini_usage(operation, response)
+        return response
+    
+    def _timeout_error(self) -> GeminiUnavailableError:
+        return GeminiUnavailableError(
+            "La IA está tardando demasiado en responder. Intenta de nuevo en unos segundos.",
+            retry_after=self.breaker.open_seconds
+        )
+    
+    async def _hedged_call(
+        self,
+        operation: str,
+        priority: Priority,
+        estimated_tokens: int,
+        json_mode: bool,
+        prompt: str
+    ) -> Any:
+        """Si la llamada tarda más que el percentil configurado, lanza un segundo intento
+        (al modelo alternativo) y se queda con el que termine primero"""
+        model = self.model_json if json_mode else self.model_text
+        started = time.perf_counter()
+        self.hedging.calls += 1
+        
+        primary = asyncio.ensure_future(self._call_model(
+            operation, priority, estimated_tokens, lambda: model.generate_content_async(prompt)
+        ))
+        delay = self.hedging.delay_for(operation)
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done() or not self.hedging.allow_hedge():
+                response = await primary
+            else:
+                self.hedging.hedged += 1
+                hedge_model = self.hedge_model_json if json_mode else self.hedge_model_text
+                # El hedge es un único intento extra: sin reintentos para no gastar cuota
+                hedge = asyncio.ensure_future(self._call_model(
+                    operation,
+                    priority,
+                    estimated_tokens,
+                    lambda: hedge_model.generate_content_async(prompt),
+                    max_retries=0
+                ))
+                response, winner = await first_successful(primary, hedge)
+                won = winner is hedge
+                if won:
+                    self.hedging.hedge_wins += 1
+                GEMINI_HEDGES.labels(operation, "won" if won else "lost").inc()
+        finally:
+            if not primary.done():
+                primary.cancel()
+        
+        self.hedging.record(operation, time.perf_counter() - started)
+        return response
+    
+    async def _generate(
+        self,
+        prompt: str,
+        json_mode: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+        expected_output_tokens: int = 400,
+        operation: str = "generate"
+    ) -> str:
+        """Llamada al modelo compartida entre peticiones idénticas que están en curso"""
+        fingerprint = prompt_fingerprint(settings.GEMINI_MODEL, json_mode, prompt)
+        estimated_tokens = estimate_tokens(prompt, expected_output_tokens)
+        
+        async def call() -> str:
+            response = await self._hedged_call(operation, priority, estimated_tokens, json_mode, prompt)
+            return response.text
+        
+        return await self.single_flight.do(fingerprint, call)
+    
+    def _record_fallback(self, operation: str, source: str):
+        """Cuenta las respuestas locales servidas con el circuito abierto"""
+        key = f"{operation}:{source}"
+        self.fallbacks[key] = self.fallbacks.get(key, 0) + 1
+        AI_FALLBACKS.labels(operation, source).inc()
+    
+    def fallback_stats(self) -> Dict:
+        return {
+            **self.breaker.stats(),
+            "fallbacksServed": dict(self.fallbacks),
+            "questionBank": self.question_bank.stats()
+        }
+    
     async def generate_explanation(
         self,
         question: str,
         user_answer: str,
         correct_answer: str,
         subject: str,
-        user_level: str
+        user_level: str,
+        use_cache: bool = True
     ) -> str:
         """Genera explicación personalizada con Gemini (modelo de texto)"""
+        cache_key = make_cache_key(
+            "explanation",
+            question=question,
+            user_answer=user_answer,
+            correct_answer=correct_answer,
+            subject=subject,
+            user_level=user_level
+        )
+        if use_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        else:
+            self.cache.record_bypass()
+        # Clave sin la respuesta ni el nivel del estudiante: cualquier explicación
+        # previa de la misma pregunta sirve de respaldo con el circuito abierto
+        fallback_key = make_cache_key(
+            "explanation_fallback",
+            question=question,
+            correct_answer=correct_answer,
+            subject=subject
+        )
+        
         try:
             prompt = f"""Actúa como un tutor experto en {subject} para estudiantes preuniversarios peruanos de nivel {user_level}.
 
@@ -48,30 +489,33 @@ Proporciona una explicación que incluya:
 
 Sé empático, motivador y didáctico. Usa emojis ocasionalmente. Máximo 200 palabras."""
 
-            response = await self.model_text.generate_content_async(prompt)
-            return response.text
+            explanation = await self._generate(prompt, operation="explanation")
+        except CircuitOpenError:
+            cached = await self.cache.get(fallback_key)
+            if cached is not None:
+                self._record_fallback("explanation", "cache")
+                return cached
+            self._record_fallback("explanation", "template")
+            return template_explanation(question, user_answer, correct_answer, subject)
         except Exception as e:
             print(f"Error generando explicación: {e}")
             raise
+        
+        await self.cache.set(cache_key, explanation)
+        await self.cache.set(fallback_key, explanation)
+        return explanation
     
     async def generate_adaptive_question(
         self,
         subject: str,
         user_level: str,
         weak_topics: List[str],
-        recent_performance: Dict
+        recent_performance: Dict,
+        priority: Priority = Priority.ADAPTIVE
     ) -> Dict:
         """Genera pregunta adaptativa basada en rendimiento (modelo JSON)"""
         try:
-            total = recent_performance.get('total', 1)
-            correct = recent_performance.get('correct', 0)
-            accuracy = (correct / total * 100) if total > 0 else 50
-            
-            difficulty = 'medio'
-            if accuracy > 80:
-                difficulty = 'difícil'
-            elif accuracy < 50:
-                difficulty = 'fácil'
+            accuracy, difficulty = difficulty_for_performance(recent_performance)
             
             topics_text = f"Enfócate en estos temas débiles: {', '.join(weak_topics)}" if weak_topics else "Tema general"
             
@@ -93,30 +537,102 @@ Responde ÚNICAMENTE con este JSON:
 }}"""
 
             # Usamos el modelo JSON
-            response = await self.model_json.generate_content_async(prompt)
+            response_text = await self._generate(
+                prompt, json_mode=True, priority=priority, operation="adaptive_question"
+            )
             # No necesitamos limpiar, Gemini lo entrega en JSON
-            return json.loads(response.text)
+            question = json.loads(response_text)
             
+        except CircuitOpenError:
+            questions = await self.question_bank.sample(subject, difficulty, count=1)
+            if not questions:
+                raise
+            self._record_fallback("adaptive_question", "bank")
+            return questions[0]
         except Exception as e:
             print(f"Error generando pregunta: {e}")
             raise
+        
+        valid = validate_question(question)
+        if valid is not None:
+            self.question_bank.add_later(subject, [valid])
+        return question
     
-    async def chat_with_tutor(
+    async def generate_adaptive_questions(
         self,
-        user_id: str,
-        message: str,
-        context: Dict
-    ) -> str:
-        """Chat conversacional con el tutor IA (modelo de texto)"""
+        subject: str,
+        user_level: str,
+        weak_topics: List[str],
+        recent_performance: Dict,
+        count: int,
+        priority: Priority = Priority.ADAPTIVE,
+        allow_fallback: bool = True
+    ) -> List[Dict]:
+        """Genera varias preguntas adaptativas en una sola llamada (modelo JSON)"""
         try:
-            # Obtener o crear historial
-            if user_id not in self.conversation_history:
-                self.conversation_history[user_id] = []
+            accuracy, difficulty = difficulty_for_performance(recent_performance)
+            
+            topics_text = f"Reparte las preguntas entre estos temas débiles: {', '.join(weak_topics)}" if weak_topics else "Temas generales variados"
+            
+            prompt = f"""Genera {count} preguntas DISTINTAS de {subject} para examen de admisión universitaria peruana.
+
+Nivel del estudiante: {user_level}
+Rendimiento reciente: {accuracy:.0f}% de aciertos
+{topics_text}
+Dificultad requerida: {difficulty}
+
+Responde ÚNICAMENTE con este JSON:
+{{
+  "questions": [
+    {{
+      "question": "texto de la pregunta",
+      "options": ["opción A", "opción B", "opción C", "opción D"],
+      "correct": 0,
+      "explanation": "explicación detallada de por qué la respuesta es correcta",
+      "difficulty": "{difficulty}",
+      "topic": "tema específico"
+    }}
+  ]
+}}"""
+
+            response_text = await self._generate(
+                prompt,
+                json_mode=True,
+                priority=priority,
+                expected_output_tokens=350 * count,
+                operation="adaptive_question_batch"
+            )
+            data = json.loads(response_text)
+            items = data.get("questions", []) if isinstance(data, dict) else data
             
-            history = self.conversation_history[user_id]
+            # Validamos cada pregunta por separado: las mal formadas se descartan
+            questions = [q for q in (validate_question(item) for item in items) if q is not None]
+            if len(questions) < len(items):
+                print(f"⚠️ Se descartaron {len(items) - len(questions)} preguntas mal formadas")
+            if not questions:
+                raise ValueError("La IA no devolvió preguntas válidas")
             
-            # Contexto del sistema
-            system_context = f"""Eres un tutor virtual experto y motivador en preparación preuniversitaria peruana.
+        except CircuitOpenError:
+            if not allow_fallback:
+                raise
+            questions = await self.question_bank.sample(subject, difficulty, count=count)
+            if not questions:
+                raise
+            self._record_fallback("adaptive_question_batch", "bank")
+            return questions
+        except Exception as e:
+            print(f"Error generando preguntas: {e}")
+            raise
+        
+        self.question_bank.add_later(subject, questions)
+        return questions[:count]
+    
+    async def _build_chat_history(self, user_id: str, context: Dict) -> List[Dict]:
+        """Historial para el modelo: contexto del sistema + resumen acumulado + turnos recientes"""
+        conversation = await self.conversations.load(user_id)
+        
+        # Contexto del sistema (se arma en cada turno con los datos actuales del estudiante)
+        system_context = f"""Eres un tutor virtual experto y motivador en preparación preuniversitaria peruana.
 
 Información del estudiante:
 - Nombre: {context.get('userName', 'Estudiante')}
@@ -134,28 +650,169 @@ Tu rol:
 
 IMPORTANTE: Nunca des respuestas directas a ejercicios sin explicar el proceso de razonamiento."""
 
-            # Crear chat con historial
-            if len(history) == 0:
-                history.append({ "role": "user", "parts": [system_context] })
-                history.append({ "role": "model", "parts": ["Entendido. Estoy listo para ayudar al estudiante con entusiasmo y dedicación. 📚✨"] })
-            
-            chat = self.model_text.start_chat(history=history)
-            response = await chat.send_message_async(message)
+        history = [
+            { "role": "user", "parts": [system_context] },
+            { "role": "model", "parts": ["Entendido. Estoy listo para ayudar al estudiante con entusiasmo y dedicación. 📚✨"] }
+        ]
+        if conversation.summary:
+            history.append({ "role": "user", "parts": [f"Resumen de nuestra conversación anterior:\n{conversation.summary}"] })
+            history.append({ "role": "model", "parts": ["Entendido, tendré en cuenta lo que ya conversamos. 👍"] })
+        return history + list(conversation.turns)
+    
+    async def summarize_conversation(self, summary: str, turns: List[Dict]) -> str:
+        """Resume turnos antiguos del chat para no reenviarlos completos en cada mensaje"""
+        dialogue = "\n".join(
+            f"{'Estudiante' if turn['role'] == 'user' else 'Tutor'}: {turn['parts'][0]}"
+            for turn in turns
+        )
+        prompt = f"""Resume en máximo 120 palabras esta conversación entre un tutor y un estudiante preuniversitario peruano.
+Conserva los temas tratados, las dudas del estudiante y los consejos importantes. Responde solo con el resumen.
+
+Resumen previo: {summary or 'ninguno'}
+
+Conversación:
+{dialogue}"""
+        return await self._generate(
+            prompt, priority=Priority.BACKGROUND, expected_output_tokens=200, operation="chat_summary"
+        )
+    
+    def _cached_first_turn(
+        self,
+        history: List[Dict],
+        message: str,
+        context: Dict,
+        subject: Optional[str],
+        estimated_tokens: int
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Ámbito de la caché semántica (solo en el primer turno) y la respuesta guardada, si la hay"""
+        if len(history) != 2:
+            # Ya hay resumen o turnos previos: la respuesta depende de la conversación
+            return None, None
+        scope = SemanticCache.make_scope(subject, context.get('userLevel', 'principiante'))
+        cached = self.semantic_cache.lookup(scope, message, estimated_tokens)
+        if cached is not None:
+            cached = personalize(cached, context.get('userName'))
+        return scope, cached
+    
+    async def chat_with_tutor(
+        self,
+        user_id: str,
+        message: str,
+        context: Dict,
+        subject: Optional[str] = None
+    ) -> str:
+        """Chat conversacional con el tutor IA (modelo de texto)"""
+        try:
+            history = await self._build_chat_history(user_id, context)
             
-            # Actualizar historial (mantener últimos 20 mensajes)
-            history.append({ "role": "user", "parts": [message] })
-            history.append({ "role": "model", "parts": [response.text] })
+            estimated_tokens = estimate_tokens(
+                "".join(str(part) for turn in history for part in turn["parts"]) + message, 400
+            )
+            scope, cached = self._cached_first_turn(history, message, context, subject, estimated_tokens)
+            if cached is not None:
+                await self.conversations.append(user_id, message, cached)
+                return cached
             
-            if len(history) > 22:  # 20 mensajes + 2 del sistema
-                history = history[:2] + history[-20:]
+            chat = self.model_text.start_chat(history=history)
+            response = await self._call_model(
+                "chat",
+                Priority.INTERACTIVE,
+                estimated_tokens,
+                lambda: chat.send_message_async(message)
+            )
             
-            self.conversation_history[user_id] = history
+            await self.conversations.append(user_id, message, response.text)
+            if scope is not None:
+                self.semantic_cache.add(scope, message, depersonalize(response.text, context.get('userName')))
             
             return response.text
+        except CircuitOpenError:
+            # La respuesta de respaldo no se guarda en el historial
+            self._record_fallback("chat", "template")
+            return template_chat_reply()
         except Exception as e:
             print(f"Error en chat: {e}")
             raise
     
+    def _record_ttft(self, started: float):
+        ttft = time.perf_counter() - started
+        self.chat_ttft.add(ttft)
+        CHAT_STREAM_TTFT_SECONDS.observe(ttft)
+    
+    async def stream_chat_with_tutor(
+        self,
+        user_id: str,
+        message: str,
+        context: Dict,
+        subject: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Chat con el tutor en streaming: entrega la respuesta por fragmentos"""
+        started = time.perf_counter()
+        history = await self._build_chat_history(user_id, context)
+        
+        estimated_tokens = estimate_tokens(
+            "".join(str(part) for turn in history for part in turn["parts"]) + message, 400
+        )
+        scope, cached = self._cached_first_turn(history, message, context, subject, estimated_tokens)
+        if cached is not None:
+            # También cuenta en el TTFT: son las respuestas más rápidas que ve el estudiante
+            self._record_ttft(started)
+            yield cached
+            await self.conversations.append(user_id, message, cached)
+            return
+        
+        chat = self.model_text.start_chat(history=history)
+        try:
+            # La petición se establece (y se reintenta) a través del regulador
+            response = await self._call_model(
+                "chat_stream",
+                Priority.INTERACTIVE,
+                estimated_tokens,
+                lambda: chat.send_message_async(message, stream=True),
+                streaming=True
+            )
+        except CircuitOpenError:
+            self._record_fallback("chat_stream", "template")
+            yield template_chat_reply()
+            return
+        except Exception as e:
+            print(f"Error en chat (stream): {e}")
+            raise
+        
+        parts: List[str] = []
+        chunks = response.__aiter__()
+        while True:
+            # Cada fragmento con su propio límite: un stream detenido no retiene la conexión SSE
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=settings.GEMINI_CALL_TIMEOUT_SECONDS)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError as e:
+                self.breaker.record_failure()
+                raise self._timeout_error() from e
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            try:
+                text = chunk.text
+            except ValueError:
+                # Fragmento sin texto (p. ej. solo metadatos)
+                continue
+            if not text:
+                continue
+            if not parts:
+                self._record_ttft(started)
+            parts.append(text)
+            yield text
+        
+        self.governor.record_usage(estimated_tokens, response)
+        observe_gemini_usage("chat_stream", response)
+        # Solo guardamos el turno cuando el stream terminó completo
+        answer = "".join(parts)
+        await self.conversations.append(user_id, message, answer)
+        if scope is not None:
+            self.semantic_cache.add(scope, message, depersonalize(answer, context.get('userName')))
+    
     async def analyze_study_pattern(
         self,
         user_id: str,
@@ -188,8 +845,9 @@ PROPORCIONA (máximo 300 palabras):
 
 Sé motivador, específico y realista. Usa emojis. Enfócate en el contexto peruano."""
 
-            response = await self.model_text.generate_content_async(prompt)
-            return response.text
+            return await self._generate(
+                prompt, priority=Priority.BACKGROUND, expected_output_tokens=600, operation="analysis"
+            )
         except Exception as e:
             print(f"Error analizando progreso: {e}")
             raise
@@ -267,8 +925,14 @@ Genera un plan SEMANAL detallado en formato JSON:
 }}"""
 
             # Usamos el modelo JSON
-            response = await self.model_json.generate_content_async(prompt)
-            return json.loads(response.text)
+            response_text = await self._generate(
+                prompt,
+                json_mode=True,
+                priority=Priority.BACKGROUND,
+                expected_output_tokens=1500,
+                operation="study_plan"
+            )
+            return json.loads(response_text)
             
         except Exception as e:
             print(f"Error generando plan: {e}")
@@ -277,9 +941,18 @@ Genera un plan SEMANAL detallado en formato JSON:
     async def generate_motivational_feedback(
         self,
         performance: Dict,
-        context: Dict
+        context: Dict,
+        use_cache: bool = True
     ) -> str:
         """Genera feedback motivacional personalizado (modelo de texto)"""
+        cache_key = make_cache_key("feedback", performance=performance, context=context)
+        if use_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        else:
+            self.cache.record_bypass()
+        
         try:
             prompt = f"""Genera un mensaje motivacional personalizado para un estudiante preuniversitario peruano:
 
@@ -302,16 +975,26 @@ Genera un mensaje de máximo 120 palabras que:
 
 Usa un tono cercano, amigable y motivador. Incluye emojis. Enfócate en el contexto peruano."""
 
-            response = await self.model_text.generate_content_async(prompt)
-            return response.text
+            feedback = await self._generate(
+                prompt, priority=Priority.BACKGROUND, expected_output_tokens=250, operation="feedback"
+            )
+        except CircuitOpenError:
+            self._record_fallback("feedback", "template")
+            return template_feedback(performance, context)
         except Exception as e:
             print(f"Error generando feedback: {e}")
             raise
+        
+        await self.cache.set(cache_key, feedback)
+        return feedback
     
-    def clear_conversation_history(self, user_id: str):
+    async def clear_conversation_history(self, user_id: str):
         """Limpia el historial de conversación"""
-        if user_id in self.conversation_history:
-            del self.conversation_history[user_id]
+        await self.conversations.clear(user_id)
+
+# Instancia del proceso: se crea en el primer uso y el lifespan de la app la cierra
+registry.register("gemini", GeminiService, close=lambda service: service.conversations.close())
 
-# Instancia global
-gemini_service = GeminiService()
\ No newline at end of file
+def get_gemini_service() -> GeminiService:
+    """Servicio de Gemini (también sirve como dependencia de FastAPI)"""
+    return registry.get("gemini")
\ No newline at end of file
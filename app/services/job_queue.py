@@ -0,0 +1,284 @@
+# app/services/job_queue.py
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.db.db import db
+from app.services.gemini_governor import GeminiUnavailableError
+
+JobHandler = Callable[..., Awaitable[Dict]]
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_fingerprint(kind: str, user_id: str, params: Dict) -> str:
+    """Identifica trabajos iguales (mismo tipo, usuario y parámetros)"""
+    payload = json.dumps({"kind": kind, "userId": user_id, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """Trabajos de IA largos (planes, análisis) en segundo plano, guardados en MongoDB"""
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        result_ttl: int,
+        stale_seconds: int,
+        max_wait: float,
+        collection_name: str
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.stale_seconds = stale_seconds
+        self.max_wait = max_wait
+        self.collection_name = collection_name
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Avisos para el long-polling de los trabajos que corren en este proceso
+        self._events: Dict[str, asyncio.Event] = {}
+
+        self.submitted = 0
+        self.attached = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._run_seconds = 0.0
+
+    def _collection(self):
+        return db.client[settings.MONGODB_DB_NAME][self.collection_name]
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    # --- Ciclo de vida ---
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        collection = self._collection()
+        try:
+            # Un solo trabajo activo por huella: los reintentos del cliente se unen a él
+            await collection.create_index(
+                "fingerprint", unique=True, partialFilterExpression={"active": True}
+            )
+            await collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            print(f"⚠️ No se pudieron crear los índices de trabajos: {e}")
+        await self._expire_stale()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✅ Cola de trabajos de IA iniciada ({self.workers} workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Los que seguían en cola se marcan como fallidos para que puedan volver a pedirse
+        pending = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            try:
+                await self._collection().update_many(
+                    {"_id": {"$in": pending}, "status": QUEUED},
+                    {"$set": self._finished(FAILED, error="El servidor se reinició. Vuelve a solicitarlo.")}
+                )
+            except Exception as e:
+                print(f"⚠️ Error cerrando los trabajos en cola: {e}")
+        for event in self._events.values():
+            event.set()
+        self._events.clear()
+
+    async def _expire_stale(self, fingerprint: Optional[str] = None):
+        """Marca como fallidos los trabajos activos abandonados (p. ej. el worker se reinició)"""
+        query = {
+            "active": True,
+            "updatedAt": {"$lt": datetime.utcnow() - timedelta(seconds=self.stale_seconds)}
+        }
+        if fingerprint:
+            query["fingerprint"] = fingerprint
+        try:
+            await self._collection().update_many(query, {"$set": self._finished(
+                FAILED, error="El trabajo se interrumpió. Vuelve a solicitarlo."
+            )})
+        except Exception as e:
+            print(f"⚠️ Error limpiando trabajos abandonados: {e}")
+
+    def _finished(self, status: str, **fields) -> Dict:
+        now = datetime.utcnow()
+        return {
+            "status": status,
+            "active": False,
+            "finishedAt": now,
+            "updatedAt": now,
+            "expiresAt": now + timedelta(seconds=self.result_ttl),
+            **fields
+        }
+
+    # --- API pública ---
+
+    async def submit(self, kind: str, user_id: str, params: Dict) -> Tuple[Dict, bool]:
+        """Encola un trabajo o devuelve el activo con las mismas entradas; (trabajo, ya_existía)"""
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        fingerprint = job_fingerprint(kind, user_id, params)
+        collection = self._collection()
+
+        existing = await collection.find_one({"fingerprint": fingerprint, "active": True})
+        if existing is not None and existing["updatedAt"] < datetime.utcnow() - timedelta(seconds=self.stale_seconds):
+            await self._expire_stale(fingerprint)
+            existing = None
+        if existing is not None:
+            self.attached += 1
+            return existing, True
+
+        if self._queue is None or self._queue.full():
+            self.rejected += 1
+            raise GeminiUnavailableError(
+                "Hay demasiados trabajos de IA en cola. Intenta de nuevo en unos minutos.",
+                retry_after=30
+            )
+
+        now = datetime.utcnow()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "kind": kind,
+            "userId": user_id,
+            "params": params,
+            "fingerprint": fingerprint,
+            "status": QUEUED,
+            "active": True,
+            "createdAt": now,
+            "updatedAt": now
+        }
+        try:
+            await collection.insert_one(job)
+        except DuplicateKeyError:
+            # Otro worker (o petición) lo creó al mismo tiempo: nos unimos a ese
+            existing = await collection.find_one({"fingerprint": fingerprint, "active": True})
+            if existing is not None:
+                self.attached += 1
+                return existing, True
+            raise
+
+        self._events[job["_id"]] = asyncio.Event()
+        self._queue.put_nowait(job["_id"])
+        self.submitted += 1
+        return job, False
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[Dict]:
+        """Estado del trabajo; con wait > 0 espera (long-polling) hasta que termine"""
+        wait = min(max(wait, 0), self.max_wait)
+        job = await self._collection().find_one({"_id": job_id})
+        if job is None or not job.get("active") or wait == 0:
+            return job
+
+        event = self._events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            return await self._collection().find_one({"_id": job_id})
+
+        # Corre en otro proceso: consultamos MongoDB cada cierto tiempo
+        deadline = time.monotonic() + wait
+        while job is not None and job.get("active") and time.monotonic() < deadline:
+            await asyncio.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+            job = await self._collection().find_one({"_id": job_id})
+        return job
+
+    # --- Ejecución ---
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Error en la cola de trabajos: {e}")
+            finally:
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        collection = self._collection()
+        now = datetime.utcnow()
+        job = await collection.find_one_and_update(
+            {"_id": job_id, "status": QUEUED},
+            {"$set": {"status": RUNNING, "startedAt": now, "updatedAt": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return
+
+        started = time.perf_counter()
+        try:
+            result = await self._handlers[job["kind"]](user_id=job["userId"], **job["params"])
+        except asyncio.CancelledError:
+            await collection.update_one({"_id": job_id}, {"$set": self._finished(
+                FAILED, error="El servidor se reinició. Vuelve a solicitarlo."
+            )})
+            raise
+        except GeminiUnavailableError as e:
+            self.failed += 1
+            await collection.update_one({"_id": job_id}, {"$set": self._finished(
+                FAILED, error=str(e), retryAfter=e.retry_after
+            )})
+            return
+        except Exception as e:
+            self.failed += 1
+            print(f"Error en trabajo {job['kind']}: {e}")
+            await collection.update_one({"_id": job_id}, {"$set": self._finished(FAILED, error=str(e))})
+            return
+        finally:
+            self._run_seconds += time.perf_counter() - started
+
+        self.completed += 1
+        await collection.update_one({"_id": job_id}, {"$set": self._finished(DONE, result=result)})
+
+    def stats(self) -> Dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "maxPending": self.max_pending,
+            "submitted": self.submitted,
+            "attached": self.attached,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avgRunSeconds": round(self._run_seconds / finished, 3) if finished else 0.0
+        }
+
+
+# Instancia global
+job_queue = JobQueue(
+    workers=settings.AI_JOB_WORKERS,
+    max_pending=settings.AI_JOB_MAX_PENDING,
+    result_ttl=settings.AI_JOB_RESULT_TTL_SECONDS,
+    stale_seconds=settings.AI_JOB_STALE_SECONDS,
+    max_wait=settings.AI_JOB_MAX_WAIT_SECONDS,
+    collection_name=settings.AI_JOB_COLLECTION
+)
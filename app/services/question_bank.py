@@ -0,0 +1,93 @@
+# app/services/question_bank.py
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.db.db import db
+from app.services.response_cache import normalize_text
+
+
+class QuestionBank:
+    """Banco de preguntas ya generadas en MongoDB (respaldo cuando Gemini no responde)"""
+
+    def __init__(self, collection_name: str, ttl: int):
+        self.collection_name = collection_name
+        self.ttl = ttl
+        self._tasks: set = set()
+        self.saved = 0
+        self.served = 0
+
+    def _collection(self):
+        if db.client is None:
+            return None
+        return db.client[settings.MONGODB_DB_NAME][self.collection_name]
+
+    async def ensure_indexes(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.create_index([("subject", 1), ("difficulty", 1)])
+            await collection.create_index("createdAt", expireAfterSeconds=self.ttl)
+        except Exception as e:
+            print(f"⚠️ No se pudieron crear los índices del banco de preguntas: {e}")
+
+    def add_later(self, subject: str, questions: List[Dict]):
+        """Guarda las preguntas en segundo plano para no demorar la respuesta"""
+        if not questions or self._collection() is None:
+            return
+        task = asyncio.create_task(self._add(subject, questions))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _add(self, subject: str, questions: List[Dict]):
+        now = datetime.utcnow()
+        docs = [
+            {
+                "subject": normalize_text(subject),
+                "difficulty": question.get("difficulty"),
+                "topic": question.get("topic"),
+                "question": question,
+                "createdAt": now
+            }
+            for question in questions
+        ]
+        try:
+            await self._collection().insert_many(docs)
+            self.saved += len(docs)
+        except Exception as e:
+            print(f"⚠️ Error guardando en el banco de preguntas: {e}")
+
+    async def sample(self, subject: str, difficulty: Optional[str] = None, count: int = 1) -> List[Dict]:
+        """Preguntas al azar de la materia (primero con la dificultad pedida)"""
+        collection = self._collection()
+        if collection is None:
+            return []
+        filters = [{"subject": normalize_text(subject)}]
+        if difficulty:
+            filters.insert(0, {"subject": normalize_text(subject), "difficulty": difficulty})
+        for match in filters:
+            try:
+                docs = await collection.aggregate([
+                    {"$match": match},
+                    {"$sample": {"size": count}},
+                    {"$project": {"_id": 0, "question": 1}}
+                ]).to_list(count)
+            except Exception as e:
+                print(f"⚠️ Error leyendo el banco de preguntas: {e}")
+                return []
+            if docs:
+                self.served += len(docs)
+                return [doc["question"] for doc in docs]
+        return []
+
+    def stats(self) -> Dict:
+        return {"saved": self.saved, "served": self.served}
+
+
+# Instancia global
+question_bank = QuestionBank(
+    collection_name=settings.QUESTION_BANK_COLLECTION,
+    ttl=settings.QUESTION_BANK_TTL_SECONDS
+)
@@ -0,0 +1,293 @@
+# app/services/question_pool.py
+import asyncio
+import random
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.db import db
+from app.services.gemini_service import GeminiService, difficulty_for_performance, get_gemini_service
+from app.services.gemini_governor import Priority
+from app.services.response_cache import normalize_text
+
+# Precisión representativa de cada nivel de dificultad (para generar en segundo plano)
+DIFFICULTY_ACCURACY = {"fácil": 40, "medio": 65, "difícil": 90}
+
+PoolKey = Tuple[str, str, str, str]
+
+
+class QuestionPool:
+    """Colas de preguntas listas por (materia, dificultad, tema, nivel), rellenadas en segundo plano"""
+
+    def __init__(
+        self,
+        service: Optional[GeminiService],
+        size: int,
+        low_water: int,
+        workers: int,
+        max_keys: int,
+        warm_limit: int,
+        ttl: int,
+        collection_name: str,
+        enabled: bool = True
+    ):
+        self._service = service
+        self.size = size
+        self.low_water = low_water
+        self.workers = workers
+        self.max_keys = max_keys
+        self.warm_limit = warm_limit
+        self.ttl = ttl
+        self.collection_name = collection_name
+        self.enabled = enabled
+
+        self._queues: "OrderedDict[PoolKey, Deque[Dict]]" = OrderedDict()
+        # Datos originales de cada clave (materia, tema y nivel sin normalizar)
+        self._meta: Dict[PoolKey, Dict] = {}
+        self._pending: set = set()
+        self._refill_queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.warmed = 0
+        self.refill_errors = 0
+
+    @property
+    def service(self) -> GeminiService:
+        # Sin servicio inyectado usamos el del proceso (se crea en el primer uso)
+        return self._service or get_gemini_service()
+
+    @staticmethod
+    def make_key(subject: str, difficulty: str, topic: Optional[str], user_level: str) -> PoolKey:
+        # El nivel es parte de la clave: una pregunta para "avanzado" no se sirve a "principiante"
+        return (normalize_text(subject), difficulty, normalize_text(topic or "general"), normalize_text(user_level))
+
+    def _collection(self):
+        if db.client is None:
+            return None
+        return db.client[settings.MONGODB_DB_NAME][self.collection_name]
+
+    # --- Ciclo de vida ---
+
+    async def start(self):
+        """Arranca los workers de relleno y precarga preguntas guardadas en MongoDB"""
+        if not self.enabled or self._tasks:
+            return
+        self._refill_queue = asyncio.Queue()
+        collection = self._collection()
+        if collection is not None:
+            try:
+                await collection.create_index("createdAt", expireAfterSeconds=self.ttl)
+            except Exception as e:
+                print(f"⚠️ No se pudo crear el índice TTL del pool de preguntas: {e}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._warm()))
+        print(f"✅ Pool de preguntas iniciado ({self.workers} workers)")
+
+    async def stop(self):
+        """Detiene los workers y guarda en MongoDB las preguntas no servidas"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+
+        docs = [
+            {
+                "subject": self._meta[key]["subject"],
+                "difficulty": key[1],
+                "topic": self._meta[key]["topic"],
+                "level": self._meta[key]["level"],
+                "question": question,
+                "createdAt": datetime.utcnow()
+            }
+            for key, queue in self._queues.items()
+            for question in queue
+        ]
+        self._queues.clear()
+        self._meta.clear()
+
+        collection = self._collection()
+        if docs and collection is not None:
+            try:
+                await collection.insert_many(docs)
+                print(f"💾 {len(docs)} preguntas del pool guardadas en MongoDB")
+            except Exception as e:
+                print(f"⚠️ Error guardando el pool de preguntas: {e}")
+
+    async def _warm(self):
+        """Reclama preguntas guardadas (find_one_and_delete evita duplicarlas entre workers)"""
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            for _ in range(self.warm_limit):
+                doc = await collection.find_one_and_delete({})
+                if doc is None:
+                    break
+                key = self._register(doc["subject"], doc["difficulty"], doc["topic"], doc.get("level", "principiante"))
+                queue = self._queues[key]
+                if len(queue) < self.size:
+                    queue.append(doc["question"])
+                    self.warmed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Error precargando el pool de preguntas: {e}")
+        if self.warmed:
+            print(f"🔥 Pool de preguntas precargado con {self.warmed} preguntas")
+
+    # --- Acceso ---
+
+    async def get_question(
+        self,
+        subject: str,
+        user_level: str,
+        weak_topics: List[str],
+        recent_performance: Dict
+    ) -> Dict:
+        """Devuelve una pregunta lista del pool o la genera en vivo si no hay"""
+        if not self.enabled or self._refill_queue is None:
+            return await self.service.generate_adaptive_question(
+                subject, user_level, weak_topics, recent_performance
+            )
+
+        _, difficulty = difficulty_for_performance(recent_performance)
+        topic = random.choice(weak_topics) if weak_topics else "general"
+        key = self._register(subject, difficulty, topic, user_level)
+
+        question = self.pop(key)
+        if question is None and self.service.breaker.is_open:
+            # Sin IA disponible sirve cualquier pregunta lista de la materia
+            question = self.pop_any(subject, user_level)
+        if question is not None:
+            return question
+
+        return await self.service.generate_adaptive_question(
+            subject, user_level, weak_topics, recent_performance
+        )
+
+    def pop(self, key: PoolKey) -> Optional[Dict]:
+        queue = self._queues.get(key)
+        question = None
+        if queue:
+            question = queue.popleft()
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._schedule_refill(key)
+        return question
+
+    def pop_any(self, subject: str, user_level: str) -> Optional[Dict]:
+        """Saca una pregunta de cualquier dificultad o tema de la materia, del mismo nivel"""
+        normalized, level = normalize_text(subject), normalize_text(user_level)
+        for key, queue in self._queues.items():
+            if key[0] == normalized and key[3] == level and queue:
+                return queue.popleft()
+        return None
+
+    def _register(self, subject: str, difficulty: str, topic: str, level: str) -> PoolKey:
+        key = self.make_key(subject, difficulty, topic, level)
+        if key not in self._queues:
+            self._queues[key] = deque(maxlen=self.size)
+            while len(self._queues) > self.max_keys:
+                evicted, _ = self._queues.popitem(last=False)
+                self._meta.pop(evicted, None)
+        self._queues.move_to_end(key)
+        self._meta[key] = {"subject": subject, "topic": topic, "level": level}
+        return key
+
+    # --- Relleno en segundo plano ---
+
+    def _schedule_refill(self, key: PoolKey):
+        queue = self._queues.get(key)
+        if queue is None or self._refill_queue is None:
+            return
+        if len(queue) < self.low_water and key not in self._pending:
+            self._pending.add(key)
+            self._refill_queue.put_nowait(key)
+
+    async def _worker(self):
+        while True:
+            key = await self._refill_queue.get()
+            try:
+                await self._refill(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refill_errors += 1
+                print(f"⚠️ Error rellenando el pool de preguntas: {e}")
+            finally:
+                self._pending.discard(key)
+                self._refill_queue.task_done()
+
+    async def _refill(self, key: PoolKey):
+        queue = self._queues.get(key)
+        meta = self._meta.get(key)
+        if queue is None or meta is None or len(queue) >= self.size:
+            return
+        if self.service.breaker.is_open:
+            # Se reprograma en el próximo pop, cuando el circuito vuelva a cerrarse
+            return
+        # Una sola llamada genera todas las preguntas que faltan
+        questions = await self.service.generate_adaptive_questions(
+            subject=meta["subject"],
+            user_level=meta["level"],
+            weak_topics=[meta["topic"]],
+            recent_performance={"correct": DIFFICULTY_ACCURACY[key[1]], "total": 100},
+            count=self.size - len(queue),
+            priority=Priority.BACKGROUND,
+            allow_fallback=False
+        )
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        for question in questions:
+            if len(queue) >= self.size:
+                break
+            queue.append(question)
+            self.generated += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "keys": len(self._queues),
+            "ready": sum(len(queue) for queue in self._queues.values()),
+            "capacityPerKey": self.size,
+            "lowWater": self.low_water,
+            "pendingRefills": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "generated": self.generated,
+            "warmed": self.warmed,
+            "refillErrors": self.refill_errors,
+            "levels": [
+                {
+                    "subject": self._meta[key]["subject"],
+                    "difficulty": key[1],
+                    "topic": self._meta[key]["topic"],
+                    "level": self._meta[key]["level"],
+                    "ready": len(queue)
+                }
+                for key, queue in self._queues.items()
+            ]
+        }
+
+
+# Instancia global
+question_pool = QuestionPool(
+    service=None,
+    size=settings.QUESTION_POOL_SIZE,
+    low_water=settings.QUESTION_POOL_LOW_WATER,
+    workers=settings.QUESTION_POOL_WORKERS,
+    max_keys=settings.QUESTION_POOL_MAX_KEYS,
+    warm_limit=settings.QUESTION_POOL_WARM_LIMIT,
+    ttl=settings.QUESTION_POOL_TTL_SECONDS,
+    collection_name=settings.QUESTION_POOL_COLLECTION,
+    enabled=settings.QUESTION_POOL_ENABLED
+)
@@ -0,0 +1,168 @@
+# app/services/response_cache.py
+import hashlib
+import json
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.db.db import db
+
+
+def normalize_text(value: Any) -> str:
+    """Normaliza un valor del prompt para que variaciones triviales compartan clave"""
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    text = unicodedata.normalize("NFKC", str(value)).strip().lower()
+    return " ".join(text.split())
+
+
+def make_cache_key(namespace: str, **inputs: Any) -> str:
+    """Genera una clave estable (hash) a partir de los datos que se usan en el prompt"""
+    normalized = {name: normalize_text(value) for name, value in sorted(inputs.items())}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(f"{namespace}|{payload}".encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class ResponseCache:
+    """Caché de dos niveles: LRU en memoria con TTL + colección de MongoDB con índice TTL"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        memory_ttl: int,
+        persistent_ttl: int,
+        collection_name: str,
+        enabled: bool = True
+    ):
+        self.max_entries = max_entries
+        self.memory_ttl = memory_ttl
+        self.persistent_ttl = persistent_ttl
+        self.collection_name = collection_name
+        self.enabled = enabled
+
+        # clave -> (instante de expiración, valor)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bypasses = 0
+
+    def _collection(self):
+        if not self.enabled or db.client is None:
+            return None
+        return db.client[settings.MONGODB_DB_NAME][self.collection_name]
+
+    async def ensure_indexes(self):
+        """Crea el índice TTL para que MongoDB elimine las entradas vencidas"""
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.create_index("expiresAt", expireAfterSeconds=0)
+        except Exception as e:
+            print(f"⚠️ No se pudo crear el índice TTL de la caché: {e}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Busca primero en memoria y luego en MongoDB"""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one(
+                    {"_id": key, "expiresAt": {"$gt": datetime.utcnow()}},
+                    {"value": 1}
+                )
+            except Exception as e:
+                print(f"⚠️ Error leyendo la caché persistente: {e}")
+                doc = None
+            if doc is not None:
+                self._remember(key, doc["value"])
+                self.mongo_hits += 1
+                return doc["value"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        """Guarda el valor en ambos niveles"""
+        if not self.enabled:
+            return
+
+        self._remember(key, value)
+
+        collection = self._collection()
+        if collection is None:
+            return
+        now = datetime.utcnow()
+        try:
+            await collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "value": value,
+                    "createdAt": now,
+                    "expiresAt": now + timedelta(seconds=self.persistent_ttl)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️ Error guardando en la caché persistente: {e}")
+
+    def record_bypass(self):
+        self.bypasses += 1
+
+    def _remember(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.memory_ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Vacía el nivel en memoria (MongoDB expira por TTL)"""
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": hits,
+            "memoryHits": self.memory_hits,
+            "mongoHits": self.mongo_hits,
+            "misses": self.misses,
+            "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "bypasses": self.bypasses
+        }
+
+
+# Instancia global
+response_cache = ResponseCache(
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    memory_ttl=settings.AI_CACHE_MEMORY_TTL_SECONDS,
+    persistent_ttl=settings.AI_CACHE_TTL_SECONDS,
+    collection_name=settings.AI_CACHE_COLLECTION,
+    enabled=settings.AI_CACHE_ENABLED
+)
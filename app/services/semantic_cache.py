@@ -0,0 +1,266 @@
+# app/services/semantic_cache.py
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import SEMANTIC_CACHE_LOOKUPS
+
+# Palabras vacías frecuentes: no aportan al tema de la pregunta
+STOPWORDS = {
+    "a", "al", "como", "con", "cual", "cuales", "de", "del", "el", "en", "es", "esta", "este",
+    "hay", "la", "las", "lo", "los", "me", "mi", "para", "por", "que", "se", "si", "su", "un",
+    "una", "uno", "y", "o", "puedo", "podrias", "puedes", "explicame", "explica", "hola", "tengo"
+}
+
+# Palabras, números y operadores: "x^2 + 5x" -> ["x", "^", "2", "+", "5x"]
+_TOKEN = re.compile(r"[a-z0-9ñ]+(?:[.,][0-9]+)?|[\^+\-*/=<>()√²³%]")
+_OPERATOR = re.compile(r"^[\^+\-*/=<>()√²³%]$")
+_DIGIT = re.compile(r"[0-9²³]")
+
+# Raíz aproximada: los primeros caracteres de cada palabra igualan plurales y
+# conjugaciones ("ecuaciones" / "ecuación", "resuelvo" / "resuelve")
+STEM_LENGTH = 5
+
+
+def _is_formula_token(token: str) -> bool:
+    return bool(_OPERATOR.match(token) or _DIGIT.search(token))
+
+
+def normalize_question(text: str) -> List[str]:
+    """Minúsculas, sin tildes ni palabras vacías y reducidas a su raíz; números y
+    operadores se conservan completos"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    # Quitamos las tildes pero conservamos la ñ (n + tilde combinada)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch) or ch == "\u0303")
+    text = unicodedata.normalize("NFC", text)
+    return [
+        token if _is_formula_token(token) else token[:STEM_LENGTH]
+        for token in _TOKEN.findall(text)
+        if token not in STOPWORDS
+    ]
+
+
+def formula_signature(tokens: List[str]) -> Tuple[str, ...]:
+    """Números y operadores en orden: dos preguntas solo comparten respuesta si coinciden.
+    La similitud coseno no distingue "x^2 + 5x + 6" de "x^2 + 4x + 6" (un dígito de diferencia)"""
+    return tuple(token for token in tokens if _is_formula_token(token))
+
+
+NAME_PLACEHOLDER = "{nombre}"
+
+
+def depersonalize(answer: str, name: Optional[str]) -> str:
+    """Quita el nombre del estudiante antes de guardar la respuesta para otros"""
+    if not name or name == "Estudiante":
+        return answer
+    for candidate in (name, name.split()[0]):
+        if len(candidate) >= 3:
+            answer = answer.replace(candidate, NAME_PLACEHOLDER)
+    return answer
+
+
+def personalize(answer: str, name: Optional[str]) -> str:
+    return answer.replace(NAME_PLACEHOLDER, (name or "Estudiante").split()[0])
+
+
+class HashingVectorizer:
+    """Vectoriza texto con palabras y n-gramas de caracteres (hashing trick, sin vocabulario)"""
+
+    def __init__(self, dimensions: int, ngram_range: Tuple[int, int] = (3, 4)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _features(self, words: List[str]) -> List[str]:
+        features = [f"w:{word}" for word in words]
+        low, high = self.ngram_range
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def transform(self, text: str) -> Optional[np.ndarray]:
+        """Vector unitario (float32) o None si el texto no tiene contenido útil"""
+        return self.transform_tokens(normalize_question(text))
+
+    def transform_tokens(self, tokens: List[str]) -> Optional[np.ndarray]:
+        features = self._features(tokens)
+        if not features:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) for feature in features),
+            dtype=np.uint32,
+            count=len(features)
+        )
+        indices = (hashes % self.dimensions).astype(np.intp)
+        # El bit alto decide el signo: reduce el sesgo de las colisiones
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        np.add.at(vector, indices, signs)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+
+class _Entry:
+    __slots__ = ("scope", "question", "answer", "vector", "signature", "created_at", "hits")
+
+    def __init__(self, scope: str, question: str, answer: str, vector: np.ndarray, signature: Tuple[str, ...]):
+        self.scope = scope
+        self.question = question
+        self.answer = answer
+        self.vector = vector
+        self.signature = signature
+        self.created_at = time.monotonic()
+        self.hits = 0
+
+
+class SemanticCache:
+    """Respuestas del tutor a preguntas casi iguales, por materia (vecino más cercano por coseno)"""
+
+    def __init__(self, enabled: bool, threshold: float, max_entries: int, dimensions: int, ttl: float):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectorizer = HashingVectorizer(dimensions)
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._ids = 0
+        # Índice por ámbito: ids y matriz de vectores (se reconstruye solo si cambió)
+        self._scopes: Dict[str, List[int]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.formula_mismatches = 0
+        self.tokens_saved = 0
+        self._similarity_total = 0.0
+        self._lookup_seconds = 0.0
+
+    @staticmethod
+    def make_scope(subject: Optional[str], user_level: str) -> str:
+        return f"{(subject or 'general').strip().lower()}|{user_level}"
+
+    def lookup(self, scope: str, question: str, estimated_tokens: int = 0) -> Optional[str]:
+        """Respuesta guardada de la pregunta más parecida del ámbito, si supera el umbral"""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        answer = self._lookup(scope, question)
+        self._lookup_seconds += time.perf_counter() - started
+        if answer is None:
+            self.misses += 1
+            SEMANTIC_CACHE_LOOKUPS.labels("miss").inc()
+        else:
+            self.hits += 1
+            self.tokens_saved += estimated_tokens
+            SEMANTIC_CACHE_LOOKUPS.labels("hit").inc()
+        return answer
+
+    def _lookup(self, scope: str, question: str) -> Optional[str]:
+        ids = self._scopes.get(scope)
+        if not ids:
+            return None
+        tokens = normalize_question(question)
+        vector = self.vectorizer.transform_tokens(tokens)
+        if vector is None:
+            return None
+        matrix = self._matrix(scope)
+        similarities = matrix @ vector
+        # Solo compiten las entradas con los mismos números y operadores
+        signature = formula_signature(tokens)
+        same_formula = np.fromiter(
+            (self._entries[entry_id].signature == signature for entry_id in ids), dtype=bool, count=len(ids)
+        )
+        if not same_formula.all():
+            if (similarities[~same_formula] >= self.threshold).any():
+                self.formula_mismatches += 1
+            similarities = np.where(same_formula, similarities, -1.0)
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            return None
+
+        entry_id = ids[best]
+        entry = self._entries[entry_id]
+        if time.monotonic() - entry.created_at > self.ttl:
+            self._remove(entry_id)
+            return None
+        self._entries.move_to_end(entry_id)
+        entry.hits += 1
+        self._similarity_total += similarity
+        return entry.answer
+
+    def add(self, scope: str, question: str, answer: str):
+        if not self.enabled or not answer:
+            return
+        tokens = normalize_question(question)
+        vector = self.vectorizer.transform_tokens(tokens)
+        if vector is None:
+            return
+        self._ids += 1
+        self._entries[self._ids] = _Entry(scope, question, answer, vector, formula_signature(tokens))
+        self._scopes.setdefault(scope, []).append(self._ids)
+        self._matrices.pop(scope, None)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._scopes[entry.scope]
+        ids.remove(entry_id)
+        if not ids:
+            del self._scopes[entry.scope]
+        self._matrices.pop(entry.scope, None)
+
+    def _matrix(self, scope: str) -> np.ndarray:
+        matrix = self._matrices.get(scope)
+        if matrix is None:
+            matrix = np.vstack([self._entries[entry_id].vector for entry_id in self._scopes[scope]])
+            self._matrices[scope] = matrix
+        return matrix
+
+    def clear(self):
+        self._entries.clear()
+        self._scopes.clear()
+        self._matrices.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "scopes": len(self._scopes),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "formulaMismatches": self.formula_mismatches,
+            "avgHitSimilarity": round(self._similarity_total / self.hits, 4) if self.hits else None,
+            "avgLookupMs": round(self._lookup_seconds / lookups * 1000, 3) if lookups else 0.0,
+            "estimatedTokensSaved": self.tokens_saved,
+            "memoryBytes": len(self._entries) * self.vectorizer.dimensions * 4
+        }
+
+
+# Instancia global
+semantic_cache = SemanticCache(
+    enabled=settings.SEMANTIC_CACHE_ENABLED,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    dimensions=settings.SEMANTIC_CACHE_DIMENSIONS,
+    ttl=settings.SEMANTIC_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,60 @@
+# benchmarks/compare.py (ejecutar desde la raíz del proyecto)
+# Compara dos resultados de benchmarks/run.py: throughput, latencias por escenario y lag
+# del event loop, con la variación porcentual. Con --max-regression termina con código 1
+# si algún p95 empeora más que ese porcentaje (útil en CI).
+#
+#   python -m benchmarks.compare benchmarks/results/antes.json benchmarks/results/despues.json
+import argparse
+import json
+import sys
+from typing import Dict
+
+
+def load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def delta(old: float, new: float) -> str:
+    if not old:
+        return "    —"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main(before_path: str, after_path: str, max_regression: float) -> int:
+    before, after = load(before_path), load(after_path)
+    print(f"Antes:   {before_path} ({before['meta'].get('gitCommit') or 'sin commit'})")
+    print(f"Después: {after_path} ({after['meta'].get('gitCommit') or 'sin commit'})")
+    if before["meta"].get("config", {}).get("latency") != after["meta"].get("config", {}).get("latency"):
+        print("⚠️ Las corridas usan distinta latencia de Gemini: las diferencias no son comparables")
+
+    old, new = before["totals"], after["totals"]
+    print(f"\n📊 Throughput: {old['throughputRps']} -> {new['throughputRps']} req/s {delta(old['throughputRps'], new['throughputRps'])}")
+    print(f"   Errores:    {old['errorRate']:.2%} -> {new['errorRate']:.2%}")
+    old_lag, new_lag = before["loopLag"], after["loopLag"]
+    print(f"🔁 Lag p99:    {old_lag['p99Ms']} -> {new_lag['p99Ms']} ms {delta(old_lag['p99Ms'], new_lag['p99Ms'])}")
+
+    print(f"\n{'escenario':<24} {'p50 antes':>10} {'después':>9} {'':>8} {'p95 antes':>10} {'después':>9} {'':>8}")
+    regressions = []
+    for name in sorted(set(before["scenarios"]) | set(after["scenarios"])):
+        a, b = before["scenarios"].get(name), after["scenarios"].get(name)
+        if a is None or b is None:
+            print(f"{name:<24} {'(solo en una de las corridas)':>50}")
+            continue
+        print(f"{name:<24} {a['p50Ms']:>10} {b['p50Ms']:>9} {delta(a['p50Ms'], b['p50Ms']):>8} "
+              f"{a['p95Ms']:>10} {b['p95Ms']:>9} {delta(a['p95Ms'], b['p95Ms']):>8}")
+        if max_regression and a["p95Ms"] and (b["p95Ms"] - a["p95Ms"]) / a["p95Ms"] * 100 > max_regression:
+            regressions.append(name)
+
+    for name in regressions:
+        print(f"❌ {name}: p95 empeoró más de {max_regression}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmark")
+    parser.add_argument("before", help="Resultado de referencia (JSON)")
+    parser.add_argument("after", help="Resultado nuevo (JSON)")
+    parser.add_argument("--max-regression", type=float, default=0, help="Falla si un p95 empeora más de este %%")
+    args = parser.parse_args()
+    sys.exit(main(args.before, args.after, args.max_regression))
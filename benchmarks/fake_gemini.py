@@ -0,0 +1,197 @@
+# benchmarks/fake_gemini.py
+# Reemplazo local de los modelos de Gemini para los benchmarks: misma interfaz que usa
+# GeminiService (generate_content_async, start_chat/send_message_async, streaming), con
+# latencia aleatoria configurable, conteo de tokens, errores y 429 a una tasa dada, y
+# respuestas JSON válidas para las llamadas en modo JSON.
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+SUBJECT_TOPICS = ["álgebra", "geometría", "analogías", "series numéricas", "comprensión lectora"]
+
+
+class ResourceExhausted(Exception):
+    """Mismo nombre que la excepción de google.api_core: el regulador la trata como 429"""
+
+
+class FakeBackendError(Exception):
+    """Error genérico del servicio (500) simulado"""
+
+
+class LatencyModel:
+    """Distribución de latencias: "fixed:S", "uniform:MIN,MAX" o "lognormal:MEDIANA,SIGMA" (segundos)"""
+
+    def __init__(self, spec: str, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Distribución de latencia desconocida: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(self.params[0], self.params[1])
+        median, sigma = self.params
+        return self.rng.lognormvariate(0, sigma) * median
+
+
+def _usage(prompt: str, text: str) -> SimpleNamespace:
+    prompt_tokens = max(1, len(prompt) // 4)
+    response_tokens = max(1, len(text) // 4)
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=response_tokens,
+        total_token_count=prompt_tokens + response_tokens
+    )
+
+
+class FakeResponse:
+    def __init__(self, prompt: str, text: str):
+        self.text = text
+        self.usage_metadata = _usage(prompt, text)
+
+
+class FakeStream:
+    """Respuesta en streaming: fragmentos con una pequeña pausa entre cada uno"""
+
+    def __init__(self, prompt: str, text: str, chunk_delay: float, chunks: int = 6):
+        size = max(1, len(text) // chunks)
+        self._parts = [text[i:i + size] for i in range(0, len(text), size)]
+        self._delay = chunk_delay
+        self.usage_metadata = _usage(prompt, text)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for part in self._parts:
+            await asyncio.sleep(self._delay)
+            yield SimpleNamespace(text=part)
+
+
+class FakeGeminiBackend:
+    """Estado compartido por los modelos falsos: configuración, azar y contadores"""
+
+    def __init__(
+        self,
+        latency: str = "lognormal:0.8,0.4",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        text_words: int = 180,
+        seed: int = 42
+    ):
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.text_words = text_words
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self.by_kind: Dict[str, int] = {}
+
+    def model(self, json_mode: bool) -> "FakeModel":
+        return FakeModel(self, json_mode)
+
+    async def respond(self, prompt: str, json_mode: bool, stream: bool = False):
+        self.calls += 1
+        delay = self.latency.sample()
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            # Los 429 reales vuelven rápido
+            await asyncio.sleep(min(delay, 0.05))
+            raise ResourceExhausted("429 Resource has been exhausted (simulado)")
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            await asyncio.sleep(delay)
+            raise FakeBackendError("500 Internal error (simulado)")
+
+        kind, text = self._payload(prompt, json_mode)
+        self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+        if stream:
+            # El primer fragmento llega tras ~1/3 de la latencia; el resto, repartido
+            await asyncio.sleep(delay / 3)
+            response = FakeStream(prompt, text, chunk_delay=delay * 2 / 3 / 6)
+        else:
+            await asyncio.sleep(delay)
+            response = FakeResponse(prompt, text)
+        self.tokens += response.usage_metadata.total_token_count
+        return response
+
+    def _question(self) -> Dict:
+        correct = self.rng.randrange(4)
+        return {
+            "question": f"¿Cuál es el resultado del ejercicio {self.rng.randrange(10**6)}?",
+            "options": [f"opción {letter}" for letter in "ABCD"],
+            "correct": correct,
+            "explanation": "La opción correcta se obtiene aplicando la propiedad distributiva.",
+            "difficulty": self.rng.choice(["fácil", "medio", "difícil"]),
+            "topic": self.rng.choice(SUBJECT_TOPICS)
+        }
+
+    def _payload(self, prompt: str, json_mode: bool):
+        if not json_mode:
+            words = " ".join(self.rng.choice(["estudia", "practica", "repasa", "álgebra", "ejercicio", "bien"])
+                             for _ in range(self.text_words))
+            return "text", f"¡Muy bien! {words}."
+        if '"questions"' in prompt:
+            match = re.search(r"Genera (\d+) preguntas", prompt)
+            count = int(match.group(1)) if match else 5
+            return "questions", json.dumps({"questions": [self._question() for _ in range(count)]}, ensure_ascii=False)
+        if '"question"' in prompt:
+            return "question", json.dumps(self._question(), ensure_ascii=False)
+        if '"weeklyGoals"' in prompt:
+            plan = {
+                "summary": "Plan de cuatro semanas con foco en tus temas débiles.",
+                "weeklyGoals": [f"Objetivo semana {week}" for week in range(1, 5)],
+                "dailySchedule": [
+                    {"day": day, "subjects": ["Matemática"], "topics": ["Álgebra"], "estimatedTime": 60,
+                     "goals": ["Resolver 20 problemas"]}
+                    for day in ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes")
+                ],
+                "milestones": [{"week": week, "goal": "Avanzar", "expectedScore": 60 + week * 5} for week in range(1, 5)],
+                "tips": ["Descansa bien", "Repasa tus errores", "Practica a diario"]
+            }
+            return "study_plan", json.dumps(plan, ensure_ascii=False)
+        return "json", "{}"
+
+    def stats(self) -> Dict:
+        return {
+            "latency": self.latency.spec,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rateLimited": self.rate_limited,
+            "tokens": self.tokens,
+            "byKind": self.by_kind
+        }
+
+
+class FakeChat:
+    def __init__(self, backend: FakeGeminiBackend, history: Optional[List[Dict]]):
+        self.backend = backend
+        self.history = history or []
+
+    async def send_message_async(self, message: str, stream: bool = False, **kwargs):
+        prompt = "".join(str(part) for turn in self.history for part in turn.get("parts", [])) + message
+        return await self.backend.respond(prompt, json_mode=False, stream=stream)
+
+
+class FakeModel:
+    def __init__(self, backend: FakeGeminiBackend, json_mode: bool):
+        self.backend = backend
+        self.json_mode = json_mode
+
+    async def generate_content_async(self, prompt: str, stream: bool = False, **kwargs):
+        return await self.backend.respond(prompt, self.json_mode, stream=stream)
+
+    def start_chat(self, history: Optional[List[Dict]] = None) -> FakeChat:
+        return FakeChat(self.backend, history)
@@ -0,0 +1,53 @@
+# benchmarks/harness.py
+# Arma la app para benchmarks y replays: fija la configuración (antes de importar app.*,
+# porque settings se lee al importar), conecta el Gemini falso a los cuatro modelos del
+# servicio y, si se pide, reemplaza MongoDB por la base en memoria.
+import os
+
+# Las variables de entorno ya definidas tienen prioridad
+BENCH_ENV = {
+    "GEMINI_API_KEY": "benchmark",
+    "GEMINI_PRELOAD": "false",
+    "MONGODB_DB_NAME": "prepia_bench",
+    # El regulador real limita a 15 RPM; aquí medimos la app, no la cuota
+    "GEMINI_REQUESTS_PER_MINUTE": "1000000",
+    "GEMINI_TOKENS_PER_MINUTE": "1000000000",
+    # Costo mínimo de bcrypt para sembrar rápido (el login sí mide el pool de hashes)
+    "BCRYPT_ROUNDS": "4",
+}
+for key, value in BENCH_ENV.items():
+    os.environ.setdefault(key, value)
+
+from benchmarks.fake_gemini import FakeGeminiBackend  # noqa: E402
+from benchmarks.mongo_standin import create_client  # noqa: E402
+
+
+def bench_env() -> dict:
+    return {key: os.environ[key] for key in BENCH_ENV}
+
+
+def install_standins(backend: FakeGeminiBackend, in_memory_mongo: bool = True):
+    """Devuelve app.main con Gemini (y opcionalmente MongoDB) reemplazados"""
+    from app import main
+    from app.db import db as db_module
+    from app.services.gemini_service import get_gemini_service
+
+    if in_memory_mongo:
+        mongo_client = create_client()
+
+        async def connect_standin():
+            db_module.db.client = mongo_client
+
+        async def close_standin():
+            db_module.db.client = None
+
+        main.connect_to_mongo = connect_standin
+        main.close_mongo_connection = close_standin
+
+    # Los cuatro modelos del servicio (normal/JSON y los de cobertura) apuntan al falso
+    service = get_gemini_service()
+    service.model_text = backend.model(json_mode=False)
+    service.model_json = backend.model(json_mode=True)
+    service.hedge_model_text = backend.model(json_mode=False)
+    service.hedge_model_json = backend.model(json_mode=True)
+    return main
@@ -0,0 +1,42 @@
+# benchmarks/mongo_standin.py
+# MongoDB en memoria (mongomock-motor) para correr la app sin servidor. Es una dependencia
+# solo de los benchmarks: pip install -r benchmarks/requirements.txt
+#
+# mongomock no soporta la opción "timezone" de los operadores de fecha, así que el pipeline
+# de analytics se reescribe con un desfase fijo equivalente (la zona de la app no tiene
+# horario de verano).
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.db import analytics
+
+try:
+    import mongomock_motor
+except ImportError:  # pragma: no cover
+    mongomock_motor = None
+
+
+def _shifted_start_time() -> dict:
+    offset = ZoneInfo(settings.TIMEZONE).utcoffset(datetime.utcnow())
+    # mongomock solo acepta fecha - número (no fecha + número)
+    return {"$subtract": ["$startTime", -int(offset.total_seconds() * 1000)]}
+
+
+def _session_fields_without_timezone() -> dict:
+    stage = _original_session_fields()
+    fields = stage["$project"]
+    fields["day"] = {"$dateToString": {"format": "%Y-%m-%d", "date": _shifted_start_time()}}
+    fields["hour"] = {"$hour": _shifted_start_time()}
+    return stage
+
+
+_original_session_fields = analytics._session_fields
+
+
+def create_client():
+    """Cliente Motor en memoria, con los ajustes que necesita mongomock"""
+    if mongomock_motor is None:
+        raise SystemExit("❌ Falta mongomock-motor: pip install -r benchmarks/requirements.txt")
+    analytics._session_fields = _session_fields_without_timezone
+    return mongomock_motor.AsyncMongoMockClient()
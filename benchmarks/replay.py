@@ -0,0 +1,424 @@
+# benchmarks/replay.py (ejecutar desde la raíz del proyecto)
+# Reproduce trazas capturadas con TRAFFIC_CAPTURE_ENABLED (app/core/traffic_capture.py)
+# respetando los tiempos originales entre peticiones (o acelerados con --speed), y compara
+# la latencia de cada ruta contra la que se registró en producción.
+#
+# Por defecto corre la app en el mismo proceso con Gemini falso y MongoDB en memoria; con
+# --target apunta a una instancia ya levantada (p. ej. python -m benchmarks.serve, que
+# también usa Gemini falso). Cada usuario de las trazas (hash) se reemplaza por un usuario
+# sintético creado al inicio, con --sessions sesiones de historial.
+#
+#   python -m benchmarks.replay traces/traces-*.ndjson [--speed 2] [--target http://127.0.0.1:8001]
+#       [--routes /api/ai,/api/sesiones] [--limit 5000] [--out benchmarks/results/replay.json]
+import argparse
+import asyncio
+import glob
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from benchmarks.harness import bench_env, install_standins  # isort: skip (fija el entorno antes de importar app)
+
+import httpx
+
+from app.core.traffic_capture import TRACE_VERSION
+from benchmarks.fake_gemini import FakeGeminiBackend
+from benchmarks.report import measure_loop_lag, run_meta, summarize, write_result
+from benchmarks.run import Recorder
+from benchmarks.scenarios import Context
+
+CREATE_USER_ROUTE = ("POST", "/api/usuarios/")
+FILLER_WORDS = "el estudiante resuelve ejercicios de álgebra y geometría para el examen de admisión".split()
+
+
+class SkipTrace(Exception):
+    """La traza no se puede reproducir (cuerpo truncado, id de trabajo desconocido, ...)"""
+
+
+def load_traces(paths: List[str], routes: List[str], limit: int) -> List[Dict]:
+    traces = []
+    skipped_versions = 0
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    trace = json.loads(line)
+                    if trace.get("v") != TRACE_VERSION:
+                        skipped_versions += 1
+                        continue
+                    if routes and not trace["route"].startswith(tuple(routes)):
+                        continue
+                    traces.append(trace)
+    if skipped_versions:
+        print(f"⚠️ {skipped_versions} trazas con otro formato ignoradas")
+    traces.sort(key=lambda t: t["ts"])
+    return traces[:limit] if limit else traces
+
+
+def _walk_markers(value, found: Dict[str, set]):
+    if isinstance(value, dict):
+        for marker in ("$user", "$email"):
+            if marker in value:
+                found[marker].add(value[marker])
+                return
+        for child in value.values():
+            _walk_markers(child, found)
+
+
+def filler(length: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(random.choice(FILLER_WORDS))
+    return " ".join(words)[:max(1, length)]
+
+
+class ReplayUsers:
+    """Usuarios sintéticos que reemplazan a los usuarios (hasheados) de las trazas"""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.password = f"replay-{run_id}"
+        self.ids: Dict[str, str] = {}  # hash de userId -> id sintético
+        self.emails: Dict[str, str] = {}  # hash de email -> email sintético
+        self.tokens: Dict[str, str] = {}  # id sintético -> token
+        self.created = 0
+        self.last_job_id: Optional[str] = None
+        self.creating: Dict[str, asyncio.Event] = {}  # hash de email -> creación en curso
+
+    def new_email(self) -> str:
+        self.created += 1
+        return f"replay_{self.run_id}_{self.created}@prepia-bench.com"
+
+    async def create(self, client: httpx.AsyncClient, email: str) -> str:
+        response = await client.post("/api/usuarios/", json={
+            "name": email.split("@")[0], "email": email, "password": self.password
+        })
+        response.raise_for_status()
+        user_id = response.json()["_id"]
+        login = await client.post("/api/usuarios/login", json={"email": email, "password": self.password})
+        login.raise_for_status()
+        self.tokens[user_id] = login.json()["access_token"]
+        return user_id
+
+    async def prepare(self, client: httpx.AsyncClient, traces: List[Dict], sessions: int, rng: random.Random):
+        user_hashes, login_emails, created_emails = set(), set(), set()
+        for trace in traces:
+            found = {"$user": set(), "$email": set()}
+            _walk_markers(trace.get("params"), found)
+            _walk_markers(trace.get("body"), found)
+            user_hashes |= found["$user"]
+            if (trace["method"], trace["route"]) == CREATE_USER_ROUTE:
+                created_emails |= found["$email"]
+            else:
+                login_emails |= found["$email"]
+
+        sessions_ctx = Context([], rng)
+
+        async def prepare_user(user_hash: Optional[str], email_hash: Optional[str]):
+            email = self.new_email()
+            user_id = await self.create(client, email)
+            if user_hash:
+                self.ids[user_hash] = user_id
+            if email_hash:
+                self.emails[email_hash] = email
+            remaining = sessions
+            while remaining > 0:
+                chunk = min(remaining, 100)
+                bulk = await client.post("/api/sesiones/bulk", json={
+                    "sessions": [sessions_ctx.session(user_id) for _ in range(chunk)]
+                })
+                bulk.raise_for_status()
+                remaining -= chunk
+
+        # Los emails que se crean dentro de las trazas se crean al reproducirlas
+        pending = [(h, None) for h in user_hashes] + [(None, h) for h in login_emails - created_emails]
+        for i in range(0, len(pending), 10):
+            await asyncio.gather(*[prepare_user(*item) for item in pending[i:i + 10]])
+
+    def user_id(self, user_hash: str) -> str:
+        if user_hash not in self.ids:
+            # Usuario que solo aparece en una traza creada durante el replay: uno cualquiera
+            self.ids[user_hash] = random.choice(list(self.tokens))
+        return self.ids[user_hash]
+
+
+def materialize(shape, users: ReplayUsers, create_user: bool = False):
+    """Cuerpo concreto a partir de la forma registrada en la traza"""
+    if isinstance(shape, dict):
+        if "$list" in shape:
+            item = shape["$item"]
+            return [materialize(item, users, create_user) for _ in range(shape["$list"])] if item is not None else []
+        if "$str" in shape:
+            return filler(shape["$str"])
+        if "$datetime" in shape:
+            return (datetime.utcnow() + timedelta(seconds=shape["$datetime"])).isoformat()
+        if "$date" in shape:
+            return (datetime.utcnow() + timedelta(days=shape["$date"])).date().isoformat()
+        if "$user" in shape:
+            return users.user_id(shape["$user"])
+        if "$email" in shape:
+            if create_user:
+                email = users.new_email()
+                users.emails[shape["$email"]] = email
+                return email
+            return users.emails.get(shape["$email"]) or users.new_email()
+        if "$secret" in shape:
+            return users.password
+        if "$truncated" in shape or "$raw" in shape:
+            raise SkipTrace("cuerpo no registrado")
+        return {key: materialize(value, users, create_user) for key, value in shape.items()}
+    return shape
+
+
+def build_request(trace: Dict, users: ReplayUsers) -> Dict:
+    path = trace["route"]
+    acting_user = None
+    for name, value in (trace.get("params") or {}).items():
+        if "$user" in value:
+            concrete = users.user_id(value["$user"])
+            acting_user = concrete
+        elif name == "job_id":
+            if users.last_job_id is None:
+                raise SkipTrace("sin trabajo previo")
+            concrete = users.last_job_id
+        else:
+            raise SkipTrace(f"parámetro {name} no reproducible")
+        path = path.replace("{" + name + "}", concrete)
+
+    params = {k: v for k, v in (trace.get("query") or {}).items() if not isinstance(v, dict)}
+    request = {"method": trace["method"], "url": path, "params": params, "headers": {}}
+    if "body" in trace:
+        create_user = (trace["method"], trace["route"]) == CREATE_USER_ROUTE
+        body = materialize(trace["body"], users, create_user)
+        if isinstance(body, dict) and isinstance(body.get("userId"), str):
+            acting_user = body["userId"]
+        request["json"] = body
+    if trace.get("auth") and acting_user in users.tokens:
+        request["headers"]["Authorization"] = f"Bearer {users.tokens[acting_user]}"
+    return request
+
+
+async def replay(client: httpx.AsyncClient, traces: List[Dict], users: ReplayUsers, speed: float,
+                 max_in_flight: int, recorder: Recorder) -> Dict:
+    semaphore = asyncio.Semaphore(max_in_flight)
+    lateness: List[float] = []
+    skipped: Dict[str, int] = {}
+    first_ts = traces[0]["ts"]
+    started = time.perf_counter()
+
+    async def send(trace: Dict):
+        key = f"{trace['method']} {trace['route']}"
+        found = {"$user": set(), "$email": set()}
+        _walk_markers(trace.get("body"), found)
+        is_create = (trace["method"], trace["route"]) == CREATE_USER_ROUTE
+        created = None
+        if is_create and found["$email"]:
+            # Un login del mismo email espera a que termine la creación (como en el original)
+            created = asyncio.Event()
+            for email_hash in found["$email"]:
+                users.creating[email_hash] = created
+        else:
+            for email_hash in found["$email"]:
+                pending = users.creating.get(email_hash)
+                if pending is not None:
+                    try:
+                        await asyncio.wait_for(pending.wait(), timeout=30)
+                    except asyncio.TimeoutError:
+                        pass
+        try:
+            request = build_request(trace, users)
+        except SkipTrace as e:
+            skipped[str(e)] = skipped.get(str(e), 0) + 1
+            if created:
+                created.set()
+            return
+        async with semaphore:
+            request_started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                status = str(response.status_code)
+                renewed = response.headers.get("X-Access-Token")
+                if renewed:
+                    # PUT del perfil: el usuario sigue con el token nuevo
+                    sent = request["headers"].get("Authorization", "").removeprefix("Bearer ")
+                    for user_id, token in list(users.tokens.items()):
+                        if token == sent:
+                            users.tokens[user_id] = renewed
+                if response.headers.get("content-type", "").startswith("application/json"):
+                    data = response.json()
+                    if isinstance(data, dict) and data.get("jobId"):
+                        users.last_job_id = data["jobId"]
+            except Exception as e:
+                status = type(e).__name__
+            finally:
+                if created:
+                    created.set()
+            recorder.record(key, (time.perf_counter() - request_started) * 1000, status)
+
+    tasks = []
+    for trace in traces:
+        if speed > 0:
+            due = (trace["ts"] - first_ts) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lateness.append(max(0.0, (time.perf_counter() - started - due) * 1000))
+        tasks.append(asyncio.create_task(send(trace)))
+    await asyncio.gather(*tasks)
+    return {"elapsed": time.perf_counter() - started, "lateness": lateness, "skipped": skipped}
+
+
+def recorded_summary(traces: List[Dict]) -> Dict:
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for trace in traces:
+        key = f"{trace['method']} {trace['route']}"
+        latencies.setdefault(key, []).append(trace["ms"])
+        errors[key] = errors.get(key, 0) + (1 if trace["status"] >= 400 else 0)
+    return {
+        key: {"requests": len(values), "errors": errors[key], **summarize(values)}
+        for key, values in sorted(latencies.items())
+    }
+
+
+def delta(old: float, new: float) -> Optional[float]:
+    return round((new - old) / old * 100, 1) if old else None
+
+
+async def run(args) -> Dict:
+    traces = load_traces(args.traces, [r for r in args.routes.split(",") if r], args.limit)
+    if not traces:
+        raise SystemExit("❌ No hay trazas para reproducir")
+    span = traces[-1]["ts"] - traces[0]["ts"]
+    print(f"📼 {len(traces)} trazas ({span:.0f}s de tráfico original), velocidad x{args.speed or '∞'}")
+
+    main = None
+    backend = None
+    if args.target:
+        transport = None
+        base_url = args.target
+    else:
+        backend = FakeGeminiBackend(latency=args.latency, seed=args.seed)
+        main = install_standins(backend)
+        await main.startup_event()
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = "http://replay"
+
+    recorder = Recorder()
+    lag_samples: List[float] = []
+    try:
+        limits = httpx.Limits(max_connections=args.max_in_flight)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=120, limits=limits) as client:
+            users = ReplayUsers(uuid.uuid4().hex[:8])
+            print(f"🌱 Preparando usuarios sintéticos ({args.sessions} sesiones cada uno)...")
+            await users.prepare(client, traces, args.sessions, random.Random(args.seed))
+            print(f"👥 {len(users.tokens)} usuarios listos")
+
+            stop = asyncio.Event()
+            # El lag del event loop solo tiene sentido con la app en este proceso
+            lag_task = asyncio.create_task(measure_loop_lag(lag_samples, stop)) if main else None
+            outcome = await replay(client, traces, users, args.speed, args.max_in_flight, recorder)
+            stop.set()
+            if lag_task:
+                await lag_task
+    finally:
+        if main:
+            await main.shutdown_event()
+
+    recorded = recorded_summary(traces)
+    scenarios = recorder.report()
+    for key, row in scenarios.items():
+        original = recorded.get(key)
+        if original:
+            row["recorded"] = original
+            row["deltaPct"] = {p: delta(original[p], row[p]) for p in ("p50Ms", "p95Ms", "p99Ms")}
+
+    total = sum(row["requests"] for row in scenarios.values())
+    errors = sum(row["errors"] for row in scenarios.values())
+    all_latencies = [ms for values in recorder.latencies.values() for ms in values]
+    elapsed = outcome["elapsed"]
+    return {
+        "meta": {
+            **run_meta(),
+            "kind": "replay",
+            "config": {
+                "traces": args.traces,
+                "routes": args.routes,
+                "speed": args.speed,
+                "target": args.target or "in-process",
+                "latency": args.latency if not args.target else None,
+                "sessionsPerUser": args.sessions,
+                "maxInFlight": args.max_in_flight,
+                "env": bench_env() if not args.target else None
+            }
+        },
+        "totals": {
+            "requests": total,
+            "errors": errors,
+            "errorRate": round(errors / total, 4) if total else 0.0,
+            "skipped": outcome["skipped"],
+            "durationSeconds": round(elapsed, 2),
+            "throughputRps": round(total / elapsed, 2) if elapsed else 0.0,
+            "recordedSpanSeconds": round(span, 2),
+            "schedulingLateness": summarize(outcome["lateness"]),
+            **summarize(all_latencies)
+        },
+        "loopLag": {"samples": len(lag_samples), **summarize(lag_samples)},
+        "scenarios": scenarios,
+        "fakeGemini": backend.stats() if backend else None
+    }
+
+
+def print_report(result: Dict):
+    print(f"\n{'ruta':<42} {'n':>5} {'err':>4} {'p50 orig':>9} {'replay':>8} {'Δ':>7} {'p95 orig':>9} {'replay':>8} {'Δ':>7}")
+    for key, row in result["scenarios"].items():
+        original = row.get("recorded", {})
+        change = row.get("deltaPct", {})
+
+        def pct(name):
+            return f"{change[name]:+.0f}%" if change.get(name) is not None else "—"
+
+        print(f"{key:<42} {row['requests']:>5} {row['errors']:>4} "
+              f"{original.get('p50Ms', '—'):>9} {row['p50Ms']:>8} {pct('p50Ms'):>7} "
+              f"{original.get('p95Ms', '—'):>9} {row['p95Ms']:>8} {pct('p95Ms'):>7}")
+    totals = result["totals"]
+    print(f"\n📊 {totals['requests']} peticiones en {totals['durationSeconds']}s "
+          f"({totals['recordedSpanSeconds']}s originales): {totals['throughputRps']} req/s, {totals['errors']} errores")
+    if totals["skipped"]:
+        print(f"⏭️ Omitidas: {totals['skipped']}")
+    late = totals["schedulingLateness"]
+    print(f"🕒 Retraso del envío respecto del horario original p99: {late['p99Ms']} ms")
+    if result["loopLag"]["samples"]:
+        lag = result["loopLag"]
+        print(f"🔁 Lag del event loop p50/p95/p99: {lag['p50Ms']} / {lag['p95Ms']} / {lag['p99Ms']} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reproduce trazas de tráfico real y compara latencias")
+    parser.add_argument("traces", nargs="+", help="Archivos NDJSON (acepta comodines)")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = ritmo original, 2 = el doble de rápido, 0 = sin esperas")
+    parser.add_argument("--target", default="", help="URL de una instancia levantada (por defecto la app en este proceso)")
+    parser.add_argument("--routes", default="", help="Prefijos de ruta a reproducir, separados por coma")
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de trazas (0 = todas)")
+    parser.add_argument("--sessions", type=int, default=20, help="Sesiones de historial por usuario sintético")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="Tope de peticiones simultáneas")
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="Latencia del Gemini falso (solo en proceso)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="", help="Archivo JSON de salida (por defecto benchmarks/results/replay-<fecha>.json)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    out = write_result(result, args.out, prefix="replay-")
+    print(f"💾 Resultado guardado en {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# benchmarks/report.py
+# Utilidades comunes a benchmarks/run.py y benchmarks/replay.py: percentiles, lag del
+# event loop y escritura del resultado en JSON.
+import asyncio
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+LAG_INTERVAL_SECONDS = 0.05
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values_ms: List[float]) -> Dict:
+    return {
+        "p50Ms": round(percentile(values_ms, 0.50), 1),
+        "p95Ms": round(percentile(values_ms, 0.95), 1),
+        "p99Ms": round(percentile(values_ms, 0.99), 1),
+        "maxMs": round(max(values_ms), 1) if values_ms else 0.0,
+        "meanMs": round(sum(values_ms) / len(values_ms), 1) if values_ms else 0.0
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_meta() -> Dict:
+    return {
+        "startedAt": datetime.utcnow().isoformat(),
+        "gitCommit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform()
+    }
+
+
+async def measure_loop_lag(samples: List[float], stop: asyncio.Event):
+    """Diferencia entre cuándo debía despertar un sleep corto y cuándo despertó"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_INTERVAL_SECONDS
+        await asyncio.sleep(LAG_INTERVAL_SECONDS)
+        samples.append(max(0.0, (loop.time() - expected) * 1000))
+
+
+def write_result(result: Dict, out: str = "", prefix: str = "") -> str:
+    """Guarda el resultado (por defecto en benchmarks/results/<prefijo><fecha>.json)"""
+    out = out or os.path.join(RESULTS_DIR, prefix + datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return out
@@ -0,0 +1,230 @@
+# benchmarks/run.py (ejecutar desde la raíz del proyecto)
+# Prueba de carga de app.main:app sin servicios externos: Gemini se reemplaza por
+# benchmarks/fake_gemini.py y MongoDB por una base en memoria sembrada con usuarios y
+# sesiones sintéticos (creados a través de la propia API). Recorre los tres routers a la
+# concurrencia indicada y reporta p50/p95/p99 por escenario, throughput y lag del event loop.
+# El resultado se guarda en JSON para comparar corridas (python -m benchmarks.compare).
+#
+#   pip install -r benchmarks/requirements.txt
+#   python -m benchmarks.run [--concurrency 32] [--duration 30] [--latency lognormal:0.8,0.4]
+#       [--error-rate 0.01] [--rate-limit-rate 0.02] [--weights "ai=0,usuarios.get=10"]
+#       [--out benchmarks/results/mi_corrida.json]
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, List
+
+from benchmarks.harness import bench_env, install_standins  # isort: skip (fija el entorno antes de importar app)
+
+import httpx
+
+from benchmarks.fake_gemini import FakeGeminiBackend
+from benchmarks.report import measure_loop_lag, run_meta, summarize, write_result
+from benchmarks.scenarios import SCENARIOS, BenchUser, Context, parse_weights
+
+# Secciones de /api/ai/stats que se guardan junto al resultado
+APP_STATS_KEYS = ("cache", "singleFlight", "governor", "questionPool", "jobs", "userCache", "tokens", "circuitBreaker")
+
+
+class Recorder:
+    """Latencias y códigos de estado por escenario"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, elapsed_ms: float, status: str):
+        self.latencies.setdefault(name, []).append(elapsed_ms)
+        codes = self.statuses.setdefault(name, {})
+        codes[status] = codes.get(status, 0) + 1
+
+    def report(self) -> Dict:
+        scenarios = {}
+        for name in sorted(self.latencies):
+            codes = self.statuses[name]
+            errors = sum(count for code, count in codes.items() if not code.startswith(("2", "3")))
+            scenarios[name] = {
+                "requests": len(self.latencies[name]),
+                "errors": errors,
+                "statusCodes": codes,
+                **summarize(self.latencies[name])
+            }
+        return scenarios
+
+
+async def seed(client: httpx.AsyncClient, ctx_rng: random.Random, users: int, sessions_per_user: int) -> List[BenchUser]:
+    """Crea usuarios, inicia sesión con cada uno y carga su historial por /api/sesiones/bulk"""
+    seeded = []
+    ctx = Context([], ctx_rng)
+    for i in range(users):
+        user = BenchUser(id="", email=f"bench_{i}@prepia-bench.com", password=f"bench-password-{i}")
+        response = await client.post("/api/usuarios/", json={
+            "name": f"bench_{i}", "email": user.email, "password": user.password
+        })
+        response.raise_for_status()
+        user.id = response.json()["_id"]
+        login = await client.post("/api/usuarios/login", json={"email": user.email, "password": user.password})
+        login.raise_for_status()
+        user.token = login.json()["access_token"]
+
+        remaining = sessions_per_user
+        while remaining > 0:
+            chunk = min(remaining, 100)
+            bulk = await client.post("/api/sesiones/bulk", json={
+                "sessions": [ctx.session(user.id) for _ in range(chunk)]
+            })
+            bulk.raise_for_status()
+            remaining -= chunk
+        seeded.append(user)
+    return seeded
+
+
+async def worker(client, ctx: Context, names: List[str], weights: List[int], recorder: Recorder,
+                 deadline: float, budget: Dict[str, int]):
+    while time.perf_counter() < deadline:
+        if budget["remaining"] is not None:
+            if budget["remaining"] <= 0:
+                return
+            budget["remaining"] -= 1
+        name = ctx.rng.choices(names, weights)[0]
+        scenario = SCENARIOS[name][0]
+        started = time.perf_counter()
+        try:
+            response = await scenario(client, ctx)
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        recorder.record(name, (time.perf_counter() - started) * 1000, status)
+
+
+async def run(args) -> Dict:
+    weights = parse_weights(args.weights)
+    backend = FakeGeminiBackend(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        text_words=args.text_words,
+        seed=args.seed
+    )
+    main = install_standins(backend)
+
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    limits = httpx.Limits(max_connections=None)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120, limits=limits) as client:
+            rng = random.Random(args.seed)
+            print(f"🌱 Sembrando {args.users} usuarios con {args.sessions} sesiones cada uno...")
+            seed_started = time.perf_counter()
+            users = await seed(client, rng, args.users, args.sessions)
+            seed_seconds = time.perf_counter() - seed_started
+            ctx = Context(users, rng)
+            gemini_calls_after_seed = backend.calls
+
+            names, values = list(weights), list(weights.values())
+            recorder = Recorder()
+            lag_samples: List[float] = []
+            stop = asyncio.Event()
+            lag_task = asyncio.create_task(measure_loop_lag(lag_samples, stop))
+
+            print(f"🏁 {args.concurrency} clientes concurrentes durante {args.duration}s"
+                  + (f" (máx. {args.requests} peticiones)" if args.requests else ""))
+            budget = {"remaining": args.requests or None}
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*[
+                worker(client, ctx, names, values, recorder, deadline, budget)
+                for _ in range(args.concurrency)
+            ])
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await lag_task
+
+            app_stats = (await client.get("/api/ai/stats")).json()
+    finally:
+        await main.shutdown_event()
+
+    scenarios = recorder.report()
+    total = sum(s["requests"] for s in scenarios.values())
+    errors = sum(s["errors"] for s in scenarios.values())
+    all_latencies = [ms for values_ms in recorder.latencies.values() for ms in values_ms]
+    fake_stats = backend.stats()
+    fake_stats["callsDuringRun"] = backend.calls - gemini_calls_after_seed
+
+    return {
+        "meta": {
+            **run_meta(),
+            "seedSeconds": round(seed_seconds, 2),
+            "config": {
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "requests": args.requests,
+                "users": args.users,
+                "sessionsPerUser": args.sessions,
+                "latency": args.latency,
+                "errorRate": args.error_rate,
+                "rateLimitRate": args.rate_limit_rate,
+                "textWords": args.text_words,
+                "seed": args.seed,
+                "weights": weights,
+                "env": bench_env()
+            }
+        },
+        "totals": {
+            "requests": total,
+            "errors": errors,
+            "errorRate": round(errors / total, 4) if total else 0.0,
+            "durationSeconds": round(elapsed, 2),
+            "throughputRps": round(total / elapsed, 2) if elapsed else 0.0,
+            **summarize(all_latencies)
+        },
+        "loopLag": {"samples": len(lag_samples), **summarize(lag_samples)},
+        "scenarios": scenarios,
+        "fakeGemini": fake_stats,
+        "app": {key: app_stats.get(key) for key in APP_STATS_KEYS if key in app_stats}
+    }
+
+
+def print_report(result: Dict):
+    totals, lag = result["totals"], result["loopLag"]
+    print(f"\n{'escenario':<24} {'n':>6} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, row in result["scenarios"].items():
+        print(f"{name:<24} {row['requests']:>6} {row['errors']:>5} "
+              f"{row['p50Ms']:>8} {row['p95Ms']:>8} {row['p99Ms']:>8}")
+    print(f"\n📊 {totals['requests']} peticiones en {totals['durationSeconds']}s: "
+          f"{totals['throughputRps']} req/s, {totals['errors']} errores")
+    print(f"⏱️ Latencia total p50/p95/p99: {totals['p50Ms']} / {totals['p95Ms']} / {totals['p99Ms']} ms")
+    print(f"🔁 Lag del event loop p50/p95/p99: {lag['p50Ms']} / {lag['p95Ms']} / {lag['p99Ms']} ms (máx. {lag['maxMs']})")
+    fake = result["fakeGemini"]
+    print(f"🤖 Gemini falso: {fake['callsDuringRun']} llamadas, {fake['errors']} errores, {fake['rateLimited']} 429")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de carga con Gemini falso y MongoDB en memoria")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clientes concurrentes")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--requests", type=int, default=0, help="Detiene la carga tras N peticiones (0 = sin límite)")
+    parser.add_argument("--users", type=int, default=50, help="Usuarios sintéticos")
+    parser.add_argument("--sessions", type=int, default=40, help="Sesiones sembradas por usuario")
+    parser.add_argument("--latency", default="lognormal:0.8,0.4",
+                        help='Latencia de Gemini: "fixed:S", "uniform:MIN,MAX" o "lognormal:MEDIANA,SIGMA"')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de llamadas a Gemini que fallan")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fracción de llamadas que devuelven 429")
+    parser.add_argument("--text-words", type=int, default=180, help="Largo de las respuestas de texto (palabras)")
+    parser.add_argument("--weights", default="", help='Pesos por escenario, p. ej. "ai=0,usuarios.get=10"')
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del azar (corridas reproducibles)")
+    parser.add_argument("--out", default="", help="Archivo JSON de salida (por defecto benchmarks/results/<fecha>.json)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    out = write_result(result, args.out)
+    print(f"💾 Resultado guardado en {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
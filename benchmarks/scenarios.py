@@ -0,0 +1,218 @@
+# benchmarks/scenarios.py
+# Escenarios de carga: cada uno es una petición (o un par, como encolar un trabajo y
+# esperar su resultado) contra uno de los routers. El peso define qué tan seguido se elige;
+# los pesos por defecto imitan el uso real (muchas lecturas y chat, pocos planes de estudio).
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+SUBJECTS = ["Matemática", "Razonamiento Verbal", "Razonamiento Matemático"]
+TOPICS = ["Álgebra", "Geometría", "Analogías", "Series", "Comprensión lectora"]
+
+
+@dataclass
+class BenchUser:
+    id: str
+    email: str
+    password: str
+    token: str = ""
+
+    @property
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+
+class Context:
+    """Usuarios sembrados y azar compartido por todos los escenarios"""
+
+    def __init__(self, users: List[BenchUser], rng: random.Random):
+        self.users = users
+        self.rng = rng
+        self.created = 0
+
+    def user(self) -> BenchUser:
+        return self.rng.choice(self.users)
+
+    def session(self, user_id: str, questions: int = 10) -> Dict:
+        start = datetime.utcnow() - timedelta(days=self.rng.randrange(60), minutes=self.rng.randrange(600))
+        results = []
+        for _ in range(questions):
+            correct = self.rng.random() < 0.6
+            results.append({
+                "question": f"Pregunta {self.rng.randrange(10**6)}",
+                "userAnswer": self.rng.randrange(4),
+                "correct": correct,
+                "timeSpent": self.rng.randrange(10, 120),
+                "topic": self.rng.choice(TOPICS)
+            })
+        return {
+            "userId": user_id,
+            "subject": self.rng.choice(SUBJECTS),
+            "questions": results,
+            "startTime": start.isoformat(),
+            "endTime": (start + timedelta(minutes=self.rng.randrange(5, 45))).isoformat(),
+            "score": round(100 * sum(r["correct"] for r in results) / questions, 1)
+        }
+
+
+class JobFailed(Exception):
+    """El trabajo en segundo plano terminó con error (la consulta en sí responde 200)"""
+
+
+Scenario = Callable[[httpx.AsyncClient, Context], Awaitable[httpx.Response]]
+
+
+# --- /api/usuarios ---
+
+async def user_get(client, ctx):
+    return await client.get(f"/api/usuarios/{ctx.user().id}")
+
+
+async def user_stats(client, ctx):
+    return await client.get(f"/api/usuarios/{ctx.user().id}/stats")
+
+
+async def user_update(client, ctx):
+    user = ctx.user()
+    level = ctx.rng.choice(["principiante", "intermedio", "avanzado"])
+    response = await client.put(f"/api/usuarios/{user.id}", json={"level": level}, headers=user.auth)
+    # El token anterior ya no lleva el nivel vigente
+    user.token = response.headers.get("X-Access-Token", user.token)
+    return response
+
+
+async def user_create(client, ctx):
+    ctx.created += 1
+    suffix = f"{ctx.created}_{ctx.rng.randrange(10**9)}"
+    return await client.post("/api/usuarios/", json={
+        "name": f"bench_nuevo_{suffix}", "email": f"nuevo_{suffix}@prepia-bench.com", "password": "bench-password"
+    })
+
+
+async def user_login(client, ctx):
+    user = ctx.user()
+    return await client.post("/api/usuarios/login", json={"email": user.email, "password": user.password})
+
+
+# --- /api/sesiones ---
+
+async def session_create(client, ctx):
+    return await client.post("/api/sesiones/", json=ctx.session(ctx.user().id))
+
+
+async def session_bulk(client, ctx):
+    user_id = ctx.user().id
+    return await client.post("/api/sesiones/bulk", json={"sessions": [ctx.session(user_id) for _ in range(5)]})
+
+
+async def session_history(client, ctx):
+    return await client.get(f"/api/sesiones/user/{ctx.user().id}", params={"limit": 20})
+
+
+# --- /api/ai ---
+
+async def ai_explain(client, ctx):
+    user = ctx.user()
+    return await client.post("/api/ai/explain", headers=user.auth, json={
+        "question": f"¿Cuánto es {ctx.rng.randrange(100)} + {ctx.rng.randrange(100)}?",
+        "userAnswer": "A", "correctAnswer": "B",
+        "subject": ctx.rng.choice(SUBJECTS), "userId": user.id
+    })
+
+
+async def ai_adaptive_question(client, ctx):
+    user = ctx.user()
+    return await client.post("/api/ai/adaptive-question", headers=user.auth,
+                             json={"userId": user.id, "subject": ctx.rng.choice(SUBJECTS)})
+
+
+async def ai_adaptive_batch(client, ctx):
+    user = ctx.user()
+    return await client.post("/api/ai/adaptive-question/batch", headers=user.auth,
+                             json={"userId": user.id, "subject": ctx.rng.choice(SUBJECTS), "count": 5})
+
+
+async def ai_chat(client, ctx):
+    user = ctx.user()
+    return await client.post("/api/ai/chat", json={
+        "userId": user.id, "message": f"¿Cómo resuelvo el ejercicio {ctx.rng.randrange(1000)}?"
+    })
+
+
+async def ai_chat_stream(client, ctx):
+    user = ctx.user()
+    body = {"userId": user.id, "message": f"Explícame el tema {ctx.rng.choice(TOPICS)}"}
+    async with client.stream("POST", "/api/ai/chat/stream", json=body) as response:
+        # La latencia medida incluye el stream completo
+        await response.aread()
+    return response
+
+
+async def ai_analyze(client, ctx):
+    return await client.get(f"/api/ai/analyze/{ctx.user().id}")
+
+
+async def ai_study_plan(client, ctx):
+    return await client.post("/api/ai/study-plan", json={
+        "userId": ctx.user().id, "targetDate": "2026-12-15", "targetScore": ctx.rng.randrange(60, 100)
+    })
+
+
+async def ai_feedback(client, ctx):
+    return await client.get(f"/api/ai/feedback/{ctx.user().id}")
+
+
+async def ai_job_analyze(client, ctx):
+    response = await client.post(f"/api/ai/jobs/analyze/{ctx.user().id}")
+    if response.status_code != 202:
+        return response
+    response = await client.get(f"/api/ai/jobs/{response.json()['jobId']}", params={"wait": 30})
+    if response.status_code == 200 and response.json().get("status") == "failed":
+        raise JobFailed(response.json().get("error"))
+    return response
+
+
+async def ai_stats(client, ctx):
+    return await client.get("/api/ai/stats")
+
+
+# nombre -> (escenario, peso por defecto)
+SCENARIOS: Dict[str, tuple] = {
+    "usuarios.get": (user_get, 8),
+    "usuarios.stats": (user_stats, 6),
+    "usuarios.update": (user_update, 2),
+    "usuarios.create": (user_create, 1),
+    "usuarios.login": (user_login, 2),
+    "sesiones.create": (session_create, 6),
+    "sesiones.bulk": (session_bulk, 1),
+    "sesiones.history": (session_history, 6),
+    "ai.explain": (ai_explain, 8),
+    "ai.adaptive_question": (ai_adaptive_question, 8),
+    "ai.adaptive_batch": (ai_adaptive_batch, 2),
+    "ai.chat": (ai_chat, 6),
+    "ai.chat_stream": (ai_chat_stream, 4),
+    "ai.analyze": (ai_analyze, 2),
+    "ai.study_plan": (ai_study_plan, 1),
+    "ai.feedback": (ai_feedback, 3),
+    "ai.job_analyze": (ai_job_analyze, 1),
+    "ai.stats": (ai_stats, 1),
+}
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    """Pesos por escenario: "" usa los de por defecto; "ai.chat=10,usuarios.get=0" los ajusta.
+
+    Un prefijo de router ("ai=0") aplica a todos sus escenarios.
+    """
+    weights = {name: weight for name, (_, weight) in SCENARIOS.items()}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        matched = [name for name in weights if name == key or name.startswith(key + ".")]
+        if not matched:
+            raise ValueError(f"Escenario desconocido: {key}")
+        for name in matched:
+            weights[name] = int(value)
+    return {name: weight for name, weight in weights.items() if weight > 0}
@@ -0,0 +1,35 @@
+# benchmarks/serve.py (ejecutar desde la raíz del proyecto)
+# Levanta la app con Gemini falso (y MongoDB en memoria, salvo --mongo config) para apuntar
+# benchmarks/replay.py u otra herramienta de carga a un servidor real sin gastar cuota.
+#
+#   python -m benchmarks.serve [--port 8001] [--latency lognormal:0.8,0.4] [--mongo config]
+import argparse
+
+from benchmarks.harness import install_standins  # isort: skip (fija el entorno antes de importar app)
+
+import uvicorn
+
+from benchmarks.fake_gemini import FakeGeminiBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="App con Gemini falso para benchmarks y replays")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="Latencia de Gemini (ver benchmarks.run)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--mongo", choices=["memory", "config"], default="memory",
+                        help="memory: base en memoria; config: MONGODB_URL de la configuración")
+    args = parser.parse_args()
+
+    backend = FakeGeminiBackend(
+        latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate
+    )
+    main_module = install_standins(backend, in_memory_mongo=args.mongo == "memory")
+    print(f"🤖 Gemini falso ({args.latency}), MongoDB: {args.mongo}")
+    uvicorn.run(main_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
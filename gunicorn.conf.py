@@ -0,0 +1,19 @@
+# gunicorn.conf.py (gunicorn lo carga automáticamente desde la raíz del proyecto)
+import os
+import shutil
+
+# Las métricas de Prometheus de cada worker se guardan aquí y /metrics las suma
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prepia_metrics")
+
+
+def on_starting(server):
+    """Limpia las métricas de una ejecución anterior"""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Marca como muerto al worker para que sus métricas 'live' no se sigan sumando"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
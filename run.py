@@ -6,8 +6,8 @@ import os
 # Agrega la carpeta 'app' al path de Python
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'app')))
 
+# Solo la configuración: uvicorn importa app.main en su propio proceso
 from app.core.config import settings
-from app.main import app
 
 if __name__ == "__main__":
     print("=" * 60)
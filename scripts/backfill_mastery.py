@@ -0,0 +1,72 @@
+# scripts/backfill_mastery.py (ejecutar desde la raíz del proyecto)
+# Reconstruye la colección user_mastery a partir de todas las sesiones guardadas.
+# Úsalo una vez al desplegar los contadores (o para repararlos); conviene correrlo
+# sin tráfico de escritura, porque reemplaza el documento completo de cada usuario.
+#
+#   python -m scripts.backfill_mastery [--user USER_ID]
+import argparse
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db.mastery import MASTERY_COLLECTION, RECENT_WINDOW, counter_key, summarize_questions
+from app.db.session_store import attach_questions
+
+
+def build_document(user_id: str, sessions: list) -> dict:
+    """Documento de contadores equivalente a haber registrado cada sesión (ventana por startTime)"""
+    doc = {
+        "_id": user_id,
+        "totals": {"correct": 0, "total": 0},
+        "subjects": {},
+        "topics": {},
+        "recent": [],
+        "sessionsCounted": 0
+    }
+    for session in sessions:
+        summary = summarize_questions(session.get("questions", []))
+        if summary["total"] == 0:
+            continue
+        subject_key = counter_key(session.get("subject", "")) or "general"
+        doc["totals"]["correct"] += summary["correct"]
+        doc["totals"]["total"] += summary["total"]
+        subject = doc["subjects"].setdefault(subject_key, {"correct": 0, "total": 0})
+        subject["correct"] += summary["correct"]
+        subject["total"] += summary["total"]
+        for topic, stats in summary["topics"].items():
+            target = doc["topics"].setdefault(topic, {"correct": 0, "total": 0, "name": stats["name"]})
+            target["correct"] += stats["correct"]
+            target["total"] += stats["total"]
+        doc["recent"].append({**summary, "subject": subject_key, "startTime": session.get("startTime")})
+        doc["sessionsCounted"] += 1
+    doc["recent"] = doc["recent"][-RECENT_WINDOW:]
+    return doc
+
+
+async def backfill(user_id: str = None):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    try:
+        query = {"_id": user_id} if user_id else {}
+        count = 0
+        async for user in db["users"].find(query, {"_id": 1}):
+            sessions = await db["sessions"].find(
+                {"userId": user["_id"]},
+                {"subject": 1, "questions.correct": 1, "questions.topic": 1, "startTime": 1}
+            ).sort("startTime", 1).to_list(None)
+            # Sesiones en formato bucketed: correct/topic salen de las cubetas
+            await attach_questions(db, user["_id"], sessions)
+            doc = build_document(user["_id"], sessions)
+            await db[MASTERY_COLLECTION].replace_one({"_id": user["_id"]}, doc, upsert=True)
+            count += 1
+        print(f"✅ Contadores reconstruidos para {count} usuarios")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye user_mastery desde las sesiones")
+    parser.add_argument("--user", help="Solo este usuario")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.user))
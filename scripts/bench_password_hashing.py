@@ -0,0 +1,76 @@
+# scripts/bench_password_hashing.py (ejecutar desde la raíz del proyecto)
+# Mide el retraso del event loop mientras se verifican contraseñas en paralelo: bcrypt
+# llamado directamente en la corrutina (como antes) contra el pool de app/core/security.py.
+# Un "ticker" duerme 10 ms en bucle; lo que se pasa de esos 10 ms es tiempo en que el loop
+# no pudo atender a nadie más (p. ej. el chat).
+#
+#   python -m scripts.bench_password_hashing [--logins 50] [--rounds 12]
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.security import (
+    HashingBusyError, PasswordHasher, hash_password_sync, verify_password_sync
+)
+
+TICK_SECONDS = 0.01
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1) if ordered else 0.0
+
+
+async def run_case(name: str, verify, logins: int):
+    lags: list = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK_SECONDS * 3)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[verify() for _ in range(logins)], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+    rejected = sum(1 for r in results if isinstance(r, HashingBusyError))
+    print(
+        f"  {name:<8} {elapsed:6.2f} s  {(logins - rejected) / elapsed:6.1f} logins/s  "
+        f"rechazados {rejected:>3}   lag del loop p50 {percentile(lags, 0.5):>6} ms  "
+        f"p99 {percentile(lags, 0.99):>7} ms  máx {round(max(lags or [0]), 1):>7} ms"
+    )
+
+
+async def main(logins: int, rounds: int, workers: int, max_pending: int):
+    settings.BCRYPT_ROUNDS = rounds
+    hashed = hash_password_sync("contraseña-de-prueba", rounds)
+    hasher = PasswordHasher(workers=workers, max_pending=max_pending)
+
+    async def inline():
+        return verify_password_sync("contraseña-de-prueba", hashed)
+
+    async def pooled():
+        return await hasher.verify("contraseña-de-prueba", hashed)
+
+    print(f"🔐 {logins} logins simultáneos, bcrypt costo {rounds}, pool de {workers} hilos (cola máx. {max_pending})\n")
+    await run_case("inline", inline, logins)
+    await run_case("pool", pooled, logins)
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retraso del event loop con logins concurrentes")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    parser.add_argument("--workers", type=int, default=settings.BCRYPT_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=1000, help="Cola del pool (por defecto sin rechazos)")
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds, args.workers, args.max_pending))
@@ -0,0 +1,142 @@
+# scripts/bench_session_layouts.py (ejecutar desde la raíz del proyecto)
+# Compara los formatos de sesión "embedded" y "bucketed" con datos sintéticos: tamaño de
+# los documentos (BSON) y latencia de las lecturas de cada endpoint. Usa dos bases de datos
+# temporales en el mismo servidor (<MONGODB_DB_NAME>_bench_*) y las borra al terminar.
+#
+#   python -m scripts.bench_session_layouts [--users 20] [--sessions 50] [--questions 10] [--reads 200]
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db import analytics, session_store
+
+LAYOUTS = ("embedded", "bucketed")
+SUBJECTS = ("matematica", "razonamientoVerbal", "razonamientoMatematico")
+TOPICS = ("álgebra", "geometría", "sinónimos", "analogías", "fracciones", "porcentajes")
+
+
+def fake_session(user_id: str, start: datetime, questions: int) -> dict:
+    return {
+        "userId": user_id,
+        "subject": random.choice(SUBJECTS),
+        "questions": [
+            {
+                "questionId": f"q{random.randint(1, 10**6)}",
+                "question": "¿Cuál es el valor de x en la ecuación 3x + 7 = 22? " * 2,
+                "userAnswer": random.randint(0, 3),
+                "correct": random.random() < 0.6,
+                "timeSpent": random.randint(10, 120),
+                "topic": random.choice(TOPICS)
+            }
+            for _ in range(questions)
+        ],
+        "startTime": start,
+        "endTime": start + timedelta(minutes=random.randint(5, 40)),
+        "score": round(random.uniform(0, 20), 1)
+    }
+
+
+async def seed(db, layout: str, users: int, sessions: int, questions: int):
+    settings.SESSION_STORAGE_LAYOUT = layout
+    random.seed(42)  # los dos formatos guardan exactamente los mismos datos
+    now = datetime.utcnow()
+    for u in range(users):
+        for s in range(sessions):
+            start = now - timedelta(hours=(sessions - s) * 7)
+            await session_store.insert_session(db, fake_session(f"user{u}", start, questions))
+    await analytics.ensure_indexes(db)
+    await session_store.ensure_indexes(db)
+
+
+async def document_sizes(db, collection: str) -> dict:
+    sizes = [len(bson.encode(doc)) async for doc in db[collection].find()]
+    if not sizes:
+        return {"docs": 0, "avgBytes": 0, "totalKB": 0}
+    return {"docs": len(sizes), "avgBytes": round(statistics.mean(sizes)), "totalKB": round(sum(sizes) / 1024, 1)}
+
+
+async def timed(reads: int, users: int, read) -> dict:
+    samples = []
+    for i in range(reads):
+        started = time.perf_counter()
+        await read(f"user{i % users}")
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50ms": round(samples[len(samples) // 2], 2),
+        "p95ms": round(samples[int(len(samples) * 0.95) - 1], 2)
+    }
+
+
+async def bench_reads(db, reads: int, users: int) -> dict:
+    sessions = db["sessions"]
+
+    async def stats_full(user_id):
+        # Lectura original de /usuarios/{id}/stats: sesiones completas
+        await sessions.find({"userId": user_id}).sort("startTime", -1).limit(10).to_list(10)
+
+    async def stats_headers(user_id):
+        await sessions.find({"userId": user_id}, session_store.HEADER_PROJECTION).sort("startTime", -1).limit(10).to_list(10)
+
+    async def sessions_with_questions(user_id):
+        docs = await sessions.find({"userId": user_id}).sort("startTime", -1).limit(10).to_list(10)
+        await session_store.attach_questions(db, user_id, docs)
+
+    async def summary(user_id):
+        await analytics.session_summary(db, user_id)
+
+    return {
+        "stats (sesiones completas)": await timed(reads, users, stats_full),
+        "stats (solo cabeceras)": await timed(reads, users, stats_headers),
+        "sesiones con preguntas": await timed(reads, users, sessions_with_questions),
+        "resumen (agregación)": await timed(reads, users, summary)
+    }
+
+
+async def run(users: int, sessions: int, questions: int, reads: int, keep: bool):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    original_layout = settings.SESSION_STORAGE_LAYOUT
+    results = {}
+    try:
+        for layout in LAYOUTS:
+            db = client[f"{settings.MONGODB_DB_NAME}_bench_{layout}"]
+            await client.drop_database(db.name)
+            await seed(db, layout, users, sessions, questions)
+            results[layout] = {
+                "sessions": await document_sizes(db, "sessions"),
+                "buckets": await document_sizes(db, session_store.BUCKETS_COLLECTION),
+                "reads": await bench_reads(db, reads, users)
+            }
+            if not keep:
+                await client.drop_database(db.name)
+    finally:
+        settings.SESSION_STORAGE_LAYOUT = original_layout
+        client.close()
+
+    print(f"📊 {users} usuarios × {sessions} sesiones × {questions} preguntas, {reads} lecturas por caso\n")
+    for layout, data in results.items():
+        print(f"== {layout} ==")
+        for name in ("sessions", "buckets"):
+            size = data[name]
+            print(f"  {name:<10} {size['docs']:>6} docs  {size['avgBytes']:>7} B/doc  {size['totalKB']:>9} KB")
+        for name, latency in data["reads"].items():
+            print(f"  {name:<28} p50 {latency['p50ms']:>7} ms   p95 {latency['p95ms']:>7} ms")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara los formatos de almacenamiento de sesiones")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=50, help="Sesiones por usuario")
+    parser.add_argument("--questions", type=int, default=10, help="Preguntas por sesión")
+    parser.add_argument("--reads", type=int, default=200, help="Lecturas por caso")
+    parser.add_argument("--keep", action="store_true", help="No borrar las bases de datos de prueba")
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.sessions, args.questions, args.reads, args.keep))
@@ -0,0 +1,56 @@
+# scripts/check_semantic_cache.py (ejecutar desde la raíz del proyecto)
+# Verificación de regresión del caché semántico: problemas que solo difieren en un número
+# u operador nunca deben compartir respuesta, y las reformulaciones de la misma pregunta
+# sí. Sale con código 1 si algún par no da el resultado esperado.
+#
+#   python -m scripts.check_semantic_cache [--threshold 0.8]
+import argparse
+import sys
+
+from app.core.config import settings
+from app.services.semantic_cache import SemanticCache
+
+SCOPE = SemanticCache.make_scope("matemáticas", "intermedio")
+
+# Pares con similitud coseno > 0.8 que antes devolvían la respuesta del otro problema
+MUST_MISS = [
+    ("factoriza x^2 + 5x + 6", "factoriza x^2 + 4x + 6"),
+    ("área de un círculo de radio 3", "área de un círculo de radio 5"),
+    ("resuelve 2x + 3 = 7", "resuelve 2x + 5 = 7"),
+    ("derivada de x^2", "derivada de x^3"),
+    ("resuelve 2x + 3 = 7", "resuelve 2x - 3 = 7"),
+]
+
+# Reformulaciones que deben seguir aprovechando el caché
+MUST_HIT = [
+    ("factoriza x^2 + 5x + 6", "¿Cómo factorizo x^2 + 5x + 6?"),
+    ("¿Qué es una ecuación cuadrática?", "que es una ecuacion cuadratica"),
+    ("Explícame el teorema de Pitágoras", "¿Me explicas el teorema de Pitágoras?"),
+]
+
+
+def check(threshold: float) -> int:
+    failures = 0
+    for cached, asked, expected in [(a, b, False) for a, b in MUST_MISS] + [(a, b, True) for a, b in MUST_HIT]:
+        cache = SemanticCache(enabled=True, threshold=threshold, max_entries=10,
+                              dimensions=settings.SEMANTIC_CACHE_DIMENSIONS, ttl=3600)
+        cache.add(SCOPE, cached, "respuesta")
+        similarity = float(cache.vectorizer.transform(cached) @ cache.vectorizer.transform(asked))
+        hit = cache.lookup(SCOPE, asked) is not None
+        ok = hit == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {'acierto' if hit else 'fallo':<8} coseno={similarity:.3f}  "
+              f"{cached!r} -> {asked!r}")
+    print(f"\n{'✅ Sin regresiones' if not failures else f'❌ {failures} pares incorrectos'}")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Verificación de regresión del caché semántico")
+    parser.add_argument("--threshold", type=float, default=settings.SEMANTIC_CACHE_THRESHOLD)
+    args = parser.parse_args()
+    return check(args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# scripts/migrate_session_dates.py (ejecutar desde la raíz del proyecto)
+# Convierte startTime/endTime de las sesiones antiguas (strings ISO 8601) a fechas BSON.
+# La conversión se hace en el servidor con $dateFromString (update con pipeline) y es
+# idempotente: solo toca los documentos que todavía tienen strings.
+#
+# Los strings que no se pueden convertir se quedan como están: se listan al final y el
+# script sale con código 1 (analytics omite esas sesiones hasta corregirlas).
+#
+#   python -m scripts.migrate_session_dates [--dry-run]
+import argparse
+import asyncio
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+
+DATE_FIELDS = ("startTime", "endTime")
+SAMPLE_SIZE = 10
+
+
+def conversion_pipeline(field: str) -> list:
+    # Si el string no se puede convertir, se deja como estaba (onError) para revisarlo a mano
+    return [{"$set": {field: {"$dateFromString": {"dateString": f"${field}", "onError": f"${field}"}}}}]
+
+
+async def migrate(dry_run: bool = False) -> int:
+    """Convierte los campos de fecha; devuelve cuántos strings quedaron sin convertir"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    sessions = client[settings.MONGODB_DB_NAME]["sessions"]
+    unconverted = 0
+    try:
+        for field in DATE_FIELDS:
+            query = {field: {"$type": "string"}}
+            pending = await sessions.count_documents(query)
+            if dry_run or pending == 0:
+                print(f"• {field}: {pending} sesiones por convertir")
+                continue
+            result = await sessions.update_many(query, conversion_pipeline(field))
+            remaining = await sessions.count_documents(query)
+            print(f"✅ {field}: {result.modified_count} convertidas, {remaining} con formato inválido")
+            if remaining:
+                unconverted += remaining
+                samples = await sessions.find(query, {field: 1}).limit(SAMPLE_SIZE).to_list(SAMPLE_SIZE)
+                for doc in samples:
+                    print(f"   ⚠️ {doc['_id']}: {field}={doc[field]!r}")
+        if unconverted:
+            print(f"⚠️ {unconverted} fechas no se pudieron convertir: corrígelas a mano y vuelve a correr "
+                  f"el script (analytics omite esas sesiones)")
+    finally:
+        client.close()
+    return unconverted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte las fechas de las sesiones a fechas BSON")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta las sesiones pendientes")
+    args = parser.parse_args()
+    sys.exit(1 if asyncio.run(migrate(args.dry_run)) else 0)
@@ -0,0 +1,76 @@
+# scripts/migrate_to_buckets.py (ejecutar desde la raíz del proyecto)
+# Pasa las sesiones guardadas al formato "bucketed" (ver app/db/session_store.py):
+#   1. Agrega questionCount/correctCount a las cabeceras que no los tienen (en el servidor)
+#   2. Mueve las preguntas embebidas a las cubetas del usuario y las quita de la sesión
+# Es idempotente: una sesión ya copiada a una cubeta no se vuelve a copiar. El paso 2 no
+# guarda el texto de las preguntas que tienen questionId, así que conviene un respaldo antes.
+# Al terminar, configura SESSION_STORAGE_LAYOUT=bucketed.
+#
+#   python -m scripts.migrate_to_buckets [--counts-only] [--user USER_ID] [--dry-run]
+import argparse
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db import session_store
+
+
+def counters_pipeline() -> list:
+    questions = {"$ifNull": ["$questions", []]}
+    return [{"$set": {
+        "questionCount": {"$size": questions},
+        "correctCount": {"$size": {"$filter": {"input": questions, "cond": "$$this.correct"}}}
+    }}]
+
+
+async def migrate(counts_only: bool = False, user_id: str = None, dry_run: bool = False):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    sessions = db["sessions"]
+    base_query = {"userId": user_id} if user_id else {}
+    try:
+        query = {**base_query, "questionCount": {"$exists": False}}
+        pending = await sessions.count_documents(query)
+        if dry_run or pending == 0:
+            print(f"• contadores: {pending} sesiones sin questionCount/correctCount")
+        else:
+            result = await sessions.update_many(query, counters_pipeline())
+            print(f"✅ contadores: {result.modified_count} sesiones actualizadas")
+
+        if counts_only:
+            return
+
+        query = {**base_query, "questions": {"$exists": True}}
+        pending = await sessions.count_documents(query)
+        if dry_run or pending == 0:
+            print(f"• cubetas: {pending} sesiones con preguntas embebidas")
+            return
+
+        await session_store.ensure_indexes(db)
+        moved = 0
+        cursor = sessions.find(query, {"userId": 1, "endTime": 1, "questions": 1}).sort([("userId", 1), ("startTime", 1)])
+        async for session in cursor:
+            session_id = str(session["_id"])
+            already_copied = await db[session_store.BUCKETS_COLLECTION].count_documents(
+                {"userId": session["userId"], "results.sessionId": session_id}, limit=1
+            )
+            if not already_copied:
+                await session_store.push_results(db, session["userId"], [
+                    session_store.compact_result(session_id, q, session.get("endTime"))
+                    for q in session.get("questions", [])
+                ])
+            await sessions.update_one({"_id": session["_id"]}, {"$unset": {"questions": ""}})
+            moved += 1
+        print(f"✅ cubetas: {moved} sesiones migradas. Configura SESSION_STORAGE_LAYOUT=bucketed")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra las sesiones al formato de cubetas de preguntas")
+    parser.add_argument("--counts-only", action="store_true", help="Solo agrega questionCount/correctCount")
+    parser.add_argument("--user", help="Solo este usuario")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta las sesiones pendientes")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.counts_only, args.user, args.dry_run))
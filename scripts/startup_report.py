@@ -0,0 +1,103 @@
+# scripts/startup_report.py (ejecutar desde la raíz del proyecto)
+# Mide el arranque en frío de un worker: cuánto tarda `import app.main`, qué módulos pesan
+# más (python -X importtime) y, con --startup, cada paso del arranque (requiere MongoDB).
+# Cada medición corre en un proceso nuevo, como un worker recién creado.
+# Sirve como chequeo: termina con código 1 si se pasa del presupuesto o si se importa
+# al arrancar algún módulo que debería cargarse bajo demanda.
+#
+#   python -m scripts.startup_report [--budget-ms 1200] [--startup] [--top 15] [--json]
+import argparse
+import json
+import subprocess
+import sys
+
+# Módulos que no deben importarse al cargar la app (se cargan en el primer uso)
+LAZY_MODULES = ("google.generativeai",)
+
+CHILD_CODE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main as main
+import_ms = (time.perf_counter() - started) * 1000
+report = {{"importMs": round(import_ms, 1), "loaded": [m for m in {lazy!r} if m in sys.modules]}}
+if {startup!r}:
+    async def run():
+        await main.startup_event()
+        report["startup"] = dict(main.startup_report)
+        await main.shutdown_event()
+    asyncio.run(run())
+print("REPORT " + json.dumps(report))
+"""
+
+
+def run_child(startup: bool, importtime: bool) -> subprocess.CompletedProcess:
+    code = CHILD_CODE.format(lazy=LAZY_MODULES, startup=startup)
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, capture_output=True, text=True)
+
+
+def parse_report(stdout: str) -> dict:
+    for line in stdout.splitlines():
+        if line.startswith("REPORT "):
+            return json.loads(line[len("REPORT "):])
+    raise RuntimeError("El proceso de medición no devolvió un reporte")
+
+
+def heaviest_imports(stderr: str, top: int) -> list:
+    """Módulos de primer nivel (importados directamente) ordenados por tiempo acumulado"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # El nombre viene indentado dos espacios por nivel de anidamiento
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append({"module": name.strip(), "cumulativeMs": round(int(cumulative_us) / 1000, 1), "depth": depth})
+    top_level = [row for row in rows if row["depth"] <= 1]
+    return sorted(top_level, key=lambda row: row["cumulativeMs"], reverse=True)[:top]
+
+
+def main(budget_ms: float, startup: bool, top: int, as_json: bool) -> int:
+    # Primera corrida sin -X importtime (que agrega su propio costo) para el tiempo real
+    result = run_child(startup, importtime=False)
+    if result.returncode != 0:
+        print(result.stderr)
+        return 1
+    report = parse_report(result.stdout)
+
+    profiled = run_child(False, importtime=True)
+    report["heaviestImports"] = heaviest_imports(profiled.stderr, top)
+
+    failures = []
+    if budget_ms and report["importMs"] > budget_ms:
+        failures.append(f"import app.main tardó {report['importMs']} ms (presupuesto {budget_ms} ms)")
+    for module in report["loaded"]:
+        failures.append(f"{module} se importa al cargar la app (debería ser bajo demanda)")
+    report["failures"] = failures
+
+    if as_json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"⏱️ import app.main: {report['importMs']} ms" + (f" (presupuesto {budget_ms} ms)" if budget_ms else ""))
+        if "startup" in report:
+            print("🚀 Arranque:")
+            for step, ms in report["startup"].items():
+                print(f"   {step:<22} {ms:>8} ms")
+        print("📦 Módulos más pesados:")
+        for row in report["heaviestImports"]:
+            print(f"   {row['module']:<45} {row['cumulativeMs']:>8} ms")
+        for failure in failures:
+            print(f"❌ {failure}")
+        if not failures:
+            print("✅ Dentro del presupuesto")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte de arranque en frío de la app")
+    parser.add_argument("--budget-ms", type=float, default=0, help="Falla si import app.main tarda más")
+    parser.add_argument("--startup", action="store_true", help="Mide también el arranque (requiere MongoDB)")
+    parser.add_argument("--top", type=int, default=15, help="Cantidad de módulos a listar")
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+    sys.exit(main(args.budget_ms, args.startup, args.top, args.json))